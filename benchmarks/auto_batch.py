@@ -0,0 +1,97 @@
+"""
+Wall-clock time and request count of fetching `--keys` items one
+:meth:`PersistentObject.get` at a time in a loop, from `--threads` threads
+and through :meth:`PersistentObject.aget`, with and without
+:func:`pynamo.loader.auto_batch`, against a backend that takes `--latency`
+seconds per request.
+
+    python -m benchmarks.auto_batch --keys 1000 --latency 0.01
+"""
+import sys, time, threading, optparse
+from pynamo import PersistentObject, Meta, StringField, IntegerField
+from pynamo.concurrency import gather
+from pynamo.loader import auto_batch
+from . import fakedb
+
+
+class BenchItem(PersistentObject):
+    table_name = Meta('auto_batch')
+
+    key = StringField(hash_key=True)
+    value = IntegerField()
+
+
+def populate(n):
+    BenchItem.create_table(wait=False)
+    for i in xrange(n):
+        BenchItem.create(key='key-%d' % i, value=i).save()
+    return ['key-%d' % i for i in xrange(n)]
+
+
+def sequential_gets(keys, threads, batch):
+    for key in keys:
+        assert BenchItem.get(key).key == key
+
+
+def threaded_gets(keys, threads, batch):
+    chunks = [keys[i::threads] for i in xrange(threads)]
+    def run(chunk):
+        if batch is not None:
+            # the threads join the block to share requests
+            with batch:
+                return run_chunk(chunk)
+        run_chunk(chunk)
+    def run_chunk(chunk):
+        for key in chunk:
+            assert BenchItem.get(key).key == key
+    workers = [threading.Thread(target=run, args=(chunk,))
+               for chunk in chunks]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+
+
+def future_gets(keys, threads, batch):
+    ret = gather([BenchItem.aget(key) for key in keys]).result()
+    assert [o.key for o in ret] == keys
+
+
+def measure(layer1, run, keys, threads, batched):
+    layer1.requests.clear()
+    t1 = time.time()
+    if batched:
+        with auto_batch(window=0.002) as batch:
+            run(keys, threads, batch)
+    else:
+        run(keys, threads, None)
+    elapsed = time.time() - t1
+    return elapsed, sum(layer1.requests.values())
+
+
+def main(argv=None):
+    parser = optparse.OptionParser()
+    parser.add_option('--keys', type='int', default=1000)
+    parser.add_option('--threads', type='int', default=16)
+    parser.add_option('--latency', type='float', default=0.01)
+    opts, args = parser.parse_args(argv)
+
+    layer1 = fakedb.install()
+    keys = populate(opts.keys)
+    layer1.latency = opts.latency
+    print '%d keys, %d threads, %.0fms per request' % (
+        opts.keys, opts.threads, opts.latency * 1000)
+    for name, run in (('get loop', sequential_gets),
+                      ('threaded get', threaded_gets),
+                      ('aget', future_gets)):
+        before, before_requests = measure(layer1, run, keys, opts.threads,
+                                          False)
+        after, after_requests = measure(layer1, run, keys, opts.threads,
+                                        True)
+        print '%-13s %8.3fs %6d requests  auto_batch %8.3fs %6d requests' \
+              '  %5.1fx' % (name, before, before_requests, after,
+                            after_requests, before / after)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,78 @@
+"""
+Per-object cost of building, reading, decoding and rendering a model with
+`--width` fields of each type, and of building keys from a
+`hash_key_format`. Runs without any requests beyond describing the table.
+
+    python -m benchmarks.codec --objects 2000 --width 10
+"""
+import sys, time, optparse
+from boto.dynamodb.item import Item
+from pynamo import (PersistentObject, Meta, StringField, IntegerField,
+                    FloatField, BoolField, ListField, StringSetField)
+from . import fakedb
+
+
+TYPES = [('s', StringField, lambda i: 'value-%d' % i),
+         ('i', IntegerField, lambda i: i),
+         ('f', FloatField, lambda i: i * 1.5),
+         ('b', BoolField, lambda i: i % 2 == 0),
+         ('l', ListField, lambda i: [i, 'x']),
+         ('ss', StringSetField, lambda i: set(['a', str(i)]))]
+
+
+def wide_model(width):
+    attrs = {'table_name': Meta('codec'),
+             'hash_key_format': Meta('{tenant}:{n}'),
+             'key': StringField(hash_key=True),
+             'tenant': StringField(),
+             'n': IntegerField()}
+    for prefix, field, value in TYPES:
+        for j in xrange(width):
+            attrs['%s%d' % (prefix, j)] = field()
+    return type('Wide', (PersistentObject,), attrs)
+
+
+def row(i, width):
+    d = {'tenant': 'acme', 'n': i}
+    for prefix, field, value in TYPES:
+        for j in xrange(width):
+            d['%s%d' % (prefix, j)] = value(i + j)
+    return d
+
+
+def timed(label, n, func):
+    t1 = time.time()
+    ret = func()
+    elapsed = time.time() - t1
+    print '%-12s %8.3fs %8.1fus/object' % (label, elapsed, elapsed / n * 1e6)
+    return ret
+
+
+def main(argv=None):
+    parser = optparse.OptionParser()
+    parser.add_option('--objects', type='int', default=2000)
+    parser.add_option('--width', type='int', default=10)
+    opts, args = parser.parse_args(argv)
+
+    fakedb.install()
+    Wide = wide_model(opts.width)
+    Wide.create_table(wait=False)
+    rows = [row(i, opts.width) for i in xrange(opts.objects)]
+    print '%d objects of %d fields' % (opts.objects, len(Wide._properties))
+
+    objs = timed('create', opts.objects,
+                 lambda: [Wide.create(dict(r)) for r in rows])
+    items = [dict(o._item) for o in objs]
+    names = Wide._properties
+    timed('read fields', opts.objects,
+          lambda: [getattr(o, n) for o in objs for n in names])
+    timed('to_dict', opts.objects, lambda: [o.to_dict() for o in objs])
+    timed('decode', opts.objects,
+          lambda: [Wide(Item(Wide._table, attrs=dict(a))).to_dict()
+                   for a in items])
+    timed('prepare_key', opts.objects,
+          lambda: [Wide.prepare_key(r) for r in rows])
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,365 @@
+"""
+An in-memory stand-in for the DynamoDB service used by the benchmarks.
+
+:class:`FakeLayer1` replaces only `Layer1.make_request`, so every code path in
+boto and pynamo above the HTTP request runs unmodified. Each request sleeps
+for `latency` seconds (outside of any lock) so that round trips dominate just
+like they do against the real service.
+"""
+import json, time, threading, collections, math
+from boto.dynamodb.layer1 import Layer1
+from boto.dynamodb.layer2 import Layer2
+from boto.dynamodb import exceptions as dynamodb_exceptions
+from boto.exception import DynamoDBResponseError
+from pynamo import Configure
+
+_PREFIX = 'com.amazonaws.dynamodb.v20111205#'
+
+
+def _key_value(v):
+    typ, val = v.items()[0]
+    if typ == 'N':
+        return float(val)
+    return val
+
+
+def _size(item):
+    return len(json.dumps(item))
+
+
+def _units(size):
+    return float(max(1, int(math.ceil(size / 1024.0))))
+
+
+class FakeLayer1(Layer1):
+    """
+    :type latency: float
+    :param latency: Seconds every request takes
+
+    :type max_batch_get: int
+    :param max_batch_get: `BatchGetItem` answers at most this many keys per
+        request and returns the rest as `UnprocessedKeys`
+
+    :type max_batch_write: int
+    :param max_batch_write: The same for `BatchWriteItem`
+
+    :type page_size: int
+    :param page_size: How many items a single `Query` or `Scan` returns
+    """
+    def __init__(self, latency=0.0, max_batch_get=100, max_batch_write=25,
+                 page_size=100):
+        Layer1.__init__(self, aws_access_key_id='fake',
+                        aws_secret_access_key='fake')
+        self.latency = latency
+        self.max_batch_get = max_batch_get
+        self.max_batch_write = max_batch_write
+        self.page_size = page_size
+        self.tables = {}
+        self.data = {}
+        self.requests = collections.Counter()
+        self._lock = threading.Lock()
+
+    def make_request(self, action, body='', object_hook=None):
+        if self.latency:
+            time.sleep(self.latency)
+        data = json.loads(body)
+        with self._lock:
+            self.requests[action] += 1
+            ret = getattr(self, '_' + action)(data)
+        return json.loads(json.dumps(ret), object_hook=object_hook)
+
+    def _error(self, typ, cls=DynamoDBResponseError):
+        raise cls(400, 'Bad Request', {'__type': _PREFIX + typ,
+                                       'message': typ})
+
+    def _table(self, name):
+        if name not in self.tables:
+            self._error('ResourceNotFoundException')
+        return self.tables[name], self.data[name]
+
+    def _key(self, schema, key):
+        k = (_key_value(key['HashKeyElement']),)
+        if 'RangeKeyElement' in key:
+            k += (_key_value(key['RangeKeyElement']),)
+        return k
+
+    def _item_key(self, schema, item):
+        k = (_key_value(item[schema['HashKeyElement']['AttributeName']]),)
+        if 'RangeKeyElement' in schema:
+            k += (_key_value(item[schema['RangeKeyElement']['AttributeName']]),)
+        return k
+
+    def _key_of(self, schema, item):
+        ret = {'HashKeyElement':
+                    item[schema['HashKeyElement']['AttributeName']]}
+        if 'RangeKeyElement' in schema:
+            ret['RangeKeyElement'] = \
+                item[schema['RangeKeyElement']['AttributeName']]
+        return ret
+
+    def _project(self, item, attributes):
+        if not attributes:
+            return dict(item)
+        return dict((k, v) for k, v in item.iteritems() if k in attributes)
+
+    def _check_expected(self, old, expected):
+        for name, exp in (expected or {}).iteritems():
+            present = old is not None and name in old
+            if 'Exists' in exp and not exp['Exists']:
+                ok = not present
+            elif 'Value' in exp:
+                ok = present and old[name] == exp['Value']
+            else:
+                ok = present
+            if not ok:
+                self._error('ConditionalCheckFailedException',
+                    dynamodb_exceptions.DynamoDBConditionalCheckFailedError)
+
+    # TABLES
+
+    def _ListTables(self, data):
+        return {'TableNames': sorted(self.tables)}
+
+    def _CreateTable(self, data):
+        desc = {'TableName': data['TableName'],
+                'KeySchema': data['KeySchema'],
+                'ProvisionedThroughput': data['ProvisionedThroughput'],
+                'TableStatus': 'ACTIVE', 'ItemCount': 0,
+                'TableSizeBytes': 0}
+        self.tables[data['TableName']] = desc
+        self.data[data['TableName']] = {}
+        return {'TableDescription': desc}
+
+    def _DescribeTable(self, data):
+        desc, items = self._table(data['TableName'])
+        desc['ItemCount'] = len(items)
+        return {'Table': desc}
+
+    def _UpdateTable(self, data):
+        desc, items = self._table(data['TableName'])
+        desc['ProvisionedThroughput'].update(data['ProvisionedThroughput'])
+        return {'TableDescription': desc}
+
+    def _DeleteTable(self, data):
+        desc, items = self._table(data['TableName'])
+        del self.tables[data['TableName']]
+        del self.data[data['TableName']]
+        return {'TableDescription': desc}
+
+    # ITEMS
+
+    def _GetItem(self, data):
+        desc, items = self._table(data['TableName'])
+        item = items.get(self._key(desc['KeySchema'], data['Key']))
+        ret = {'ConsumedCapacityUnits': 1.0}
+        if item is not None:
+            ret['Item'] = self._project(item, data.get('AttributesToGet'))
+            ret['ConsumedCapacityUnits'] = _units(_size(item))
+        return ret
+
+    def _PutItem(self, data):
+        desc, items = self._table(data['TableName'])
+        k = self._item_key(desc['KeySchema'], data['Item'])
+        self._check_expected(items.get(k), data.get('Expected'))
+        items[k] = data['Item']
+        return {'ConsumedCapacityUnits': _units(_size(data['Item']))}
+
+    def _UpdateItem(self, data):
+        desc, items = self._table(data['TableName'])
+        schema = desc['KeySchema']
+        k = self._key(schema, data['Key'])
+        old = items.get(k)
+        self._check_expected(old, data.get('Expected'))
+        item = dict(old) if old is not None else {}
+        item[schema['HashKeyElement']['AttributeName']] = \
+            data['Key']['HashKeyElement']
+        if 'RangeKeyElement' in schema:
+            item[schema['RangeKeyElement']['AttributeName']] = \
+                data['Key']['RangeKeyElement']
+        for name, update in data['AttributeUpdates'].iteritems():
+            action = update['Action']
+            value = update.get('Value')
+            if action == 'PUT':
+                item[name] = value
+            elif action == 'DELETE' and value is None:
+                item.pop(name, None)
+            else:
+                typ = value.keys()[0]
+                cur = item.get(name, {}).get(typ)
+                if typ == 'N':
+                    n = float(cur or 0) + float(value[typ])
+                    item[name] = {'N': repr(int(n) if n == int(n) else n)}
+                else:
+                    cur = set(cur or [])
+                    if action == 'ADD':
+                        cur |= set(value[typ])
+                    else:
+                        cur -= set(value[typ])
+                    if cur:
+                        item[name] = {typ: sorted(cur)}
+                    else:
+                        item.pop(name, None)
+        items[k] = item
+        return {'ConsumedCapacityUnits': _units(_size(item))}
+
+    def _DeleteItem(self, data):
+        desc, items = self._table(data['TableName'])
+        k = self._key(desc['KeySchema'], data['Key'])
+        self._check_expected(items.get(k), data.get('Expected'))
+        old = items.pop(k, None)
+        return {'ConsumedCapacityUnits': _units(_size(old or {}))}
+
+    def _BatchGetItem(self, data):
+        responses = {}
+        unprocessed = {}
+        budget = self.max_batch_get
+        for name, req in data['RequestItems'].iteritems():
+            desc, items = self._table(name)
+            found = []
+            units = 0.0
+            left = []
+            for key in req['Keys']:
+                if budget <= 0:
+                    left.append(key)
+                    continue
+                budget -= 1
+                item = items.get(self._key(desc['KeySchema'], key))
+                if item is not None:
+                    found.append(self._project(item,
+                                               req.get('AttributesToGet')))
+                    units += _units(_size(item)) / 2.0
+            responses[name] = {'Items': found,
+                               'ConsumedCapacityUnits': units}
+            if left:
+                unprocessed[name] = dict(req, Keys=left)
+        return {'Responses': responses, 'UnprocessedKeys': unprocessed}
+
+    def _BatchWriteItem(self, data):
+        responses = {}
+        unprocessed = {}
+        budget = self.max_batch_write
+        for name, ops in data['RequestItems'].iteritems():
+            desc, items = self._table(name)
+            units = 0.0
+            left = []
+            for op in ops:
+                if budget <= 0:
+                    left.append(op)
+                    continue
+                budget -= 1
+                if 'PutRequest' in op:
+                    item = op['PutRequest']['Item']
+                    items[self._item_key(desc['KeySchema'], item)] = item
+                    units += _units(_size(item))
+                else:
+                    k = self._key(desc['KeySchema'],
+                                  op['DeleteRequest']['Key'])
+                    items.pop(k, None)
+                    units += 1.0
+            responses[name] = {'ConsumedCapacityUnits': units}
+            if left:
+                unprocessed[name] = left
+        return {'Responses': responses, 'UnprocessedItems': unprocessed}
+
+    # QUERY AND SCAN
+
+    def _matches(self, value, cond):
+        op = cond['ComparisonOperator']
+        args = [_key_value(v) for v in cond.get('AttributeValueList', [])]
+        if op == 'NULL':
+            return value is None
+        if op == 'NOT_NULL':
+            return value is not None
+        if value is None:
+            return False
+        value = _key_value(value)
+        if op == 'EQ':
+            return value == args[0]
+        if op == 'NE':
+            return value != args[0]
+        if op == 'LT':
+            return value < args[0]
+        if op == 'LE':
+            return value <= args[0]
+        if op == 'GT':
+            return value > args[0]
+        if op == 'GE':
+            return value >= args[0]
+        if op == 'BETWEEN':
+            return args[0] <= value <= args[1]
+        if op == 'BEGINS_WITH':
+            return value.startswith(args[0])
+        if op == 'IN':
+            return value in args
+        if op == 'CONTAINS':
+            return args[0] in value
+        if op == 'NOT_CONTAINS':
+            return args[0] not in value
+        raise ValueError(op)
+
+    def _page(self, desc, candidates, data, filt=None):
+        schema = desc['KeySchema']
+        start = data.get('ExclusiveStartKey')
+        if start is not None:
+            start = self._key(schema, start)
+            candidates = [(k, v) for k, v in candidates
+                          if (k > start) != (not data.get('_forward', True))
+                          and k != start]
+        limit = min(data.get('Limit') or self.page_size, self.page_size)
+        page = candidates[:limit]
+        ret = {'Items': [], 'Count': 0, 'ScannedCount': len(page),
+               'ConsumedCapacityUnits': 0.0}
+        size = 0
+        for k, item in page:
+            size += _size(item)
+            if filt is not None and not filt(item):
+                continue
+            ret['Items'].append(self._project(item,
+                                              data.get('AttributesToGet')))
+        ret['Count'] = len(ret['Items'])
+        ret['ConsumedCapacityUnits'] = _units(size) / 2.0
+        if len(candidates) > limit:
+            ret['LastEvaluatedKey'] = self._key_of(schema, page[-1][1])
+        if data.get('Count'):
+            del ret['Items']
+        return ret
+
+    def _Query(self, data):
+        desc, items = self._table(data['TableName'])
+        hk = _key_value(data['HashKeyValue'])
+        forward = data.get('ScanIndexForward', True)
+        cond = data.get('RangeKeyCondition')
+        rk_name = desc['KeySchema']['RangeKeyElement']['AttributeName']
+        candidates = sorted(((k, v) for k, v in items.iteritems()
+                             if k[0] == hk and (cond is None or
+                                 self._matches(v.get(rk_name), cond))),
+                            reverse=not forward)
+        data['_forward'] = forward
+        return self._page(desc, candidates, data)
+
+    def _Scan(self, data):
+        desc, items = self._table(data['TableName'])
+        candidates = sorted(items.iteritems())
+        if 'TotalSegments' in data:
+            total, segment = data['TotalSegments'], data['Segment']
+            candidates = [(k, v) for k, v in candidates
+                          if hash(k) % total == segment]
+        filters = data.get('ScanFilter') or {}
+        def filt(item):
+            for name, cond in filters.iteritems():
+                if not self._matches(item.get(name), cond):
+                    return False
+            return True
+        return self._page(desc, candidates, data, filt)
+
+
+def install(latency=0.0, prefix='bench_', **kw):
+    """
+    Points :class:`pynamo.Configure` at a fresh in-memory backend and returns
+    its :class:`FakeLayer1` so callers can inspect request counts.
+    """
+    layer2 = Layer2('fake', 'fake')
+    layer2.layer1 = FakeLayer1(latency=latency, **kw)
+    Configure._connection = layer2
+    Configure.TABLE_PREFIX = prefix
+    return layer2.layer1
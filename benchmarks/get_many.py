@@ -0,0 +1,50 @@
+"""
+Wall-clock time of :meth:`PersistentObject.get_many` at increasing levels of
+`concurrency` against a backend that takes `--latency` seconds per request.
+
+    python -m benchmarks.get_many --keys 5000 --latency 0.02
+"""
+import sys, time, optparse
+from pynamo import PersistentObject, Meta, StringField, IntegerField
+from . import fakedb
+
+
+class BenchItem(PersistentObject):
+    table_name = Meta('get_many')
+
+    key = StringField(hash_key=True)
+    value = IntegerField()
+
+
+def populate(n):
+    BenchItem.create_table(wait=False)
+    for i in xrange(n):
+        BenchItem.create(key='key-%d' % i, value=i).save()
+    return ['key-%d' % i for i in xrange(n)]
+
+
+def main(argv=None):
+    parser = optparse.OptionParser()
+    parser.add_option('--keys', type='int', default=5000)
+    parser.add_option('--latency', type='float', default=0.02)
+    parser.add_option('--levels', default='1,2,4,8,16')
+    opts, args = parser.parse_args(argv)
+
+    layer1 = fakedb.install()
+    keys = populate(opts.keys)
+    layer1.latency = opts.latency
+    print '%d keys, %.0fms per request' % (opts.keys, opts.latency * 1000)
+    base = None
+    for level in map(int, opts.levels.split(',')):
+        t1 = time.time()
+        ret = BenchItem.get_many(keys, concurrency=level)
+        elapsed = time.time() - t1
+        assert [o.key for o in ret] == keys
+        if base is None:
+            base = elapsed
+        print 'concurrency=%-3d %8.3fs  %5.1fx' % (level, elapsed,
+                                                   base / elapsed)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,41 @@
+"""
+Per-ID cost of generating LexicalUUIDs one at a time and in batches, and of
+round-tripping them through their int, bytes and string forms.
+
+    python -m benchmarks.lexical_uuid --ids 100000
+"""
+import sys, time, optparse
+from pynamo.lexical_uuid import LexicalUUID
+
+
+def timed(label, n, func):
+    t1 = time.time()
+    ret = func()
+    elapsed = time.time() - t1
+    print '%-16s %8.3fs %8.2fus/id' % (label, elapsed, elapsed / n * 1e6)
+    return ret
+
+
+def main(argv=None):
+    parser = optparse.OptionParser()
+    parser.add_option('--ids', type='int', default=100000)
+    opts, args = parser.parse_args(argv)
+    n = opts.ids
+
+    ids = timed('new', n, lambda: [LexicalUUID() for i in xrange(n)])
+    if hasattr(LexicalUUID, 'batch'):
+        timed('batch', n, lambda: LexicalUUID.batch(n))
+    ints = [u.int for u in ids]
+    timed('from int', n, lambda: [LexicalUUID(i) for i in ints])
+    raw = [u.bytes for u in ids]
+    timed('to bytes', n, lambda: [u.bytes for u in ids])
+    timed('from bytes', n, lambda: [LexicalUUID(b) for b in raw])
+    strings = timed('encode', n, lambda: [u.encode() for u in ids])
+    timed('decode', n, lambda: [LexicalUUID.decode(s) for s in strings])
+    if hasattr(LexicalUUID, 'encode_many'):
+        timed('encode_many', n, lambda: LexicalUUID.encode_many(ids))
+        timed('decode_many', n, lambda: LexicalUUID.decode_many(strings))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,115 @@
+"""
+Bytes held per object for the models of `tests/common.py`, built from items
+the way a scan builds them and with every field read once. Each model is
+measured as declared and as a `compact` copy.
+
+    python -m benchmarks.memory --objects 20000
+"""
+import sys, gc, optparse
+from boto.dynamodb.item import Item
+from pynamo import (PersistentObject, Meta, Field, StringField, IntegerField,
+                    FloatField, BoolField, DictField, ListField,
+                    StringSetField, NumberSetField)
+from . import fakedb
+
+
+def deep_size(obj):
+    """
+    The size of `obj`, its item and the dictionaries hanging off both. The
+    field values are left out, every layout holds them.
+    """
+    size = sys.getsizeof(obj)
+    for holder in (obj, obj._item):
+        d = getattr(holder, '__dict__', None)
+        if d is not None:
+            size += sys.getsizeof(d)
+    size += sys.getsizeof(obj._item)
+    if obj._property_cache is not None:
+        size += sys.getsizeof(obj._property_cache)
+    return size
+
+
+def rss():
+    """
+    The resident set size of this process in bytes, or `None` off Linux.
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * 4096
+    except IOError:
+        return None
+
+
+def compact_copy(cls):
+    """
+    A class with the fields and metadata of `cls`, and `compact` set.
+    """
+    attrs = dict((k, v) for k, v in vars(cls).iteritems()
+                 if isinstance(v, (Field, Meta)))
+    attrs['compact'] = Meta(True)
+    return type('Compact' + cls.__name__, (PersistentObject,), attrs)
+
+
+SAMPLES = [(StringField, lambda i: 'value-%d' % i),
+           (IntegerField, lambda i: i),
+           (FloatField, lambda i: i * 1.5),
+           (BoolField, lambda i: i % 2 == 0),
+           (DictField, lambda i: {'n': i}),
+           (ListField, lambda i: [i, 'x']),
+           (StringSetField, lambda i: set(['a', str(i)])),
+           (NumberSetField, lambda i: set([i, i + 1]))]
+
+
+def attrs_for(cls, i):
+    """
+    The attributes of the `i`th item of `cls`, every field set.
+    """
+    ret = {}
+    for name, field in cls._property_instances.iteritems():
+        for kind, sample in SAMPLES:
+            if isinstance(field, kind):
+                ret[name] = field.from_python(sample(i))
+                break
+    ret[cls._hash_key_name] = 'key-%d' % i
+    return ret
+
+
+def measure(cls, n):
+    table = cls._table
+    rows = [attrs_for(cls, i) for i in xrange(n)]
+    gc.collect()
+    before = rss()
+    objs = []
+    for attrs in rows:
+        obj = cls(Item(table, attrs=dict(attrs)))
+        for name in cls._properties:
+            getattr(obj, name)
+        objs.append(obj)
+    gc.collect()
+    after = rss()
+    per_rss = None if before is None else (after - before) / float(n)
+    return sum(deep_size(o) for o in objs) / float(n), per_rss
+
+
+def main(argv=None):
+    parser = optparse.OptionParser()
+    parser.add_option('--objects', type='int', default=20000)
+    opts, args = parser.parse_args(argv)
+
+    fakedb.install()
+    from tests import common
+    models = [v for k, v in sorted(vars(common).iteritems())
+              if isinstance(v, type) and issubclass(v, PersistentObject) and
+              v is not PersistentObject and v.__module__ == common.__name__]
+    print '%-40s %12s %12s' % ('model', 'bytes/object', 'rss/object')
+    for model in models:
+        for cls in (model, compact_copy(model)):
+            cls.create_table(wait=False)
+            size, per_rss = measure(cls, opts.objects)
+            print '%-40s %12.0f %12s' % (
+                cls.__name__, size,
+                '-' if per_rss is None else '%.0f' % per_rss)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
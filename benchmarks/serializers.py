@@ -0,0 +1,59 @@
+"""
+Encode and decode time, and stored bytes, of a large repetitive dictionary
+for every serializer, with and without compression. Serializers whose
+packages are missing are skipped.
+
+    python -m benchmarks.serializers --rows 400 --repeat 200
+"""
+import sys, time, optparse
+from boto.dynamodb.types import Binary
+from pynamo.serializers import _serializers, get_serializer, encode, decode
+
+
+def document(rows):
+    """
+    Roughly what our large dict attributes hold.
+    """
+    return {'version': 3,
+            'rows': [{'id': i, 'status': 'active', 'score': i * 0.25,
+                      'tags': ['alpha', 'beta'], 'owner': 'user-%d' % (i % 7)}
+                     for i in xrange(rows)]}
+
+
+def stored_size(raw):
+    return len(raw.value) if isinstance(raw, Binary) else len(raw)
+
+
+def main(argv=None):
+    parser = optparse.OptionParser()
+    parser.add_option('--rows', type='int', default=400)
+    parser.add_option('--repeat', type='int', default=200)
+    parser.add_option('--compress-over', type='int', default=1024)
+    opts, args = parser.parse_args(argv)
+
+    value = document(opts.rows)
+    print '%-20s %10s %12s %12s' % ('serializer', 'bytes', 'encode us',
+                                    'decode us')
+    for name in sorted(_serializers):
+        try:
+            serializer = get_serializer(name)
+        except ImportError:
+            print '%-20s skipped, not installed' % name
+            continue
+        for compress_over in (None, opts.compress_over):
+            t1 = time.time()
+            for i in xrange(opts.repeat):
+                raw = encode(value, serializer, compress_over)
+            encoded = time.time() - t1
+            t1 = time.time()
+            for i in xrange(opts.repeat):
+                decode(raw, serializer)
+            decoded = time.time() - t1
+            label = name if compress_over is None else name + '+zlib'
+            print '%-20s %10d %12.1f %12.1f' % (
+                label, stored_size(raw), encoded / opts.repeat * 1e6,
+                decoded / opts.repeat * 1e6)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -3,4 +3,7 @@ from .persistent_object import PersistentObject, Meta
 from .fields import (Field, StringField, IntegerField, FloatField, BoolField, 
                      SetField, NumberSetField, StringSetField, ObjectField,
                      DefaultObjectField, ListField, DictField, LexicalUUIDField)
-from .exceptions import NotFoundError, ValidationError
\ No newline at end of file
+from .exceptions import (NotFoundError, ValidationError, BatchRetryError,
+                         UnloadedFieldError)
+from .retry import RetryPolicy
+from .session import Session
\ No newline at end of file
@@ -0,0 +1,284 @@
+import sys, csv, json, time, logging, itertools, optparse, importlib
+from .fields import (IntegerField, FloatField, BoolField, LexicalUUIDField,
+                     SetField, ObjectField, StringField)
+from .lexical_uuid import LexicalUUID
+from .retry import BatchStats, Throttle
+from .checkpoint import Checkpoint, FileCheckpoint
+from .exceptions import ValidationError
+
+__doc__ = """
+Loading many records into a table from a file, as an API::
+
+    with open('users.jsonl') as f:
+        progress = bulk.load(User, bulk.read_jsonl(f), concurrency=8,
+                             checkpoint=FileCheckpoint('users.ckpt'))
+
+or from the command line::
+
+    python -m pynamo.bulk myapp.models:User users.csv --format csv \\
+        --checkpoint users.ckpt --concurrency 8 --write-fraction 0.5
+
+Records are validated by the fields of the class, given keys through
+`hash_key_format` like :meth:`PersistentObject.create` and written with
+:meth:`PersistentObject.save_many` in chunks. The checkpoint records how many
+records were written, so running the same load again resumes after them.
+"""
+
+logger = logging.getLogger(__name__)
+
+
+def _parse_bool(value):
+    if isinstance(value, basestring):
+        value = value.strip().lower()
+        if value in ('1', 'true', 'yes', 't', 'y'):
+            return True
+        if value in ('0', 'false', 'no', 'f', 'n'):
+            return False
+        raise ValueError('%r is not a boolean' % (value,))
+    return bool(value)
+
+
+def _parse_uuid(value):
+    if isinstance(value, basestring):
+        if value.isdigit():
+            return LexicalUUID(long(value))
+        return LexicalUUID.decode(value)
+    return LexicalUUID(value)
+
+
+def _parse_json(value):
+    if isinstance(value, basestring):
+        return json.loads(value)
+    return value
+
+
+def _parse_set(value):
+    return set(_parse_json(value))
+
+
+def _parse_number(kind):
+    def parse(value):
+        if isinstance(value, basestring):
+            return kind(value.strip())
+        return kind(value)
+    return parse
+
+
+# what text and JSON values are turned into, by field class. Subclasses use
+# the parser of their closest base
+PARSERS = {
+    LexicalUUIDField: _parse_uuid,
+    IntegerField: _parse_number(int),
+    FloatField: _parse_number(float),
+    BoolField: _parse_bool,
+    SetField: _parse_set,
+    ObjectField: _parse_json,
+    StringField: None,
+}
+
+
+def _parser(field):
+    for klass in type(field).__mro__:
+        if klass in PARSERS:
+            return PARSERS[klass]
+    return None
+
+
+def coerce(cls, record):
+    """
+    Converts the values of `record`, e.g. a CSV row of strings, to the types
+    of the fields of `cls`. Empty strings are left out. Raises
+    :class:`pynamo.exceptions.ValidationError` for values that can't be
+    converted.
+    """
+    ret = {}
+    fields = cls._property_instances
+    for name, value in record.iteritems():
+        if value is None or value == '':
+            continue
+        field = fields.get(name)
+        parse = None if field is None else _parser(field)
+        if parse is not None:
+            try:
+                value = parse(value)
+            except (ValueError, TypeError), e:
+                raise ValidationError('%s: %s' % (name, e))
+        ret[name] = value
+    return ret
+
+
+def read_jsonl(f):
+    """
+    The records of a file with one JSON object per line.
+    """
+    for line in f:
+        if line.strip():
+            yield json.loads(line)
+
+
+def read_csv(f, **kw):
+    """
+    The records of a CSV file whose first row names the fields. Keyword
+    arguments are passed to `csv.DictReader`.
+    """
+    return csv.DictReader(f, **kw)
+
+
+class Progress(object):
+    """
+    How far a :func:`load` got. `offset` is the number of records of the
+    input that were handled, `written` and `invalid` how many of those were
+    written and skipped in this run.
+    """
+    def __init__(self, offset=0):
+        self.offset = offset
+        self.written = 0
+        self.invalid = 0
+        self.started = time.time()
+        self.stats = BatchStats()
+
+    @property
+    def elapsed(self):
+        return time.time() - self.started
+
+    @property
+    def rows_per_second(self):
+        elapsed = self.elapsed
+        return self.written / elapsed if elapsed > 0 else 0.0
+
+    def __repr__(self):
+        return ('<Progress offset=%d written=%d invalid=%d %.1f rows/s '
+                'ConsumedCapacityUnits=%f>' % (
+                    self.offset, self.written, self.invalid,
+                    self.rows_per_second, self.stats.consumed_capacity))
+
+
+def load(cls, records, concurrency=None, chunk_size=None, write_fraction=None,
+         checkpoint=None, on_invalid=None, progress=None):
+    """
+    Writes `records`, dictionaries of field values, as new items of `cls`,
+    replacing any items with the same keys. Returns a :class:`Progress`.
+
+    :type cls: type
+    :param cls: The :class:`PersistentObject` subclass
+
+    :type records: iterable
+    :param records: The records, e.g. from :func:`read_jsonl` or
+        :func:`read_csv`. Their values are converted with :func:`coerce`
+
+    :type concurrency: int
+    :param concurrency: How many `BatchWriteItem` requests are in flight at
+        once. Defaults to the class's `batch_concurrency`
+
+    :type chunk_size: int
+    :param chunk_size: How many records are written between checkpoints.
+        Defaults to enough to keep every request in flight busy four times
+
+    :type write_fraction: float
+    :param write_fraction: Keep the load under this fraction of the
+        table's write units
+
+    :type checkpoint: :class:`pynamo.checkpoint.Checkpoint`
+    :param checkpoint: Where the number of records written is recorded. The
+        records a previous load with the same checkpoint wrote are skipped
+
+    :type on_invalid: callable
+    :param on_invalid: Called with the offset, record and exception of every
+        record that fails validation, which is then skipped. Without it the
+        exception is raised
+
+    :type progress: callable
+    :param progress: Called with the :class:`Progress` after every chunk
+    """
+    cls._load_meta()
+    if concurrency is None:
+        concurrency = cls.__batch_concurrency__
+    if chunk_size is None:
+        chunk_size = 25 * concurrency * 4
+    if checkpoint is None:
+        checkpoint = Checkpoint()
+    # a single segment, positioned at the number of records handled
+    checkpoint.start(1)
+    state = Progress()
+    if 0 in checkpoint.done:
+        return state
+    state.offset = checkpoint.positions.get(0, 0)
+    throttle = None
+    if write_fraction is not None:
+        throttle = Throttle(cls.__write_units__ * write_fraction)
+    records = itertools.islice(records, state.offset, None)
+    while True:
+        chunk = list(itertools.islice(records, chunk_size))
+        if not len(chunk):
+            break
+        objs = []
+        for i, record in enumerate(chunk):
+            try:
+                objs.append(cls.create(coerce(cls, record)))
+            except (ValidationError, ValueError, KeyError), e:
+                if on_invalid is None:
+                    raise
+                state.invalid += 1
+                on_invalid(state.offset + i, record, e)
+        consumed = state.stats.consumed_capacity
+        cls.save_many(objs, concurrency=concurrency, stats=state.stats)
+        if throttle is not None:
+            throttle.charge(state.stats.consumed_capacity - consumed)
+        state.written += len(objs)
+        state.offset += len(chunk)
+        checkpoint.update(0, state.offset)
+        if progress is not None:
+            progress(state)
+    checkpoint.update(0, None)
+    return state
+
+
+def _import(path):
+    module, name = path.split(':', 1)
+    return getattr(importlib.import_module(module), name)
+
+
+def main(argv=None):
+    parser = optparse.OptionParser(
+        usage='%prog module:Class FILE [options]',
+        description='Loads the records of a JSONL or CSV file into the '
+                    'table of a PersistentObject class.')
+    parser.add_option('--format', choices=['jsonl', 'csv'], default=None,
+                      help='jsonl or csv, by default from the file name')
+    parser.add_option('--checkpoint', default=None,
+                      help='a file recording progress, to resume from')
+    parser.add_option('--concurrency', type='int', default=None)
+    parser.add_option('--chunk-size', type='int', default=None)
+    parser.add_option('--write-fraction', type='float', default=None)
+    parser.add_option('--skip-invalid', action='store_true', default=False,
+                      help='log and skip records that fail validation')
+    opts, args = parser.parse_args(argv)
+    if len(args) != 2:
+        parser.error('a class and a file are required')
+    logging.basicConfig(level=logging.INFO)
+    cls = _import(args[0])
+    fmt = opts.format
+    if fmt is None:
+        fmt = 'csv' if args[1].endswith('.csv') else 'jsonl'
+    checkpoint = None
+    if opts.checkpoint is not None:
+        checkpoint = FileCheckpoint(opts.checkpoint)
+    on_invalid = None
+    if opts.skip_invalid:
+        def on_invalid(offset, record, error):
+            logger.warning('Skipped record %d: %s', offset, error)
+    def report(state):
+        logger.info('%d records, %d written, %.1f rows/s', state.offset,
+                    state.written, state.rows_per_second)
+    with open(args[1], 'rb' if fmt == 'csv' else 'r') as f:
+        records = read_csv(f) if fmt == 'csv' else read_jsonl(f)
+        state = load(cls, records, concurrency=opts.concurrency,
+                     chunk_size=opts.chunk_size,
+                     write_fraction=opts.write_fraction,
+                     checkpoint=checkpoint, on_invalid=on_invalid,
+                     progress=report)
+    logger.info('Done: %r', state)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,222 @@
+import threading, collections, time
+from .retry import estimate_size
+
+__doc__ = """
+Read-through caching of items for :class:`pynamo.PersistentObject` subclasses
+that declare the `cache` :class:`pynamo.Meta`, and of the keys known to be
+missing for those that declare `negative_cache`.
+
+Any object with the methods of :class:`LRUCache` (`get`, `put`,
+`invalidate` and `clear`) may be used as a cache. It is handed the full key
+of an item and its raw attributes.
+"""
+
+
+class LRUCache(object):
+    """
+    An in-process cache of up to `max_items` items taking up to `max_bytes`,
+    evicting the least recently used first. Items expire `ttl` seconds after
+    they were stored. Thread safe.
+
+    Attributes are copied on the way in and out so objects built from the
+    cache never share state with each other or with the cache.
+
+    :type max_items: int
+    :param max_items: How many items to keep. `None` is unlimited
+
+    :type max_bytes: int
+    :param max_bytes: The most bytes the items may take up, estimated the
+        same way as DynamoDB. `None` is unlimited
+
+    :type ttl: float
+    :param ttl: Seconds after which an item is refetched. `None` never
+        expires items
+    """
+    def __init__(self, max_items=10000, max_bytes=None, ttl=None):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        # key -> (expires, size, attrs), least recently used first
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """
+        Returns a copy of the attributes stored for `key`, or `None`.
+        """
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires, size, attrs = entry
+            if expires is not None and expires <= time.time():
+                self.size -= size
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries[key] = entry
+            self.hits += 1
+        return copy_attrs(attrs)
+
+    def put(self, key, attrs):
+        """
+        Stores a copy of `attrs` for `key`.
+        """
+        size = estimate_size(attrs)
+        if self.max_bytes is not None and size > self.max_bytes:
+            self.invalidate(key)
+            return
+        expires = None
+        if self.ttl is not None:
+            expires = time.time() + self.ttl
+        attrs = copy_attrs(attrs)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= old[1]
+            self._entries[key] = (expires, size, attrs)
+            self.size += size
+            while ((self.max_items is not None and
+                        len(self._entries) > self.max_items) or
+                   (self.max_bytes is not None and
+                        self.size > self.max_bytes)):
+                key, (expires, size, attrs) = self._entries.popitem(last=False)
+                self.size -= size
+                self.evictions += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self.size -= entry[1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def stats(self):
+        """
+        The counters as a dictionary.
+        """
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses,
+                    'evictions': self.evictions,
+                    'expirations': self.expirations,
+                    'items': len(self._entries), 'bytes': self.size}
+
+
+class NegativeCache(object):
+    """
+    Remembers up to `max_items` keys that were confirmed missing, for `ttl`
+    seconds each, evicting the least recently confirmed first. Thread safe.
+
+    :type max_items: int
+    :param max_items: How many keys to remember
+
+    :type ttl: float
+    :param ttl: Seconds after which a key is looked up again
+    """
+    def __init__(self, max_items=10000, ttl=30.0):
+        self.max_items = max_items
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # key -> expires, oldest first
+        self._keys = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, key):
+        with self._lock:
+            expires = self._keys.get(key)
+            if expires is not None and expires <= time.time():
+                del self._keys[key]
+                expires = None
+            if expires is None:
+                self.misses += 1
+                return False
+            self.hits += 1
+            return True
+
+    def add(self, key):
+        with self._lock:
+            self._keys.pop(key, None)
+            self._keys[key] = time.time() + self.ttl
+            while len(self._keys) > self.max_items:
+                self._keys.popitem(last=False)
+                self.evictions += 1
+
+    def discard(self, key):
+        with self._lock:
+            self._keys.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._keys.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses,
+                    'evictions': self.evictions, 'items': len(self._keys)}
+
+
+def copy_attrs(attrs):
+    """
+    Copies the attributes of an item so the copy shares no mutable state.
+    """
+    # the values are immutable apart from sets
+    return dict((k, set(v) if isinstance(v, set) else v)
+                for k, v in attrs.iteritems())
+
+
+_lock = threading.Lock()
+
+
+def _get(cls, options, attr, factory):
+    # instances may be empty, and so false
+    if options is None or options is False:
+        return None
+    cache = cls.__dict__.get(attr)
+    if cache is not None:
+        return cache
+    with _lock:
+        cache = cls.__dict__.get(attr)
+        if cache is None:
+            if isinstance(options, dict):
+                cache = factory(**options)
+            elif options is True:
+                cache = factory()
+            else:
+                cache = options
+            setattr(cls, attr, cache)
+    return cache
+
+
+def get_cache(cls):
+    """
+    Returns the cache of a class that declares `cache`, creating it on first
+    use, or `None` for classes that don't.
+    """
+    return _get(cls, cls.__cache__, '_cache', LRUCache)
+
+
+def get_negative_cache(cls):
+    """
+    Returns the :class:`NegativeCache` of a class that declares 
+    `negative_cache`, or `None` for classes that don't.
+    """
+    return _get(cls, cls.__negative_cache__, '_negative_cache', 
+                NegativeCache)
@@ -0,0 +1,87 @@
+import os, json, threading
+
+__doc__ = """
+Progress records for long running scans, so a job that crashed can resume
+each segment from where it had got to instead of starting over.
+"""
+
+
+class Checkpoint(object):
+    """
+    The position of every segment of a :meth:`PersistentObject.scan`, kept
+    in memory. The position is the key of the last item of the last page
+    that was handed to the consumer, so after resuming, an item may be seen
+    again but none is skipped.
+    """
+    def __init__(self):
+        self.segments = None
+        self.positions = {}
+        self.done = set()
+        self._lock = threading.Lock()
+
+    def start(self, segments):
+        """
+        Called when a scan starts. Raises `ValueError` if the checkpoint was
+        recorded with a different number of segments.
+        """
+        if self.segments is None:
+            self.segments = segments
+        elif self.segments != segments:
+            raise ValueError('The checkpoint was recorded for %d segments, '
+                             'not %d' % (self.segments, segments))
+
+    def update(self, segment, key):
+        """
+        Records that `segment` got up to `key`, `None` when it is finished.
+        """
+        with self._lock:
+            if key is None:
+                self.positions.pop(segment, None)
+                self.done.add(segment)
+            else:
+                self.positions[segment] = key
+            self.save()
+
+    @property
+    def finished(self):
+        return self.segments is not None and len(self.done) == self.segments
+
+    def save(self):
+        pass
+
+
+class FileCheckpoint(Checkpoint):
+    """
+    A :class:`Checkpoint` stored as JSON at `path` and rewritten atomically
+    after every page. Keys must be strings or numbers.
+    """
+    def __init__(self, path):
+        super(FileCheckpoint, self).__init__()
+        self.path = path
+        if os.path.exists(path):
+            with open(path) as f:
+                self.restore(json.load(f))
+
+    def restore(self, data):
+        """
+        Sets the progress from what :meth:`dump` returned.
+        """
+        self.segments = data['segments']
+        self.done = set(data['done'])
+        for segment, key in data['positions'].iteritems():
+            if isinstance(key, list):
+                key = tuple(key)
+            self.positions[int(segment)] = key
+
+    def dump(self):
+        """
+        The progress as a JSON serializable dictionary.
+        """
+        return {'segments': self.segments, 'done': sorted(self.done),
+                'positions': self.positions}
+
+    def save(self):
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.dump(), f)
+        os.rename(tmp, self.path)
@@ -0,0 +1,214 @@
+from .exceptions import ValidationError
+
+__doc__ = """
+The per-class routines that move field values between Python and the
+attributes of a `boto.dynamodb.item.Item`. :class:`PersistentObjectMeta`
+builds a :class:`Codec` for every class once, so reading, writing and
+rendering fields don't repeat the lookups of the generic :class:`Field`
+descriptors.
+"""
+
+
+def _override(field, method):
+    """
+    The bound `method` of `field` unless its class inherits the no-op from
+    :class:`pynamo.fields.Field`, in which case `None` so it can be skipped.
+    """
+    from .fields import Field
+    if getattr(type(field), method).im_func is getattr(Field, method).im_func:
+        return None
+    return getattr(field, method)
+
+
+class Codec(object):
+    """
+    Converts, cleans and validates the fields of one class.
+
+    :type cls: type
+    :param cls: The :class:`PersistentObject` subclass
+
+    :type fields: dict
+    :param fields: Field name -> :class:`pynamo.fields.Field`
+    """
+    def __init__(self, cls, fields):
+        self.fields = fields
+        self.decoders = {}
+        self.encoders = {}
+        self.validators = {}
+        self.cleaners = {}
+        self.defaults = {}
+        for name, field in fields.iteritems():
+            self.decoders[name] = _override(field, 'to_python')
+            self.encoders[name] = _override(field, 'from_python')
+            self.validators[name] = _override(field, 'validate')
+            self.defaults[name] = _override(field, 'empty')
+            # an unbound method, called with the object
+            self.cleaners[name] = getattr(cls, 'clean_' + name, None)
+        # fields whose values are kept decoded, the item holds the others
+        self.decoded = frozenset(
+            name for name in fields
+            if self.decoders[name] is not None or 
+               self.defaults[name] is not None)
+        for name, field in fields.iteritems():
+            field.plain = name not in self.decoded
+        # fields whose decoded values may be changed in place
+        self.mutable = tuple(name for name in self.decoded
+                             if fields[name].mutable)
+        # to_dict renders the fields in declaration order
+        self.renderers = tuple((name, _override(fields[name], 'render'))
+                               for name in cls._properties)
+
+    def decode(self, name, raw):
+        decode = self.decoders[name]
+        value = raw if decode is None else decode(raw)
+        if value is None and self.defaults[name] is not None:
+            value = self.defaults[name]()
+        return value
+
+    def encode(self, obj, name, value):
+        """
+        Cleans and validates a Python value of field `name` of `obj` and
+        returns it and its attribute form.
+        """
+        clean = self.cleaners[name]
+        if clean is not None:
+            value, error = clean(obj, value)
+            if error is not None:
+                raise ValidationError(error)
+        validate = self.validators[name]
+        if validate is not None:
+            validate(value)
+        encode = self.encoders[name]
+        return value, value if encode is None else encode(value)
+
+    def get(self, obj, name):
+        """
+        Decodes field `name` of `obj` from its item, keeping the value if it
+        differs from the stored one.
+        """
+        if not obj._is_loaded(name):
+            obj._load_unprojected(name)
+        value = self.decode(name, obj._item.get(name, None))
+        if name in self.decoded:
+            self.remember(obj, name, value)
+        return value
+
+    def remember(self, obj, name, value):
+        """
+        Keeps the decoded `value` of field `name` of `obj`.
+        """
+        c = obj._property_cache
+        if c is None:
+            c = obj._property_cache = {}
+        c[name] = value
+
+    def set(self, obj, name, value):
+        if value is None:
+            return self.fields[name].__delete__(obj)
+        value, raw = self.encode(obj, name, value)
+        # the value is known now, even if it wasn't fetched
+        obj._mark_loaded(name)
+        old = obj._item.get(name, None)
+        # equal values may be encoded differently, e.g. dicts whose keys are
+        # ordered differently
+        if raw != old and (old is None or name not in self.decoded or
+                           self.decode(name, old) != value):
+            self.fields[name].do_set(obj, old, raw)
+        if name in self.decoded:
+            self.remember(obj, name, value)
+
+    def sync(self, obj):
+        """
+        Finds the values of `obj` that were changed in place, e.g. by 
+        appending to a list, by comparing them with the decoded values of the
+        item, and records them as updates. Returns whether `obj` has changes
+        to save.
+        """
+        cache = obj._property_cache
+        if not cache:
+            return obj._dirty
+        item = obj._item
+        for name in self.mutable:
+            if name not in cache:
+                continue
+            value = cache[name]
+            old = item.get(name, None)
+            if old is None and not value:
+                # the empty default of a missing attribute
+                continue
+            # comparing encodings would see changes in values that were only
+            # read, their encodings needn't be the same
+            if old is not None and self.decode(name, old) == value:
+                continue
+            value, raw = self.encode(obj, name, value)
+            if not raw:
+                # DynamoDB has no empty sets, emptying one removes it
+                self.fields[name].__delete__(obj)
+                continue
+            self.fields[name].do_set(obj, old, raw)
+        return obj._dirty
+
+    def from_item(self, attrs):
+        """
+        Decodes every field present in the attributes `attrs`.
+        """
+        ret = {}
+        for name, raw in attrs.iteritems():
+            if name in self.decoders:
+                ret[name] = self.decode(name, raw)
+        return ret
+
+    def to_item(self, obj, values):
+        """
+        Cleans, validates and encodes the Python `values` of fields of
+        `obj`, returning `(values, attrs)`. `None` values are left out.
+        """
+        cleaned = {}
+        attrs = {}
+        for name, value in values.iteritems():
+            if value is None:
+                continue
+            cleaned[name], attrs[name] = self.encode(obj, name, value)
+        return cleaned, attrs
+
+    def set_many(self, obj, values):
+        """
+        Sets several fields of `obj` at once. New objects have their whole
+        item written in one go.
+        """
+        if obj._exists:
+            for name, value in values.iteritems():
+                self.set(obj, name, value)
+            return
+        cleaned, attrs = self.to_item(obj, values)
+        if not len(attrs):
+            return
+        item = obj._item
+        for name, raw in attrs.iteritems():
+            item[name] = raw
+            if name in self.decoded:
+                self.remember(obj, name, cleaned[name])
+        obj._dirty = True
+
+    def to_dict(self, obj):
+        """
+        Renders the loaded fields of `obj`, see
+        :meth:`PersistentObject.to_dict`.
+        """
+        cache = obj._property_cache or {}
+        item = obj._item
+        projection = obj._projection
+        decoded = self.decoded
+        ret = {}
+        for name, render in self.renderers:
+            if projection is not None and name not in projection:
+                continue
+            if name not in decoded:
+                value = item.get(name, None)
+            elif name in cache:
+                value = cache[name]
+            else:
+                value = self.get(obj, name)
+            ret[name] = value if render is None else render(value)
+        return ret
+
@@ -0,0 +1,390 @@
+import sys, threading, collections, functools, Queue
+
+__doc__ = """
+Minimal threading primitives used to keep several DynamoDB requests in flight
+at once. Python 2 ships without `concurrent.futures` so this provides just
+enough of a pool for the batched operations.
+"""
+
+
+class Future(object):
+    """
+    The eventual result of a callable submitted to a :class:`WorkerPool`.
+    """
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._result = None
+        self._exc_info = None
+        self._callbacks = []
+
+    def done(self):
+        return self._event.is_set()
+
+    def set_result(self, result):
+        self._result = result
+        self._finish()
+
+    def set_exception(self, exc_info):
+        """
+        :type exc_info: tuple
+        :param exc_info: The triple returned by `sys.exc_info()`
+        """
+        self._exc_info = exc_info
+        self._finish()
+
+    def _finish(self):
+        with self._lock:
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for cb in callbacks:
+            cb(self)
+
+    def add_done_callback(self, fn):
+        """
+        Calls `fn` with this future once it completes. If it has already
+        completed `fn` is called immediately.
+        """
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(fn)
+                return
+        fn(self)
+
+    def then(self, fn):
+        """
+        Returns a new :class:`Future` for `fn` called with this future's 
+        result. Exceptions propagate to the new future without calling `fn`.
+        If `fn` returns a :class:`Future` the new future completes with it.
+        """
+        ret = Future()
+        def copy(f):
+            if f._exc_info is not None:
+                ret.set_exception(f._exc_info)
+            else:
+                ret.set_result(f._result)
+        def done(f):
+            if f._exc_info is not None:
+                ret.set_exception(f._exc_info)
+                return
+            try:
+                value = fn(f._result)
+            except Exception:
+                ret.set_exception(sys.exc_info())
+                return
+            if isinstance(value, Future):
+                value.add_done_callback(copy)
+            else:
+                ret.set_result(value)
+        self.add_done_callback(done)
+        return ret
+
+    def result(self, timeout=None):
+        """
+        Blocks until the result is available. Exceptions raised by the
+        callable are re-raised here with their original traceback.
+        """
+        if not self._event.wait(timeout):
+            raise RuntimeError('Timed out waiting for result')
+        if self._exc_info is not None:
+            raise self._exc_info[0], self._exc_info[1], self._exc_info[2]
+        return self._result
+
+
+class WorkerPool(object):
+    """
+    Up to `size` daemon threads pulling callables off a shared queue. Threads
+    are started lazily, only when every existing thread is busy.
+    """
+    def __init__(self, size):
+        if size < 1:
+            raise ValueError('A WorkerPool needs at least one thread')
+        self.size = size
+        self._queue = Queue.Queue()
+        self._lock = threading.Lock()
+        self._threads = []
+        self._idle = 0
+        self._shutdown = False
+
+    def submit(self, func, *a, **kw):
+        """
+        Schedules `func(*a, **kw)` and returns a :class:`Future` for it.
+        """
+        future = Future()
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError('Can not submit to a WorkerPool that has '
+                                   'been shut down')
+            if not self._idle and len(self._threads) < self.size:
+                t = threading.Thread(target=self._work)
+                t.daemon = True
+                self._threads.append(t)
+                t.start()
+            else:
+                self._idle -= 1
+        self._queue.put((future, func, a, kw))
+        return future
+
+    def _work(self):
+        while True:
+            task = self._queue.get()
+            if task is None:
+                return
+            future, func, a, kw = task
+            try:
+                ret = func(*a, **kw)
+            except Exception:
+                future.set_exception(sys.exc_info())
+            else:
+                future.set_result(ret)
+            with self._lock:
+                self._idle += 1
+
+    def shutdown(self, wait=True):
+        """
+        Stops the threads once they finish whatever is already queued.
+        """
+        with self._lock:
+            self._shutdown = True
+            threads = list(self._threads)
+        for t in threads:
+            self._queue.put(None)
+        if wait:
+            for t in threads:
+                t.join()
+
+
+class SingleFlight(object):
+    """
+    Lets concurrent callers asking for the same key share a single call. 
+    The first caller of a key leads and every caller arriving while it is
+    in flight joins it and waits for its result.
+
+    `calls` counts the calls that were led and `deduplicated` the ones that
+    joined another call instead.
+    """
+    def __init__(self):
+        self.calls = 0
+        self.deduplicated = 0
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def begin(self, keys):
+        """
+        Returns the keys the caller now leads and must :meth:`finish`, and a
+        dictionary of the other keys mapped to the :class:`Future` of the
+        caller leading them.
+        """
+        led = []
+        joined = {}
+        with self._lock:
+            for key in keys:
+                future = self._flights.get(key)
+                if future is None:
+                    self._flights[key] = Future()
+                    led.append(key)
+                    self.calls += 1
+                else:
+                    joined[key] = future
+                    self.deduplicated += 1
+        return led, joined
+
+    def finish(self, key, result):
+        """
+        Hands `result` to every caller that joined `key`.
+        """
+        with self._lock:
+            future = self._flights.pop(key)
+        future.set_result(result)
+
+    def stats(self):
+        with self._lock:
+            return {'calls': self.calls, 'deduplicated': self.deduplicated,
+                    'in_flight': len(self._flights)}
+
+
+def dispatch(func, tasks, concurrency=1, ready=None):
+    """
+    Calls `func` on every task keeping up to `concurrency` calls in flight and
+    yields each call's result as soon as it is available, in completion order.
+
+    `func` must return a `(result, more_tasks)` pair. `more_tasks` are run
+    ahead of the remaining tasks, which is how batched operations requeue 
+    their unprocessed keys. Exceptions raised by `func` are re-raised in the
+    consuming thread. With a `concurrency` of 1 everything runs serially in
+    the calling thread.
+
+    `tasks` is consumed lazily, only as calls complete and the consumer asks
+    for more results, so it may be an unbounded generator.
+
+    :type func: callable
+    :param func: Called with a single task
+
+    :type tasks: iterable
+    :param tasks: The initial tasks
+
+    :type concurrency: int
+    :param concurrency: The maximum number of calls in flight
+
+    :type ready: callable
+    :param ready: If provided, no new tasks are taken from `tasks` while it
+        returns `False` and other calls are still in flight. Follow-up tasks
+        are not held back.
+    """
+    source = iter(tasks)
+    followups = collections.deque()
+
+    def next_task(idle):
+        if followups:
+            return followups.popleft()
+        if idle or ready is None or ready():
+            return next(source, _NOTHING)
+        return _NOTHING
+
+    if concurrency <= 1:
+        while True:
+            task = next_task(True)
+            if task is _NOTHING:
+                return
+            result, more = func(task)
+            followups.extend(more)
+            yield result
+    pool = WorkerPool(concurrency)
+    completed = Queue.Queue()
+    in_flight = 0
+    try:
+        while True:
+            while in_flight < concurrency:
+                task = next_task(not in_flight)
+                if task is _NOTHING:
+                    break
+                pool.submit(func, task).add_done_callback(completed.put)
+                in_flight += 1
+            if not in_flight:
+                return
+            future = completed.get()
+            in_flight -= 1
+            result, more = future.result()
+            followups.extend(more)
+            yield result
+    finally:
+        pool.shutdown(wait=False)
+
+
+def dispatch_async(func, tasks, pool):
+    """
+    The non-blocking counterpart of :func:`dispatch`. Every task, and every
+    follow-up task, is submitted to `pool` right away, so the pool's size
+    is what limits how many calls are in flight. Returns a :class:`Future`
+    for the list of results in completion order, or for the first exception
+    raised.
+
+    :type func: callable
+    :param func: Called with a single task, returning `(result, more_tasks)`
+
+    :type tasks: iterable
+    :param tasks: The initial tasks
+
+    :type pool: :class:`WorkerPool`
+    :param pool: The pool to run the calls on
+    """
+    ret = Future()
+    lock = threading.Lock()
+    # one extra until every initial task has been submitted
+    state = {'in_flight': 1, 'failed': False}
+    results = []
+
+    def submit(task):
+        with lock:
+            state['in_flight'] += 1
+        pool.submit(func, task).add_done_callback(done)
+
+    def finish_one():
+        with lock:
+            state['in_flight'] -= 1
+            finished = not state['in_flight'] and not state['failed']
+        if finished:
+            ret.set_result(results)
+
+    def done(future):
+        with lock:
+            if state['failed']:
+                return
+            state['failed'] = future._exc_info is not None
+        if state['failed']:
+            ret.set_exception(future._exc_info)
+            return
+        result, more = future._result
+        for task in more:
+            submit(task)
+        with lock:
+            results.append(result)
+        finish_one()
+
+    for task in tasks:
+        submit(task)
+    finish_one()
+    return ret
+
+
+def gather(futures):
+    """
+    Returns a :class:`Future` for the list of results of `futures`, in the
+    same order, or for the first exception any of them raises.
+    """
+    futures = list(futures)
+    ret = Future()
+    results = [None] * len(futures)
+    lock = threading.Lock()
+    state = {'left': len(futures), 'failed': False}
+
+    def done(i, future):
+        with lock:
+            if state['failed']:
+                return
+            if future._exc_info is not None:
+                state['failed'] = True
+            else:
+                results[i] = future._result
+                state['left'] -= 1
+            finished = state['failed'] or not state['left']
+        if not finished:
+            return
+        if future._exc_info is not None:
+            ret.set_exception(future._exc_info)
+        else:
+            ret.set_result(results)
+
+    if not futures:
+        ret.set_result(results)
+    for i, future in enumerate(futures):
+        future.add_done_callback(functools.partial(done, i))
+    return ret
+
+
+def poll(pool, func, interval=1.0):
+    """
+    Calls `func` on `pool` every `interval` seconds, without holding a 
+    thread in between, until it returns something other than `None`. 
+    Returns a :class:`Future` for that value.
+    """
+    ret = Future()
+
+    def check():
+        try:
+            value = func()
+        except Exception:
+            ret.set_exception(sys.exc_info())
+            return
+        if value is not None:
+            ret.set_result(value)
+            return
+        timer = threading.Timer(interval, pool.submit, (check,))
+        timer.daemon = True
+        timer.start()
+
+    pool.submit(check)
+    return ret
+
+
+_NOTHING = object()
@@ -1,11 +1,16 @@
-import os
+import os, threading
 import boto
+from .concurrency import WorkerPool
 
 class Configure(object):
     AWS_ACCESS_KEY_ID = None
     AWS_SECRET_ACCESS_KEY = None
     _connection = None
     TABLE_PREFIX = None
+    # how many requests the future-returning methods keep in flight at once
+    MAX_CONNECTIONS = 16
+    _pool = None
+    _pool_lock = threading.Lock()
 
     @classmethod
     def with_environment_variables(cls):
@@ -39,6 +44,13 @@ class Configure(object):
                 aws_secret_access_key=cls.AWS_SECRET_ACCESS_KEY)
         return cls._connection
     
+    @classmethod
+    def get_pool(cls):
+        with cls._pool_lock:
+            if cls._pool is None:
+                cls._pool = WorkerPool(cls.MAX_CONNECTIONS)
+        return cls._pool
+    
     @classmethod
     def get_table_prefix(cls):
         return cls.TABLE_PREFIX
@@ -11,3 +11,22 @@ class ValidationError(Exception):
     invalid.
     """
     pass
+
+
+class UnloadedFieldError(Exception):
+    """
+    Thrown when reading a field that was left out of the `attributes_to_get`
+    of a read, on classes that set `strict_projection`.
+    """
+    pass
+
+
+class BatchRetryError(Exception):
+    """
+    Thrown by batch operations when DynamoDB keeps leaving keys unprocessed
+    and the configured :class:`pynamo.retry.RetryPolicy` runs out of attempts
+    or time. `unprocessed` holds the keys that were given up on.
+    """
+    def __init__(self, message, unprocessed=None):
+        super(BatchRetryError, self).__init__(message)
+        self.unprocessed = unprocessed or []
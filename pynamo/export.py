@@ -0,0 +1,227 @@
+import os, sys, json, gzip, time, zlib, logging, optparse
+from .checkpoint import FileCheckpoint
+from .bulk import _import
+
+__doc__ = """
+Dumping a table to JSON lines, one shard per scan segment, as an API::
+
+    manifest = export.export(User, '/backups/users', segments=8,
+                             read_fraction=0.2)
+
+or from the command line::
+
+    python -m pynamo.export myapp.models:User /backups/users \\
+        --segments 8 --read-fraction 0.2
+
+Every item is rendered with :meth:`PersistentObject.to_dict`. Shards are
+gzipped by default: each page is appended as its own gzip member, which
+`gzip`, `zcat` and :func:`read` treat as one stream. `manifest.json` in the
+directory records how far every segment got and how long its shard was at
+that point, so an interrupted export run again with the same arguments cuts
+off whatever was written after the last page it recorded and carries on
+from there. Nothing is exported twice or skipped.
+"""
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = 'manifest.json'
+
+
+def _json_default(value):
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    raise TypeError('%r is not JSON serializable' % (value,))
+
+
+class Manifest(FileCheckpoint):
+    """
+    A :class:`pynamo.checkpoint.FileCheckpoint` kept in `directory` that
+    also records the table, the compression and the length and item count
+    of every segment's shard.
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        self.table = None
+        self.compress = None
+        self.sizes = {}
+        self.counts = {}
+        super(Manifest, self).__init__(os.path.join(directory, MANIFEST))
+
+    def restore(self, data):
+        super(Manifest, self).restore(data)
+        self.table = data['table']
+        self.compress = data['compress']
+        for segment, shard in data['shards'].iteritems():
+            self.sizes[int(segment)] = shard['bytes']
+            self.counts[int(segment)] = shard['items']
+
+    def dump(self):
+        data = super(Manifest, self).dump()
+        data['table'] = self.table
+        data['compress'] = self.compress
+        data['shards'] = dict(
+            (segment, {'file': self.shard(segment), 'bytes': size,
+                       'items': self.counts.get(segment, 0)})
+            for segment, size in self.sizes.iteritems())
+        return data
+
+    def shard(self, segment):
+        """
+        The file name of the shard of `segment`, relative to the directory.
+        """
+        ext = '.jsonl.gz' if self.compress else '.jsonl'
+        return '%s-%05d%s' % (self.table, segment, ext)
+
+    def shard_path(self, segment):
+        return os.path.join(self.directory, self.shard(segment))
+
+    @property
+    def items(self):
+        return sum(self.counts.itervalues())
+
+
+def _open_shard(manifest, segment):
+    """
+    The shard of `segment` opened for appending, cut back to the length the
+    manifest recorded.
+    """
+    path = manifest.shard_path(segment)
+    f = open(path, 'ab')
+    f.truncate(manifest.sizes.get(segment, 0))
+    f.seek(0, os.SEEK_END)
+    return f
+
+
+def _encode_page(objs, compress):
+    data = ''.join(json.dumps(obj.to_dict(), default=_json_default) + '\n'
+                   for obj in objs)
+    if not compress:
+        return data
+    # a complete gzip member
+    c = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return c.compress(data) + c.flush()
+
+
+def export(cls, directory, segments=4, workers=None, read_fraction=None,
+           attributes_to_get=None, page_size=None, compress=True,
+           progress=None):
+    """
+    Writes every item of `cls` to JSON lines shards in `directory`,
+    resuming the export recorded there if there is one. Returns the
+    :class:`Manifest`.
+
+    :type cls: type
+    :param cls: The :class:`PersistentObject` subclass
+
+    :type directory: str
+    :param directory: Where the shards and manifest go, created if missing
+
+    :type segments: int
+    :param segments: How many parallel scan segments, and shards
+
+    :type workers: int
+    :param workers: How many `Scan` requests may be in flight at once
+
+    :type read_fraction: float
+    :param read_fraction: Keep the export under this fraction of the
+        `read_units` :class:`Meta`, see :meth:`PersistentObject.scan`
+
+    :type attributes_to_get: list
+    :param attributes_to_get: Only export these fields
+
+    :type page_size: int
+    :param page_size: The most items each `Scan` reads
+
+    :type compress: bool
+    :param compress: Whether shards are gzipped. Must match the export
+        being resumed
+
+    :type progress: callable
+    :param progress: Called with the :class:`Manifest` after every page
+    """
+    cls._load_meta()
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    manifest = Manifest(directory)
+    if manifest.table is None:
+        manifest.table = cls._full_table_name
+        manifest.compress = bool(compress)
+    elif (manifest.table != cls._full_table_name or
+            manifest.compress != bool(compress)):
+        raise ValueError('%s holds an export of %s (compress=%s)' % (
+            directory, manifest.table, manifest.compress))
+    shards = {}
+    pages = cls.scan_pages(segments, workers, None, attributes_to_get,
+                           manifest, read_fraction, page_size)
+    try:
+        for segment, objs, last_key in pages:
+            f = shards.get(segment)
+            if f is None:
+                f = shards[segment] = _open_shard(manifest, segment)
+            f.write(_encode_page(objs, manifest.compress))
+            f.flush()
+            os.fsync(f.fileno())
+            manifest.sizes[segment] = f.tell()
+            manifest.counts[segment] = manifest.counts.get(segment, 0) + \
+                len(objs)
+            manifest.update(segment, last_key)
+            if last_key is None:
+                f.close()
+                del shards[segment]
+            if progress is not None:
+                progress(manifest)
+    finally:
+        for f in shards.itervalues():
+            f.close()
+    return manifest
+
+
+def read(directory):
+    """
+    The records of every shard of the export in `directory`, e.g. for
+    :func:`pynamo.bulk.load`.
+    """
+    manifest = Manifest(directory)
+    for segment in sorted(manifest.sizes):
+        path = manifest.shard_path(segment)
+        opener = gzip.open if manifest.compress else open
+        with opener(path, 'rb') as f:
+            for line in f:
+                yield json.loads(line)
+
+
+def main(argv=None):
+    parser = optparse.OptionParser(
+        usage='%prog module:Class DIRECTORY [options]',
+        description='Exports the table of a PersistentObject class to JSON '
+                    'lines shards, resuming an earlier export to the same '
+                    'directory.')
+    parser.add_option('--segments', type='int', default=4)
+    parser.add_option('--workers', type='int', default=None)
+    parser.add_option('--read-fraction', type='float', default=None,
+                      help='the share of the read units to use at most')
+    parser.add_option('--page-size', type='int', default=None)
+    parser.add_option('--no-compress', action='store_false', default=True,
+                      dest='compress')
+    opts, args = parser.parse_args(argv)
+    if len(args) != 2:
+        parser.error('a class and a directory are required')
+    logging.basicConfig(level=logging.INFO)
+    cls = _import(args[0])
+    # items exported by an earlier run
+    before = Manifest(args[1]).items
+    started = time.time()
+    def report(manifest):
+        elapsed = time.time() - started
+        logger.info('%d items, %d of %d segments done, %.1f items/s',
+                    manifest.items, len(manifest.done), manifest.segments,
+                    (manifest.items - before) / elapsed if elapsed else 0.0)
+    manifest = export(cls, args[1], segments=opts.segments,
+                      workers=opts.workers, read_fraction=opts.read_fraction,
+                      page_size=opts.page_size, compress=opts.compress,
+                      progress=report)
+    logger.info('Done: %d items in %s', manifest.items, args[1])
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,4 +1,4 @@
-import json
+from . import serializers
 from .exceptions import ValidationError
 from .lexical_uuid import LexicalUUID
 
@@ -8,65 +8,69 @@ class Field(object):
     A base descriptor class which facilitates creating typed and validated 
     properties on :class:`PersistentObject` classes.
     """
+    # whether values can be changed in place, see 
+    # :meth:`pynamo.codec.Codec.sync`
+    mutable = False
+
     def __init__(self, **options):
         if self.__class__ == Field:
             raise TypeError('Field is a baseclass. Instantiate one of the '
                             'Field subclasses instead.')
         self.options = options
         self.name = None
+        # set by the class's codec when the stored value needs no decoding
+        self.plain = False
     
     def __get__(self, obj, type=None):
         if obj is None:
             return self
+        if self.plain and obj._projection is None:
+            # the item holds the value as is
+            return obj._item.get(self.name, None)
         c = obj._property_cache
-        if self.name not in c:
-            c[self.name] = self.to_python(obj._item.get(self.name, None))
-        return c[self.name]
+        if c is not None and self.name in c:
+            return c[self.name]
+        # decoding, and fetching unprojected fields, is precompiled per class
+        return obj._codec.get(obj, self.name)
 
     def __set__(self, obj, value):
-        if value is None:
-            return self.__delete__(obj)
-        c = obj._property_cache
-        c[self.name] = value
-        cleaner = getattr(obj, 'clean_' + self.name, lambda val: (val, None))
-        # clean it
-        value, error = cleaner(value)
-        if error is not None:
-            raise ValidationError(error)
-        # validate it
-        self.validate(value)
-        old_value = obj._item.get(self.name, None)
-        if value != old_value:
-            # convert it
-            value = self.from_python(value)
-            print 'from_python', self.name, ':', value
-            # see if it's actually any different and set it
-            self.do_set(obj, old_value, value)
+        obj._codec.set(obj, self.name, value)
     
     def do_set(self, obj, old_value, value, set_dirty=True):
         if obj._exists:
-            if old_value is None:
-                obj._item.add_attribute(self.name, value)
-            else:
-                obj._item.put_attribute(self.name, value)
+            # ADD would append to strings and sum numbers, only PUT replaces 
+            # whatever is stored
+            obj._item.put_attribute(self.name, value)
         obj._item[self.name] = value
-        obj._property_cache[self.name] = value
         if set_dirty:
             obj._dirty = True 
 
     def __delete__(self, obj):
+        if not obj._is_loaded(self.name):
+            # it may exist in the store, delete it there without fetching it
+            if obj._exists:
+                obj._item.delete_attribute(self.name)
+                obj._dirty = True
+            obj._mark_loaded(self.name)
         have_value = obj._item.get(self.name, None) != None
         if have_value:
             if obj._exists:
                 obj._item.delete_attribute(self.name)
             del obj._item[self.name]
             obj._dirty = True
-        if self.name in obj._property_cache:
-            del obj._property_cache[self.name]
+        c = obj._property_cache
+        if c is not None and self.name in c:
+            del c[self.name]
     
     def contribute_to_class(self, klass):
         pass
     
+    def empty(self):
+        """
+        The value of the field when the item doesn't have it.
+        """
+        return None
+    
     def to_python(self, value):
         return value
     
@@ -189,6 +193,7 @@ class SetField(Field):
     proto_val = None
     object_proto = set
     object_types = (set,)
+    mutable = True
 
     def __init__(self, *a, **kw):
         if self.__class__ == SetField:
@@ -203,17 +208,14 @@ class SetField(Field):
         return set(v)
     
     def from_python(self, value):
-        # convert it to a list, because `set`s don't serialize to JSON
+        # boto sends `set`s as DynamoDB's native number and string sets
         sup = super(SetField, self).from_python
         if value is None:
             return sup(value)
-        return sup(list(value))
+        return sup(set(value))
     
-    def __get__(self, obj, type=None):
-        r = super(SetField, self).__get__(obj, type=type)
-        if r is None:
-            r = obj._property_cache[self.name] = set()
-        return r
+    def empty(self):
+        return set()
     
     def validate(self, value):
         if not isinstance(value, set):
@@ -242,7 +244,7 @@ class SetField(Field):
         
         def do_update(instance, val):
             instance._item[self.name] = val
-            instance._property_cache[self.name] = val
+            instance._codec.remember(instance, self.name, val)
         
         def add_to_set(instance, items):
             """
@@ -284,8 +286,11 @@ class SetField(Field):
                 else:
                     instance._item.put_attribute(self.name, new_value)
                 instance._dirty = True
-                instance._item[self.name] = new_value
-                instance._property_cache[self.name] = new_value
+                # don't go through Item.__setitem__, it would replace the
+                # pending update with a PUT. the item keeps its own copy so
+                # changes made in place show up
+                dict.__setitem__(instance._item, self.name, set(new_value))
+                instance._codec.remember(instance, self.name, new_value)
         
         def remove_from_set(instance, items):
             """
@@ -326,10 +331,13 @@ class SetField(Field):
                 if instance._exists:
                     instance._item.delete_attribute(self.name, items)
                 else:
-                    instance._item.put_attribute(new_value)
+                    instance._item.put_attribute(self.name, new_value)
                 instance._dirty = True
-                instance._item[self.name] = new_value
-                instance._property_cache[self.name] = new_value
+                # don't go through Item.__setitem__, it would replace the
+                # pending update with a PUT. the item keeps its own copy so
+                # changes made in place show up
+                dict.__setitem__(instance._item, self.name, set(new_value))
+                instance._codec.remember(instance, self.name, new_value)
         
         setattr(klass, 'add_to_%s_set' % self.name, add_to_set)
         setattr(klass, 'remove_from_%s_set' % self.name, remove_from_set)
@@ -382,14 +390,26 @@ class ObjectField(StringField):
     allows for [somewhat] arbitrary objects to be saved in an attribute. JSON
     is chosen because it's a safe serialization format and does not pose any
     security risk to Python.
+
+    Another format may be chosen with the `serializer` option, the name of a
+    :class:`pynamo.serializers.Serializer` or an instance of one, and values
+    longer than `compress_over` bytes are compressed. See
+    :mod:`pynamo.serializers`.
     """
+    mutable = True
+
+    def __init__(self, serializer='json', compress_over=None, **options):
+        super(ObjectField, self).__init__(**options)
+        self.serializer = serializers.get_serializer(serializer)
+        self.compress_over = compress_over
+
     def to_python(self, value):
         if value is None:
             return value
-        return json.loads(value)
+        return serializers.decode(value, self.serializer)
     
     def from_python(self, value):
-        return json.dumps(value)
+        return serializers.encode(value, self.serializer, self.compress_over)
     
     def validate(self, value):
         pass # pretty much anything JSON-able is allowed here
@@ -403,13 +423,8 @@ class DefaultObjectField(ObjectField):
     object_proto = None
     object_types = None
 
-    def __get__(self, obj, type=None):
-        r = super(DefaultObjectField, self).__get__(obj, type=type)
-        if r is not None:
-            return r
-        d = obj._property_cache
-        d[self.name] = self.object_proto()
-        return d[self.name]
+    def empty(self):
+        return self.object_proto()
     
     def validate(self, value):
         if value is not None and not isinstance(value, self.object_types):
@@ -1,4 +1,4 @@
-import socket, os, struct, datetime, time, threading, string
+import socket, os, struct, datetime, time, threading, string, base64
 
 __doc__ = """
 An adaptation of https://github.com/jamesgolick/lexical_uuid for pythons.
@@ -40,67 +40,124 @@ class IncreasingMicrosecondClock(object):
         self.time = timestamp_factory()
     
     def __call__(self):
+        return self.reserve(1)
+
+    def reserve(self, n):
+        """
+        Returns the first of `n` consecutive timestamps that no other call 
+        returns, taking the mutex once.
+        """
         with self.mutex:
             new_time = self.timestamp_factory()
-            if new_time > self.time:
-                self.time = new_time
-            else:
-                self.time += 1
-            return self.time
+            if new_time <= self.time:
+                new_time = self.time + 1
+            self.time = new_time + n - 1
+            return new_time
+
+
+MASK_64 = (1 << 64) - 1
 
 
 class LexicalUUID(object):
-    worker_id = fnv1a_64("{}-{}".format(socket.getfqdn(), os.getpid()))
+    """
+    A 128 bit ID made of a 64 bit microsecond timestamp followed by a 64 bit
+    worker ID, so IDs sort by the time they were made. Only the 128 bit 
+    integer is stored.
+
+    Made from another LexicalUUID, its integer, its 16 bytes, its 36
+    character GUID form or a `datetime`. With no value a new ID is made 
+    from the clock and `worker_id`, which defaults to one derived from the
+    host name and process ID.
+    """
+    __slots__ = ('int',)
+    default_worker_id = fnv1a_64("{}-{}".format(socket.getfqdn(), os.getpid()))
     timestamp_factory = IncreasingMicrosecondClock()
     
     def __init__(self, value=None, worker_id=None):
-        if isinstance(value, self.__class__):
-            self.timestamp = value.timestamp
-            self.worker_id = value.worker_id
+        if value is None:
+            if worker_id is None:
+                worker_id = self.default_worker_id
+            self.int = (self.timestamp_factory() << 64) | worker_id
         elif isinstance(value, (int, long)):
-            bytes = ''
-            for sh in range(0, 128, 8):
-                bytes = chr((value >> sh) & 0xff) + bytes
-            self.from_bytes(bytes)
+            self.int = value
+        elif isinstance(value, LexicalUUID):
+            self.int = value.int
         elif isinstance(value, basestring):
             if len(value) == 16:
                 self.from_bytes(value)
             elif len(value) == 36:
-                elements = value.split('-')
-                self.from_bytes(struct.pack('I32', ''.join(elements)))
+                self.int = int(value.replace('-', ''), 16)
             else:
                 raise ValueError('{} was incorrectly sized.'.format(value))
         elif isinstance(value, datetime.datetime):
-            self.timestamp = long(time.mktime(value.timetuple())*1000000)
-        elif value is None:
-            self.timestamp = self.timestamp_factory()
+            if worker_id is None:
+                worker_id = self.default_worker_id
+            timestamp = long(time.mktime(value.timetuple())*1000000)
+            self.int = (timestamp << 64) | worker_id
         else:
             raise ValueError("Can not convert {} into a "
                              "LexicalUUID".format(value))
-        
-        self.int = int(('%02x'*16) % self.byte_tuple, 16)
+
+    @classmethod
+    def from_int(cls, n):
+        """
+        The LexicalUUID of the integer `n`, without the checks of the 
+        constructor.
+        """
+        ret = object.__new__(cls)
+        ret.int = n
+        return ret
+
+    @classmethod
+    def batch(cls, n, worker_id=None):
+        """
+        Makes `n` new LexicalUUIDs with consecutive timestamps, reserved 
+        from the clock at once.
+        """
+        if worker_id is None:
+            worker_id = cls.default_worker_id
+        start = cls.timestamp_factory.reserve(n)
+        new = object.__new__
+        ret = []
+        for timestamp in xrange(start, start + n):
+            u = new(cls)
+            u.int = (timestamp << 64) | worker_id
+            ret.append(u)
+        return ret
     
     def from_bytes(self, bytes):
-        th, tl, wh, wl = struct.unpack('!IIII', bytes)
-        self.timestamp = (th << 32) | tl
-        self.worker_id = (wh << 32) | wl
+        high, low = struct.unpack('!QQ', bytes)
+        self.int = (high << 64) | low
+
+    @property
+    def timestamp(self):
+        return self.int >> 64
+
+    @property
+    def worker_id(self):
+        return self.int & MASK_64
 
     def encode(self):
-        n = self.int
-        s = []
-        while True:
-            n, r = divmod(n, BASE)
-            s.append(ALPHABET[r])
-            if n == 0:
-                break
-        return ''.join(reversed(s))
+        return _encode(self.int)
 
     @classmethod
     def decode(cls, s):
-        n = 0
-        for c in s:
-            n = n * BASE + ALPHABET_REVERSE[c]
-        return cls(n)
+        return cls.from_int(_decode(s))
+
+    @staticmethod
+    def encode_many(ids):
+        """
+        The :meth:`encode`d form of every LexicalUUID in `ids`.
+        """
+        return [_encode(u.int) for u in ids]
+
+    @classmethod
+    def decode_many(cls, strings):
+        """
+        The LexicalUUIDs of the :meth:`encode`d `strings`.
+        """
+        from_int = cls.from_int
+        return [from_int(_decode(s)) for s in strings]
 
     @property
     def guid(self):
@@ -109,13 +166,12 @@ class LexicalUUID(object):
     
     @property    
     def bytes(self):
-        return struct.pack('!IIII', self.timestamp >> 32, 
-                           self.timestamp & 0xffffffff,
-                           self.worker_id >> 32, self.worker_id & 0xffffffff)
+        n = self.int
+        return struct.pack('!QQ', n >> 64, n & MASK_64)
     
     @property
     def byte_tuple(self):
-        return tuple(map(ord, list(self.bytes)))
+        return tuple(bytearray(self.bytes))
     
     @property
     def node(self):
@@ -128,19 +184,39 @@ class LexicalUUID(object):
         return self.__str__()
     
     def __eq__(self, other):
-        return (
-            isinstance(other, LexicalUUID) and
-            self.timestamp == other.timestamp and
-            self.worker_id == other.worker_id
-        )
+        return isinstance(other, LexicalUUID) and self.int == other.int
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
     
     def __cmp__(self, other):
-        return (
-            self.worker_id > other.worker_id 
-            if self.timestamp == other.timestamp 
-            else self.timestamp > other.timestamp
-        )
+        # the timestamp is the high half, so integers sort the same way
+        return cmp(self.int, other.int)
     
     def __hash__(self):
         return hash(self.int)
 
+    def __reduce__(self):
+        return (self.__class__, (self.int,))
+
+
+def _encode(n):
+    # ALPHABET is the URL safe base64 one, so the six bit digits of the 
+    # number are those of its bytes zero padded to 18, less leading zeros
+    packed = struct.pack('!HQQ', n >> 128, (n >> 64) & MASK_64, n & MASK_64)
+    return base64.urlsafe_b64encode(packed).lstrip(ALPHABET[0]) or ALPHABET[0]
+
+
+def _decode(s):
+    if len(s) > 24:
+        raise ValueError('{} is too long for a LexicalUUID'.format(s))
+    # urlsafe_b64decode also takes '+' and '/', and skips anything else.
+    # what is left after stripping the alphabet is what doesn't belong
+    if s.lstrip(ALPHABET):
+        raise ValueError('{} is not an encoded LexicalUUID'.format(s))
+    try:
+        high, mid, low = struct.unpack(
+            '!HQQ', base64.urlsafe_b64decode(s.rjust(24, ALPHABET[0])))
+    except (TypeError, struct.error):
+        raise ValueError('{} is not an encoded LexicalUUID'.format(s))
+    return (high << 128) | (mid << 64) | low
@@ -0,0 +1,215 @@
+import sys, threading
+from .concurrency import Future
+
+__doc__ = """
+Automatic batching of individual reads. While :func:`auto_batch` is active,
+:meth:`PersistentObject.aget` calls made within a short window are collected
+and fetched together by a single :meth:`PersistentObject.get_many`. Like a
+:class:`pynamo.session.Session` it is active in the thread that entered it,
+other threads take part by entering it too, and then their
+:meth:`PersistentObject.get` calls are batched as well.
+
+e.g.::
+    with auto_batch():
+        futures = [User.aget(k) for k in keys]    # one BatchGetItem
+        users = gather(futures).result()
+
+    with auto_batch() as batch:
+        def work(key):
+            with batch:
+                return User.get(key)
+        ...                             # concurrent gets share requests
+"""
+
+
+class BatchLoader(object):
+    """
+    Collects the keys of one class requested through :meth:`load` and
+    fetches them `window` seconds after the first one arrived, or as soon
+    as `max_batch` are waiting.
+
+    `batches` counts the :meth:`PersistentObject.get_many` calls made and
+    `loads` the keys requested.
+    """
+    def __init__(self, cls, window=0.002, max_batch=100):
+        self.cls = cls
+        self.window = window
+        self.max_batch = max_batch
+        self.batches = 0
+        self.loads = 0
+        # projection -> [(key, future)]
+        self._pending = {}
+        self._count = 0
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def load(self, key, projection=None):
+        """
+        Returns a :class:`pynamo.concurrency.Future` for the object at `key`,
+        `None` if it does not exist.
+        """
+        future = Future()
+        with self._lock:
+            self._pending.setdefault(projection, []).append((key, future))
+            self._count += 1
+            self.loads += 1
+            if self._count >= self.max_batch:
+                batch = self._take()
+                t = threading.Thread(target=self._run, args=(batch,))
+                t.daemon = True
+                t.start()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.window, self._fire)
+                self._timer.daemon = True
+                self._timer.start()
+        return future
+
+    def flush(self):
+        """
+        Fetches whatever is waiting right away, in the calling thread.
+        """
+        with self._lock:
+            batch = self._take()
+        self._run(batch)
+
+    def _take(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending, self._count = self._pending, {}, 0
+        return batch
+
+    def _fire(self):
+        with self._lock:
+            batch = self._take()
+        self._run(batch)
+
+    def _run(self, batch):
+        for projection, entries in batch.iteritems():
+            with self._lock:
+                self.batches += 1
+            try:
+                objs = self.cls.get_many(
+                    [key for key, future in entries],
+                    attributes_to_get=projection and list(projection))
+            except Exception:
+                exc_info = sys.exc_info()
+                for key, future in entries:
+                    future.set_exception(exc_info)
+                continue
+            for (key, future), obj in zip(entries, objs):
+                future.set_result(obj)
+
+    @property
+    def waiting(self):
+        """
+        Whether keys are waiting to be fetched.
+        """
+        return self._count > 0
+
+
+_local = threading.local()
+
+
+def current():
+    """
+    Returns the innermost :class:`AutoBatch` active in this thread, or
+    `None`.
+    """
+    stack = getattr(_local, 'stack', None)
+    if stack:
+        return stack[-1]
+    return None
+
+
+class AutoBatch(object):
+    """
+    The reads batched by :func:`auto_batch`, with a :class:`BatchLoader`
+    per class. Entering it from several threads lets them share requests,
+    reads still waiting when the last of them leaves are fetched before it
+    returns.
+    """
+    def __init__(self, window=0.002, max_batch=100):
+        self.window = window
+        self.max_batch = max_batch
+        self._loaders = {}
+        # thread ident -> how many times it entered
+        self._threads = {}
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        stack = getattr(_local, 'stack', None)
+        if stack is None:
+            stack = _local.stack = []
+        stack.append(self)
+        ident = threading.current_thread().ident
+        with self._lock:
+            self._threads[ident] = self._threads.get(ident, 0) + 1
+        return self
+
+    def __exit__(self, typ, value, tb):
+        _local.stack.remove(self)
+        ident = threading.current_thread().ident
+        with self._lock:
+            self._threads[ident] -= 1
+            if not self._threads[ident]:
+                del self._threads[ident]
+            loaders = []
+            if not self._threads:
+                loaders = self._loaders.values()
+        for loader in loaders:
+            loader.flush()
+
+    @property
+    def shared(self):
+        """
+        Whether more than one thread is in the block.
+        """
+        return len(self._threads) > 1
+
+    def get_loader(self, cls):
+        with self._lock:
+            loader = self._loaders.get(cls)
+            if loader is None:
+                loader = self._loaders[cls] = BatchLoader(
+                    cls, self.window, self.max_batch)
+        return loader
+
+
+def active():
+    return current() is not None
+
+
+def get_loader(cls, blocking=False):
+    """
+    Returns the :class:`BatchLoader` of `cls` while :func:`auto_batch` is
+    active in this thread, otherwise `None`.
+
+    A `blocking` read has nothing to wait for in the window unless other
+    threads may read at the same time, or reads are already waiting, so
+    otherwise `None` is returned for it too.
+    """
+    batch = current()
+    if batch is None:
+        return None
+    loader = batch.get_loader(cls)
+    if blocking and not batch.shared and not loader.waiting:
+        return None
+    return loader
+
+
+def auto_batch(window=0.002, max_batch=100):
+    """
+    Returns an :class:`AutoBatch` that batches reads while its block runs.
+    Within an active one the same one is returned, nested blocks share it.
+
+    :type window: float
+    :param window: How many seconds to wait for more reads after the first
+
+    :type max_batch: int
+    :param max_batch: Fetch right away once this many reads are waiting
+    """
+    batch = current()
+    if batch is not None:
+        return batch
+    return AutoBatch(window, max_batch)
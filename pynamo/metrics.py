@@ -0,0 +1,242 @@
+import threading, logging, bisect, functools
+
+__doc__ = """
+Instrumentation of the requests :class:`pynamo.PersistentObject` makes.
+
+Register an :class:`Observer` to be told about every operation, or a
+:class:`Collector` to aggregate them in process::
+
+    collector = metrics.register(metrics.Collector())
+    ...
+    collector.percentile('get', 'User', 0.99)
+
+Nothing is measured and no span is started while no observer is
+registered.
+"""
+
+logger = logging.getLogger(__name__)
+
+# replaced as a whole so readers never need the lock
+_observers = ()
+_lock = threading.Lock()
+
+
+class Observer(object):
+    """
+    The base of the objects passed to :func:`register`. Override
+    :meth:`record` to receive measurements and :meth:`start_span` and
+    :meth:`end_span` to trace the public calls that make the requests.
+    """
+    def record(self, operation, cls, count, latency, consumed=0.0,
+               retries=0, size=0):
+        """
+        Called once an operation completes.
+
+        :type operation: str
+        :param operation: e.g. 'get', 'get_many', 'query' or 'save_many'
+
+        :type cls: type
+        :param cls: The :class:`pynamo.PersistentObject` subclass
+
+        :type count: int
+        :param count: How many items were read or written
+
+        :type latency: float
+        :param latency: Seconds the operation took
+
+        :type consumed: float
+        :param consumed: The `ConsumedCapacityUnits` reported
+
+        :type retries: int
+        :param retries: How many requests were retries
+
+        :type size: int
+        :param size: Roughly how many bytes of items were read or written
+        """
+
+    def start_span(self, operation, cls):
+        """
+        Called when a traced call begins. Whatever it returns is handed to
+        :meth:`end_span`.
+        """
+
+    def end_span(self, span, error=None):
+        """
+        Called when a traced call returns, or raises `error`.
+        """
+
+
+class LogObserver(Observer):
+    """
+    Logs every operation at `level`, formatting the line only if the logger
+    is enabled for it.
+    """
+    def __init__(self, level=logging.INFO):
+        self.level = level
+
+    def record(self, operation, cls, count, latency, consumed=0.0,
+               retries=0, size=0):
+        if logger.isEnabledFor(self.level):
+            logger.log(self.level, '%s %d of %s in %f '
+                       'ConsumedCapacityUnits=%f Retries=%d Bytes=%d',
+                       operation, count, cls.__name__, latency, consumed,
+                       retries, size)
+
+
+# the upper bounds, in seconds, of the buckets of a Histogram
+BUCKETS = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0,
+           5.0, 10.0)
+
+
+class Histogram(object):
+    """
+    The latencies and totals of one operation of one class.
+    """
+    def __init__(self):
+        # the last bucket holds everything above BUCKETS[-1]
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.calls = 0
+        self.latency = 0.0
+        self.max_latency = 0.0
+        self.items = 0
+        self.consumed = 0.0
+        self.retries = 0
+        self.bytes = 0
+
+    def add(self, count, latency, consumed, retries, size):
+        self.buckets[bisect.bisect_left(BUCKETS, latency)] += 1
+        self.calls += 1
+        self.latency += latency
+        self.max_latency = max(self.max_latency, latency)
+        self.items += count
+        self.consumed += consumed
+        self.retries += retries
+        self.bytes += size
+
+    def percentile(self, q):
+        """
+        The upper bound of the bucket holding the `q` (0 to 1) quantile of
+        the latencies, or the slowest latency if it lies past the buckets.
+        """
+        if not self.calls:
+            return None
+        rank = q * self.calls
+        seen = 0
+        for bound, n in zip(BUCKETS, self.buckets):
+            seen += n
+            if seen >= rank:
+                return bound
+        return self.max_latency
+
+    def to_dict(self):
+        return {'calls': self.calls, 'items': self.items,
+                'latency': self.latency, 'max_latency': self.max_latency,
+                'consumed': self.consumed, 'retries': self.retries,
+                'bytes': self.bytes, 'buckets': list(self.buckets)}
+
+
+class Collector(Observer):
+    """
+    Keeps a :class:`Histogram` per operation and class. Thread safe.
+    """
+    def __init__(self):
+        # (operation, class name) -> Histogram
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def record(self, operation, cls, count, latency, consumed=0.0,
+               retries=0, size=0):
+        ident = (operation, cls.__name__)
+        with self._lock:
+            histogram = self._histograms.get(ident)
+            if histogram is None:
+                histogram = self._histograms[ident] = Histogram()
+            histogram.add(count, latency, consumed, retries, size)
+
+    def histogram(self, operation, cls_name):
+        """
+        Returns the :class:`Histogram` of `operation` on the class named
+        `cls_name`, or `None` if it was never recorded.
+        """
+        with self._lock:
+            return self._histograms.get((operation, cls_name))
+
+    def percentile(self, operation, cls_name, q):
+        histogram = self.histogram(operation, cls_name)
+        if histogram is None:
+            return None
+        with self._lock:
+            return histogram.percentile(q)
+
+    def snapshot(self):
+        """
+        Every histogram as a dictionary keyed by `(operation, class name)`.
+        """
+        with self._lock:
+            return dict((ident, h.to_dict())
+                        for ident, h in self._histograms.iteritems())
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+
+def register(observer):
+    """
+    Starts sending measurements and spans to `observer`, and returns it.
+    """
+    global _observers
+    with _lock:
+        _observers = _observers + (observer,)
+    return observer
+
+
+def unregister(observer):
+    global _observers
+    with _lock:
+        _observers = tuple(o for o in _observers if o is not observer)
+
+
+def enabled():
+    """
+    Whether any observer is registered. Check this before computing what
+    to :func:`record`.
+    """
+    return bool(_observers)
+
+
+def record(operation, cls, count, latency, consumed=0.0, retries=0, size=0):
+    """
+    Hands a measurement to every registered observer, see
+    :meth:`Observer.record`.
+    """
+    for observer in _observers:
+        observer.record(operation, cls, count, latency, consumed, retries,
+                        size)
+
+
+def traced(operation):
+    """
+    Decorates a method of :class:`pynamo.PersistentObject` or a classmethod
+    (applied beneath `classmethod`) so every call is a span named
+    `operation`. Calls go straight through while no observer is registered.
+    """
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(owner, *a, **kw):
+            observers = _observers
+            if not observers:
+                return func(owner, *a, **kw)
+            cls = owner if isinstance(owner, type) else owner.__class__
+            spans = [(o, o.start_span(operation, cls)) for o in observers]
+            try:
+                ret = func(owner, *a, **kw)
+            except Exception, e:
+                for o, span in spans:
+                    o.end_span(span, e)
+                raise
+            for o, span in spans:
+                o.end_span(span)
+            return ret
+        return wrapper
+    return decorate
@@ -0,0 +1,74 @@
+__doc__ = """
+Iteration over the paged results of `Query` and `Scan`, following
+`LastEvaluatedKey` from one request to the next.
+"""
+
+
+class PageIterator(object):
+    """
+    Yields the results of consecutive pages, requesting a page only once the
+    previous one has been reached. With a `pool` the next page is requested
+    in the background as soon as the current one arrives, so it is usually
+    ready by the time the current one has been consumed.
+
+    `fetch(start_key, limit)` returns `(results, last_evaluated_key)`, where
+    `last_evaluated_key` is `None` for the final page. `key_of(result)`
+    returns the key of a single result in the same form.
+
+    :attr:`resume_key` can be passed back as the `start_key` of a new
+    iterator to continue right after the last result that was yielded.
+    """
+    def __init__(self, fetch, key_of, limit=None, start_key=None, pool=None):
+        self._fetch = fetch
+        self._key_of = key_of
+        self._remaining = limit
+        self._pool = pool
+        self._page = []
+        self._position = 0
+        self._page_key = None
+        self._next_key = start_key
+        self._pending = None
+        self._done = False
+        self.resume_key = start_key
+        self.pages = 0
+
+    def __iter__(self):
+        return self
+
+    def next(self):
+        while self._position >= len(self._page):
+            if self._done or self._remaining == 0:
+                raise StopIteration()
+            self._load_page()
+        result = self._page[self._position]
+        self._position += 1
+        if self._remaining is not None:
+            self._remaining -= 1
+        if self._position == len(self._page) and (self._done or
+                                                  self._remaining != 0):
+            self.resume_key = self._page_key
+        else:
+            self.resume_key = self._key_of(result)
+        return result
+
+    def _load_page(self):
+        if self._pending is not None:
+            page, key = self._pending.result()
+        else:
+            page, key = self._fetch(self._next_key, self._remaining)
+        self._pending = None
+        self.pages += 1
+        if self._remaining is not None:
+            page = page[:self._remaining]
+        self._page = page
+        self._position = 0
+        self._page_key = self._next_key = key
+        self._done = key is None
+        if not len(page) and not self._done:
+            # nothing was yielded but the query moved on
+            self.resume_key = key
+        left = None
+        if self._remaining is not None:
+            left = self._remaining - len(page)
+        if self._pool is not None and not self._done and left != 0:
+            self._pending = self._pool.submit(self._fetch, key, left)
@@ -1,16 +1,47 @@
-import json, logging, time, string
+import json, time, string, functools, collections, threading
 from boto import connect_dynamodb
-from boto.dynamodb.exceptions import DynamoDBKeyNotFoundError
+from boto.dynamodb.exceptions import (DynamoDBKeyNotFoundError, 
+                                      DynamoDBThroughputExceededError,
+                                      DynamoDBConditionalCheckFailedError)
 from boto.exception import DynamoDBResponseError
 from boto.dynamodb.schema import Schema
-from boto.dynamodb.batch import BatchList
+from boto.dynamodb.batch import BatchList, BatchWriteList
 from boto.dynamodb.item import Item
-from .exceptions import NotFoundError
+from .exceptions import (NotFoundError, BatchRetryError, UnloadedFieldError,
+                         ValidationError)
 from .configuration import Configure
 from .fields import Field, StringField
+from .concurrency import dispatch, dispatch_async, poll, SingleFlight
+from .paging import PageIterator
+from .retry import (RetryPolicy, AdaptiveChunker, BatchStats, Throttle,
+                    estimate_size)
+from .checkpoint import Checkpoint
+from .codec import Codec
+from . import write_behind, cache, session, loader, ratelimit, metrics
 
 # connection = None
-logger = logging.getLogger(__name__)
+
+# handed to the callers that joined a read that did not get an answer, they
+# have to read the key themselves
+_UNANSWERED = object()
+_flights_lock = threading.Lock()
+
+
+def _submit(func, *args, **kwargs):
+    """
+    Submits `func` to the shared pool, to run within the session and the
+    rate limit priority of the calling thread.
+    """
+    s = session.current()
+    level = ratelimit.current_priority(None)
+
+    def run():
+        with session.use(s):
+            if level is None:
+                return func(*args, **kwargs)
+            with ratelimit.priority(level):
+                return func(*args, **kwargs)
+    return Configure.get_pool().submit(run)
 
 
 class Meta(object):
@@ -38,6 +69,31 @@ class Meta(object):
       * `write_units` - how many write units are provisioned for this table
       * `key_format` - if a compound key is used, what is it's format? The 
         attribute names are parsed from the format.
+      * `batch_concurrency` - how many batch requests 
+        :meth:`PersistentObject.get_many`, 
+        :meth:`PersistentObject.save_many` and 
+        :meth:`PersistentObject.delete_many` keep in flight at once
+      * `retry_policy` - a :class:`pynamo.retry.RetryPolicy` controlling
+        the backoff and budget for retrying unprocessed keys
+      * `strict_projection` - if `True`, reading a field that was left out
+        of an `attributes_to_get` projection raises 
+        :class:`UnloadedFieldError` instead of fetching it
+      * `write_behind` - either `True` or keyword arguments for a 
+        :class:`pynamo.write_behind.WriteBehindBuffer`. :meth:`save` then
+        queues objects to be written in batches by a background thread.
+      * `cache` - either `True`, keyword arguments for a 
+        :class:`pynamo.cache.LRUCache` or a cache instance. :meth:`get` and
+        :meth:`get_many` then only fetch the items that are not cached
+      * `negative_cache` - either `True`, keyword arguments for a 
+        :class:`pynamo.cache.NegativeCache` or an instance. Keys that were
+        recently found missing are then not looked up again
+      * `rate_limit` - either `True` or keyword arguments for 
+        :func:`pynamo.ratelimit.get_limiter`. Requests then wait for their
+        share of a fraction of the table's throughput instead of being
+        throttled
+      * `compact` - if `True`, instances have no `__dict__`, saving memory
+        when many are held at once. Attributes other than the fields can
+        then not be set on them
     """
     def __init__(self, *a, **kw):
         if len(a) == 1:
@@ -52,6 +108,14 @@ class Meta(object):
 class PersistentObjectMeta(type):
     """
     """
+    def __new__(mcs, name, bases, classdict):
+        compact = classdict.get('compact')
+        if (isinstance(compact, Meta) and compact.value and 
+                '__slots__' not in classdict):
+            # no instance __dict__, only the slots of PersistentObject
+            classdict['__slots__'] = ()
+        return type.__new__(mcs, name, bases, classdict)
+
     def __init__(cls, name, bases, classdict):
         new_values = {}
         _props = []
@@ -119,6 +183,7 @@ class PersistentObjectMeta(type):
             classdict[prop].contribute_to_class(cls)
         for k, v in _meta:
             setattr(cls, '__%s__' % k, v.value)
+        cls._codec = Codec(cls, _property_instances)
         # this shouldn't be here. but it's easier for now
         fmt = getattr(cls, '__hash_key_format__', None)
         if fmt is not None:
@@ -131,14 +196,27 @@ class PersistentObjectMeta(type):
                                     ' it is not an attribute on the class. (%s)' 
                                     % (field_name, name,))
             setattr(cls, '__hash_key_attributes__', tuple(attr_list))
+            # passing the dictionary as keywords is the quickest way to fill
+            # in the format, missing attributes raise KeyError
+            cls._build_hash_key = staticmethod(fmt.format)
 
 
 class PersistentObject(object):
     """
     """
+    __slots__ = ('_item', '_modified', '_version', '_in_flight', '_exists',
+                 '_property_cache', '_projection')
     __table_name__ = None
     __read_units__ = 8
     __write_units__ = 8
+    __batch_concurrency__ = 1
+    __retry_policy__ = RetryPolicy()
+    __strict_projection__ = False
+    __write_behind__ = None
+    __cache__ = None
+    __negative_cache__ = None
+    __rate_limit__ = None
+    __compact__ = False
     __key_format__ = None
     __key_attributes__ = None
 
@@ -153,6 +231,12 @@ class PersistentObject(object):
     _table = None
     _properties = None
     _property_instances = None
+    _write_buffer = None
+    _cache = None
+    _negative_cache = None
+    _flights = None
+    _codec = None
+    _build_hash_key = None
 
     __metaclass__ = PersistentObjectMeta
 
@@ -200,11 +284,20 @@ class PersistentObject(object):
             write_units = cls.__write_units__)
         
         if wait:
-            resp = connection.describe_table(cls._full_table_name)
-            while resp['Table']['TableStatus'] == 'CREATING':
+            while not cls._table_created():
                 time.sleep(1)
-                resp = connection.describe_table(cls._full_table_name)
-            cls._table.update_from_response(resp)
+    
+    @classmethod
+    def _table_created(cls):
+        """
+        Returns `True` once the table has left the `CREATING` state, `None`
+        while it is still being created.
+        """
+        resp = Configure.get_connection().describe_table(cls._full_table_name)
+        if resp['Table']['TableStatus'] == 'CREATING':
+            return None
+        cls._table.update_from_response(resp)
+        return True
     
     @classmethod
     def drop_table(cls, wait=True):
@@ -272,12 +365,16 @@ class PersistentObject(object):
         # provided a dict and key_attribute and key_format are filled out
         elif (isinstance(key_or_dict, dict) and cls.__hash_key_attributes__ is 
                 not None and cls.__hash_key_format__ is not None):
-            for k in cls.__hash_key_attributes__:
-                if k not in key_or_dict:
-                    raise ValueError('Tried to build a key but not all the '
-                                     'required attributes were present: ' 
-                                    + repr(cls.__hash_key_attributes__))
-            ret = cls.__hash_key_format__.format(**key_or_dict)
+            for name in key_or_dict:
+                if not isinstance(name, basestring):
+                    raise ValidationError('The attributes of a key must be '
+                                          'named by strings, not %r' % (name,))
+            try:
+                ret = cls._build_hash_key(**key_or_dict)
+            except KeyError:
+                raise ValueError('Tried to build a key but not all the '
+                                 'required attributes were present: ' 
+                                 + repr(cls.__hash_key_attributes__))
         # otherwise the key is assumed to be already valid 
         else:
             ret = key_or_dict
@@ -286,6 +383,41 @@ class PersistentObject(object):
         return cls._hash_key_proto(ret)
 
     @classmethod
+    def prepare_full_key(cls, key):
+        """
+        Like :meth:`prepare_key` but includes the range key for classes that
+        declare one, returning a `(hash_key, range_key)` tuple. Used by the
+        batch operations.
+
+        :type key: str|tuple|dict
+        :param key: Either a hash key, a `(hash_key, range_key)` tuple or a
+            dictionary from which both will be computed
+        """
+        if cls._range_key_name is None:
+            return cls.prepare_key(key)
+        if isinstance(key, tuple) and len(key) == 2:
+            hash_key, range_key = key
+        elif isinstance(key, dict) and cls._range_key_name in key:
+            hash_key, range_key = key, key[cls._range_key_name]
+        else:
+            raise ValueError('%s has a range key, provide either a (hash_key, '
+                             'range_key) tuple or a dictionary including %s' 
+                             % (cls.__name__, cls._range_key_name))
+        cls._property_instances[cls._range_key_name].validate(range_key)
+        return (cls.prepare_key(hash_key), cls._range_key_proto(range_key))
+
+    @classmethod
+    def _key_from_attrs(cls, attrs):
+        """
+        The same key :meth:`prepare_full_key` builds, taken from a returned 
+        item or an `UnprocessedKeys` entry.
+        """
+        if cls._range_key_name is None:
+            return attrs[cls._hash_key_name]
+        return (attrs[cls._hash_key_name], attrs[cls._range_key_name])
+
+    @classmethod
+    @metrics.traced('get')
     def get(cls, *a, **kw):
         """
         Retrieve an item from DynamoDB. This operation performs a singular 
@@ -295,31 +427,182 @@ class PersistentObject(object):
         This method can be called multiple ways. If the full key is known, 
         then simply pass it to :meth:`get`. If using compound keys, keyword
         arguments may be used which will then be used to build the key.
+
+        Pass `attributes_to_get` to only fetch some of the fields. The key
+        fields are always fetched. Reading any other field on the returned
+        object fetches the rest of the item once, or raises 
+        :class:`UnloadedFieldError` if the class sets `strict_projection`.
+
+        Classes with a `cache` return a copy of the cached item if there is
+        one, and cache the items they fetch in full. Classes with a 
+        `negative_cache` raise right away for keys recently found missing.
+        Within a :class:`pynamo.session.Session` the instance the session 
+        already holds for the key is returned.
+
+        Concurrent calls for the same key share a single `GetItem`, see
+        :meth:`read_flights`. While the threads of a
+        :func:`pynamo.loader.auto_batch` block read at the same time, their
+        calls are gathered into `BatchGetItem` requests instead.
         """
         cls._load_meta()
+        attributes_to_get = kw.pop('attributes_to_get', None)
+        projection = cls._projection_for(attributes_to_get)
+        k = cls._key_from_args(a, kw)
+        s = session.current()
+        if s is not None and s.get(cls, k) is not None:
+            return s.get(cls, k)
+        if s is not None and s.is_deleted(cls, k):
+            raise NotFoundError()
+        missing = cache.get_negative_cache(cls)
+        if missing is not None and k in missing:
+            raise NotFoundError()
+        item_cache = cache.get_cache(cls)
+        if item_cache is not None:
+            attrs = item_cache.get(k)
+            if attrs is not None:
+                return cls._adopt(attrs, None, s)
+        batch_loader = loader.get_loader(cls, blocking=True)
+        if batch_loader is not None:
+            ret = batch_loader.load(k, projection).result()
+            if ret is None:
+                raise NotFoundError()
+            if s is not None:
+                ret = s.add(ret)
+            return ret
+        flights = cls.read_flights()
+        flight = (k, projection)
+        led, joined = flights.begin([flight])
+        if len(led):
+            try:
+                r = cls._get_item(k, projection)
+            except Exception:
+                flights.finish(flight, _UNANSWERED)
+                raise
+            flights.finish(flight, r and cache.copy_attrs(r))
+        else:
+            r = joined[flight].result()
+            if r is _UNANSWERED:
+                r = cls._get_item(k, projection)
+            elif r is not None:
+                r = Item(cls._table, attrs=cache.copy_attrs(r))
+        if r is None:
+            if missing is not None:
+                missing.add(k)
+            raise NotFoundError()
+        if item_cache is not None and projection is None:
+            item_cache.put(k, r)
+        ret = cls(r, projection=projection)
+        if s is not None:
+            ret = s.add(ret)
+        return ret
+    
+    @classmethod
+    def _key_from_args(cls, a, kw):
+        """
+        The key :meth:`get` was called with, either a singular key or the
+        keyword arguments to build it from.
+        """
         if len(a) == 1:
             # a single key or a single dictionary
-            k = cls.prepare_key(a[0])
+            return cls.prepare_key(a[0])
         elif len(kw) >= len(cls.__hash_key_attributes__):
-            k = cls.prepare_key(kw)
-        else:
-            raise ValueError('Either provide a singular key or keyword '
-                             'arguments to build the key from the provided '
-                             'key_format, in which case it must include all '
-                             'the possible attributes.')
+            return cls.prepare_key(kw)
+        raise ValueError('Either provide a singular key or keyword '
+                         'arguments to build the key from the provided '
+                         'key_format, in which case it must include all '
+                         'the possible attributes.')
+
+    @classmethod
+    def _get_item(cls, k, projection):
+        """
+        Sends a `GetItem`, returning the item or `None` if it is missing.
+        """
+        r = None
+        limiter = cls._acquire('read', ratelimit.INTERACTIVE)
+        t1 = time.time()
         try:
-            r = None
-            t1 = time.time()
-            try:
-                r = cls._table.get_item(k)
-            finally:
-                logger.info('Got %d %s in %s' % (0 if r is None else 1, 
-                                                cls.__name__, time.time() - t1))
-            if not r:
-                raise NotFoundError()
+            r = cls._table.get_item(k, attributes_to_get=projection and 
+                                                         list(projection))
         except DynamoDBKeyNotFoundError:
-            raise NotFoundError()
-        return cls(r)
+            pass
+        finally:
+            if metrics.enabled():
+                metrics.record('get', cls, 0 if not r else 1, 
+                               time.time() - t1, 
+                               r.consumed_units if r else 0.0,
+                               size=r and estimate_size(r) or 0)
+            if limiter is not None:
+                # a miss still costs the smallest read
+                limiter.charge(r.consumed_units if r else 0.5, 1.0)
+        return r or None
+    
+    @classmethod
+    def _acquire(cls, kind, priority, units=1.0):
+        """
+        Reserves `units` of the table's `kind` ('read' or 'write') limiter,
+        waiting at the calling thread's priority or else `priority`, and 
+        returns it so the request can be charged. Returns `None` without a 
+        `rate_limit`.
+        """
+        limiter = ratelimit.get_limiter(cls, kind)
+        if limiter is not None:
+            limiter.acquire(ratelimit.current_priority(priority), units)
+        return limiter
+    
+    @classmethod
+    def read_flights(cls):
+        """
+        Returns the :class:`pynamo.concurrency.SingleFlight` that lets 
+        concurrent reads of the same key share a single request, whether
+        they come from :meth:`get` or from :meth:`get_many` and its 
+        relatives. Its `deduplicated` counter is how many reads joined
+        another one in flight.
+        """
+        flights = cls.__dict__.get('_flights')
+        if flights is None:
+            with _flights_lock:
+                flights = cls.__dict__.get('_flights')
+                if flights is None:
+                    flights = cls._flights = SingleFlight()
+        return flights
+
+    @classmethod
+    def _adopt(cls, attrs, projection, s):
+        """
+        Builds an object out of fetched attributes, or returns the instance
+        already tracked by the session `s` for the same key, or `None` if 
+        the session is about to delete it.
+        """
+        if s is not None:
+            key = cls._key_from_attrs(attrs)
+            existing = s.get(cls, key)
+            if existing is not None:
+                return existing
+            if s.is_deleted(cls, key):
+                return None
+        obj = cls(Item(cls._table, attrs=attrs), projection=projection)
+        if s is not None:
+            obj = s.add(obj)
+        return obj
+    
+    @classmethod
+    def _projection_for(cls, attributes_to_get):
+        """
+        The set of fields that objects fetched with `attributes_to_get` will
+        have loaded, always including the key fields, or `None` for all of
+        them.
+        """
+        if attributes_to_get is None:
+            return None
+        projection = set(attributes_to_get)
+        for name in projection:
+            if name not in cls._property_instances:
+                raise ValueError('%s is not a field of %s' 
+                                 % (name, cls.__name__))
+        projection.add(cls._hash_key_name)
+        if cls._range_key_name is not None:
+            projection.add(cls._range_key_name)
+        return frozenset(projection)
     
     @classmethod
     def create(cls, d=None, **other):
@@ -355,25 +638,31 @@ class PersistentObject(object):
             key = d[cls._hash_key_name]
         # create the underlying boto.dynamodb.item.Item
         _hk_typ = getattr(cls, cls._hash_key_name)
+        # the key values are read out of `attrs` by the Item
         args = {
-            'hash_key': cls._hash_key_name, 
             'attrs': {
                 cls._hash_key_name: _hk_typ.from_python(key)
             }
         }
         if cls._range_key_name:
-            args['range_key'] = cls._range_key_name
             args['attrs'][cls._range_key_name] = \
                 cls._range_key_proto(d[cls._range_key_name])
         
         # build the object
         ret = cls(cls._table.new_item(**args), is_new=True)
         ignore = (cls._hash_key_name, cls._range_key_name)
+        values = {}
         for k, v in d.iteritems():
             if k in ignore:
                 continue
-            setattr(ret, k, v)
-        
+            if k in cls._property_instances:
+                values[k] = v
+            else:
+                setattr(ret, k, v)
+        cls._codec.set_many(ret, values)
+        s = session.current()
+        if s is not None:
+            s.add(ret, replace=True)
         return ret
     
     @classmethod
@@ -401,97 +690,552 @@ class PersistentObject(object):
         return ret
     
     @classmethod
-    def get_many(cls, keys, attributes_to_get=None):
+    @metrics.traced('get_many')
+    def get_many(cls, keys, attributes_to_get=None, concurrency=None,
+                 stats=None):
         """
         Returns a list of :class:`PersistentObject` identical in length to the
         list of keys provided. If a key could not be found, it's slot will be 
         `None`
 
+        For classes with a range key every key must be either a 
+        `(hash_key, range_key)` tuple or a dictionary containing both.
+
         This operation performs `BatchGetItem` on the DynamoDB store. This
         method is typically limited to 100 items. Depending on your configured
-        capacity, this can easily outstrip it. This method will retry in a loop
-        until all the keys you asked for are satisfied. `keys` is not limited
-        to 100 items.
+        capacity, this can easily outstrip it. This method will retry until
+        all the keys you asked for are satisfied. `keys` is not limited to 100
+        items.
+
+        The chunks are submitted by up to `concurrency` threads at once, and
+        any unprocessed keys are requeued behind them. Retries back off 
+        exponentially with jitter according to the class's `retry_policy`
+        and raise :class:`BatchRetryError` once it is exhausted. While 
+        DynamoDB is leaving many keys unprocessed the chunks shrink, growing
+        back to 100 keys as requests succeed.
+
+        To process the results as they arrive, without holding all of them
+        in memory, use :meth:`iter_many`.
 
         :type keys: list
-        :param keys: A list of keys
+        :param keys: A list of keys, `(hash_key, range_key)` tuples or 
+            dictionaries
+
+        :type attributes_to_get: list
+        :param attributes_to_get: Only fetch these fields, see :meth:`get`
+
+        :type concurrency: int
+        :param concurrency: How many `BatchGetItem` requests may be in flight
+            at once. Defaults to the `batch_concurrency` :class:`Meta`
+
+        :type stats: :class:`pynamo.retry.BatchStats`
+        :param stats: If provided, it is filled in with the attempts, time
+            spent sleeping, final chunk size and consumed capacity of the call
+        """
+        return list(cls.iter_many(keys, ordered=True, 
+                                  attributes_to_get=attributes_to_get,
+                                  max_in_flight=concurrency, 
+                                  buffer_size=None, stats=stats))
+    
+    @classmethod
+    def iter_many(cls, keys, ordered=False, attributes_to_get=None,
+                  max_in_flight=None, buffer_size=1000, stats=None):
+        """
+        A generator version of :meth:`get_many` that yields objects as each
+        `BatchGetItem` response arrives instead of after the last one. `keys`
+        is consumed lazily so it may be a generator of any length, and memory
+        use stays bounded by `max_in_flight` and `buffer_size`.
+
+        Unordered, only the objects that were found are yielded, in whatever
+        order DynamoDB returns them. Ordered, one value is yielded per key,
+        `None` for missing ones, just like the list :meth:`get_many` returns.
+
+        :type keys: iterable
+        :param keys: Keys, `(hash_key, range_key)` tuples or dictionaries
+
+        :type ordered: bool
+        :param ordered: Yield in the order of `keys`, holding back results 
+            that arrive early in a reorder buffer
+
+        :type attributes_to_get: list
+        :param attributes_to_get: Only fetch these fields, see :meth:`get`
+
+        :type max_in_flight: int
+        :param max_in_flight: How many `BatchGetItem` requests may be in 
+            flight at once. Defaults to the `batch_concurrency` :class:`Meta`
+
+        :type buffer_size: int
+        :param buffer_size: When ordered, new requests are held back while 
+            this many keys are waiting to be yielded. `None` is unlimited.
+
+        :type stats: :class:`pynamo.retry.BatchStats`
+        :param stats: Filled in the same as for :meth:`get_many`
         """
         cls._load_meta()
-        keys = map(cls.prepare_key, keys)
+        if max_in_flight is None:
+            max_in_flight = cls.__batch_concurrency__
+        if stats is None:
+            stats = BatchStats()
+        projection = cls._projection_for(attributes_to_get)
+        s = session.current()
         t1 = time.time()
-        # get the items
-        items, unprocessed, consumed_capacity = cls._fetch_batch_queue(
-                cls._get_batch_queue(keys))
-        # if there are unprocessed items, create a batch from them
-        if len(unprocessed):
-            unprocessed_queue = cls._get_batch_queue(unprocessed)
-        else:
-            unprocessed_queue = []
-        # and continue fetching unprocessed items until there are no more
-        while len(unprocessed_queue):
-            new_items, new_unprocessed, new_consumed = cls._fetch_batch_queue(
-                    unprocessed_queue)
-            consumed_capacity += new_consumed
-            items.extend(new_items)
-            if len(new_unprocessed):
-                unprocessed_queue = cls._get_batch_queue(new_unprocessed)
+        fetch = functools.partial(cls._fetch_batch, 
+                                  chunker=AdaptiveChunker(), 
+                                  policy=cls.__retry_policy__, 
+                                  stats=stats, started=t1,
+                                  attributes_to_get=projection and 
+                                                    list(projection),
+                                  session=s)
+        # key -> the positions in `keys` waiting on it. duplicates are only
+        # sent once because BatchGetItem rejects them
+        outstanding = {}
+        # position -> result, for results that arrived ahead of their turn
+        buffered = {}
+        counts = {'queued': 0, 'yielded': 0, 'found': 0, 'bytes': 0}
+        measure = metrics.enabled()
+
+        def unique_keys():
+            for key in keys:
+                key = cls.prepare_full_key(key)
+                if key in outstanding:
+                    outstanding[key].append(counts['queued'])
+                else:
+                    outstanding[key] = [counts['queued']]
+                    yield key
+                counts['queued'] += 1
+        tasks = ((chunk, 0) for chunk in cls._get_batch_queue(unique_keys()))
+
+        ready = None
+        if ordered and buffer_size is not None:
+            ready = lambda: counts['queued'] - counts['yielded'] < buffer_size
+
+        for resolved, items in dispatch(fetch, tasks, max_in_flight, ready):
+            found = dict((cls._key_from_attrs(item), item) for item in items)
+            counts['found'] += len(found)
+            if measure:
+                counts['bytes'] += sum(estimate_size(i) for i in items)
+            for key in resolved:
+                attrs = found.get(key)
+                for pos in outstanding.pop(key):
+                    obj = None
+                    if attrs is not None:
+                        obj = cls._adopt(attrs, projection, s)
+                    if ordered:
+                        buffered[pos] = obj
+                    elif obj is not None:
+                        yield obj
+            if ordered:
+                while counts['yielded'] in buffered:
+                    yield buffered.pop(counts['yielded'])
+                    counts['yielded'] += 1
+        if measure:
+            metrics.record('get_many', cls, counts['found'], 
+                           time.time() - t1, stats.consumed_capacity, 
+                           stats.retries, counts['bytes'])
+    
+    @classmethod
+    def _fetch_batch(cls, task, chunker, policy, stats, started,
+                     attributes_to_get=None, session=None):
+        """
+        Submits a single `BatchGetItem` for a `(keys, attempt)` task. Returns
+        the keys that were answered and the items found for them, along with
+        follow-up tasks for the keys that were not sent or not processed, as
+        expected by :func:`pynamo.concurrency.dispatch`.
+        """
+        keys, attempt = task
+        followups = []
+        results = []
+        batch_keys, remainder = chunker.split(keys)
+        if len(remainder):
+            # the chunk size shrank since this task was queued
+            followups.append((remainder, attempt))
+        if not len(batch_keys):
+            return ([], results), followups
+        answered = []
+        if attempt == 0:
+            batch_keys = cls._lookup_local(batch_keys, session, answered, 
+                                           results)
+        # keys another thread is already reading are waited for instead
+        flights = cls.read_flights()
+        projection = attributes_to_get and frozenset(attributes_to_get)
+        led, joined = flights.begin([(key, projection) for key in batch_keys])
+        batch_keys = [key for key, p in led]
+        fetched = []
+        unprocessed = []
+        try:
+            if len(batch_keys):
+                fetched, unprocessed = cls._submit_batch(
+                    batch_keys, attempt, chunker, policy, stats, started,
+                    attributes_to_get)
+        except Exception:
+            for flight in led:
+                flights.finish(flight, _UNANSWERED)
+            raise
+        found = dict((cls._key_from_attrs(item), item) for item in fetched)
+        # the keys come back decoded, so match them the same way
+        skip = set(unprocessed)
+        for flight in led:
+            if flight[0] in skip:
+                flights.finish(flight, _UNANSWERED)
             else:
-                unprocessed_queue = []
-        # create a hash out of the values' keys for quick reordering
-        h = dict((item[cls._hash_key_name], idx) 
-                    for idx, item in enumerate(items))
-        ret = []
+                attrs = found.get(flight[0])
+                flights.finish(flight, attrs and cache.copy_attrs(attrs))
+        batch_keys = [k for k in batch_keys if k not in skip]
+        item_cache = cache.get_cache(cls)
+        if item_cache is not None and attributes_to_get is None:
+            for key, item in found.iteritems():
+                item_cache.put(key, item)
+        missing = cache.get_negative_cache(cls)
+        if missing is not None:
+            for key in batch_keys:
+                if key not in found:
+                    missing.add(key)
+        results.extend(fetched)
+        answered.extend(batch_keys)
+        for (key, p), future in joined.iteritems():
+            attrs = future.result()
+            if attrs is _UNANSWERED:
+                unprocessed.append(key)
+                continue
+            answered.append(key)
+            if attrs is not None:
+                results.append(cache.copy_attrs(attrs))
+        if len(unprocessed):
+            followups.append((unprocessed, attempt + 1))
+        return (answered, results), followups
+    
+    @classmethod
+    def _lookup_local(cls, keys, session, answered, results):
+        """
+        Answers what it can of `keys` from the session, the negative cache 
+        and the item cache, adding to `answered` and `results` like 
+        :meth:`_fetch_batch`. Returns the keys that still need fetching.
+        """
+        item_cache = cache.get_cache(cls)
+        missing = cache.get_negative_cache(cls)
+        if item_cache is None and missing is None and session is None:
+            return keys
+        missed = []
         for key in keys:
-            if key in h:
-                ret.append(cls(Item(cls._table, key, None, items[h[key]])))
+            attrs = None
+            if session is not None and session.get(cls, key) is not None:
+                # only the key is needed to find the tracked instance
+                attrs = session.get(cls, key)._item
+            elif missing is not None and key in missing:
+                # answered, without an item
+                answered.append(key)
+                continue
+            elif item_cache is not None:
+                attrs = item_cache.get(key)
+            if attrs is None:
+                missed.append(key)
             else:
-                ret.append(None)
-        logger.info('Got %i of %s in %s ConsumedCapacityUnits=%f' % (
-                        len(items), cls.__name__, time.time() - t1, 
-                        consumed_capacity))
-        return ret
+                answered.append(key)
+                results.append(attrs)
+        return missed
     
     @classmethod
-    def _fetch_batch_queue(cls, batch_queue, attributes_to_get=None):
-        results = []
+    def _submit_batch(cls, batch_keys, attempt, chunker, policy, stats, 
+                      started, attributes_to_get=None):
+        """
+        Sends a single `BatchGetItem`, returning the items and the keys
+        left unprocessed.
+        """
+        if attempt > 0 and not policy.allows(attempt, started):
+            raise BatchRetryError('Gave up fetching %d unprocessed keys of %s '
+                                  'after %d attempts' % (
+                                    len(batch_keys), cls.__name__, attempt),
+                                  batch_keys)
+        slept = policy.delay(attempt)
+        if slept:
+            time.sleep(slept)
+        # at least half a unit per key
+        reserved = len(batch_keys) * 0.5
+        limiter = cls._acquire('read', ratelimit.BULK, reserved)
+        batch = BatchList(Configure.get_connection())
+        batch.add_batch(cls._table, list(batch_keys),
+                        attributes_to_get=attributes_to_get)
         unprocessed = []
         consumed_capacity = 0.0
-        while len(batch_queue):
-            batch_keys = batch_queue.pop()
-            if not len(batch_keys):
-                continue
-            batch = BatchList(Configure.get_connection())
-            batch.add_batch(cls._table, [cls._hash_key_proto(k) 
-                                         for k in batch_keys],
-                            attributes_to_get=attributes_to_get)
-            try:
-                batch_ret = batch.submit()
-            except DynamoDBKeyNotFoundError:
-                continue
-            # import pprint
-            # pprint.pprint(batch_ret)
-            if ('UnprocessedKeys' in batch_ret and cls._full_table_name 
-                    in batch_ret['UnprocessedKeys']):
-                u = batch_ret['UnprocessedKeys'][cls._full_table_name]
-                u = [k['HashKeyElement'] for k in u['Keys']]
-                unprocessed.extend(u)
-            if ('Responses' in batch_ret and cls._full_table_name 
-                    in batch_ret['Responses']):
-                tbl = batch_ret['Responses'][cls._full_table_name]
-                results.extend(tbl['Items'])
-                consumed_capacity += tbl['ConsumedCapacityUnits']
-        return results, unprocessed, consumed_capacity
-    
-    @classmethod
-    def _get_batch_queue(cls, keys):
-        num_batches, last_batch_size = divmod(len(keys), 100)
-        batches = []
-        for i in xrange(num_batches+1):
-            batches.append(keys[i*100:(i+1)*100])
-        return batches
-    
-    @classmethod
-    def get_or_create_many(cls, dicts):
+        try:
+            batch_ret = batch.submit()
+        except DynamoDBKeyNotFoundError:
+            batch_ret = {}
+        except DynamoDBThroughputExceededError:
+            # boto has given up retrying, back off and requeue all of it
+            batch_ret = {}
+            unprocessed = list(batch_keys)
+        if ('UnprocessedKeys' in batch_ret and cls._full_table_name 
+                in batch_ret['UnprocessedKeys']):
+            u = batch_ret['UnprocessedKeys'][cls._full_table_name]
+            for k in u['Keys']:
+                if 'RangeKeyElement' in k:
+                    unprocessed.append((k['HashKeyElement'], 
+                                        k['RangeKeyElement']))
+                else:
+                    unprocessed.append(k['HashKeyElement'])
+        fetched = []
+        if ('Responses' in batch_ret and cls._full_table_name 
+                in batch_ret['Responses']):
+            tbl = batch_ret['Responses'][cls._full_table_name]
+            fetched = tbl['Items']
+            consumed_capacity += tbl['ConsumedCapacityUnits']
+        if limiter is not None:
+            limiter.charge(consumed_capacity, reserved)
+        chunker.record(len(batch_keys), len(unprocessed), 
+                       sum(estimate_size(item) for item in fetched))
+        stats.record(attempt, slept, chunker.size, consumed_capacity)
+        return fetched, unprocessed
+    
+    @classmethod
+    def query(cls, hash_key, range_condition=None, limit=None, reverse=False,
+              attributes_to_get=None, page_size=None, consistent_read=False,
+              start_key=None, prefetch=True):
+        """
+        Lazily iterates over the items sharing `hash_key`, in range key 
+        order, using `Query`. Each page is requested as it is needed,
+        following `LastEvaluatedKey`, and with `prefetch` the next page is
+        requested on the shared pool (see :meth:`aget`) while the current 
+        one is consumed.
+
+        The returned :class:`pynamo.paging.PageIterator` has a `resume_key`
+        holding the `(hash_key, range_key)` of the last object it yielded,
+        or `None` once the query is exhausted. Passing it back as 
+        `start_key` continues the query right after that object, so paged
+        endpoints don't need to keep the iterator around.
+
+        :type hash_key: str|dict
+        :param hash_key: The hash key, or a dictionary to build it from as 
+            for :meth:`prepare_key`
+
+        :type range_condition: :class:`boto.dynamodb.condition.Condition`
+        :param range_condition: Only return items whose range key matches,
+            one of `EQ`, `LE`, `LT`, `GE`, `GT`, `BEGINS_WITH` or `BETWEEN`
+
+        :type limit: int
+        :param limit: The most objects to return in total
+
+        :type reverse: bool
+        :param reverse: Return the objects in descending range key order
+
+        :type attributes_to_get: list
+        :param attributes_to_get: Only fetch these fields, see :meth:`get`
+
+        :type page_size: int
+        :param page_size: The most items each `Query` returns. Defaults to 
+            as many as fit into DynamoDB's 1MB response
+
+        :type consistent_read: bool
+        :param consistent_read: Use strongly consistent reads
+
+        :type start_key: tuple
+        :param start_key: The `resume_key` of an earlier query
+
+        :type prefetch: bool
+        :param prefetch: Request the next page in the background
+        """
+        cls._load_meta()
+        projection = cls._projection_for(attributes_to_get)
+        fetch = functools.partial(cls._query_page, cls.prepare_key(hash_key),
+                                  range_condition=range_condition,
+                                  projection=projection,
+                                  page_size=page_size,
+                                  consistent_read=consistent_read,
+                                  reverse=reverse)
+        return PageIterator(fetch, lambda obj: cls._key_from_attrs(obj._item),
+                            limit=limit, start_key=start_key,
+                            pool=Configure.get_pool() if prefetch else None)
+    
+    @classmethod
+    def _query_page(cls, hash_key, start_key, limit, range_condition=None,
+                    projection=None, page_size=None, consistent_read=False,
+                    reverse=False):
+        """
+        Sends a single `Query`, returning the objects and the 
+        `LastEvaluatedKey` of the page, see :class:`pynamo.paging.PageIterator`.
+        """
+        conn = Configure.get_connection()
+        if limit is not None and (page_size is None or limit < page_size):
+            page_size = limit
+        esk = None
+        if start_key is not None:
+            if not isinstance(start_key, (tuple, list)):
+                start_key = (start_key,)
+            esk = conn.build_key_from_values(cls._table.schema, *start_key)
+        limiter = cls._acquire('read', ratelimit.BULK)
+        t1 = time.time()
+        ret = conn.layer1.query(
+            cls._full_table_name, conn.dynamizer.encode(hash_key),
+            range_key_conditions=range_condition and range_condition.to_dict(),
+            attributes_to_get=projection and list(projection), limit=page_size,
+            consistent_read=consistent_read, scan_index_forward=not reverse,
+            exclusive_start_key=esk, object_hook=conn.dynamizer.decode)
+        if metrics.enabled():
+            metrics.record('query', cls, ret['Count'], time.time() - t1,
+                           ret['ConsumedCapacityUnits'], 
+                           size=sum(estimate_size(i) for i in ret['Items']))
+        if limiter is not None:
+            limiter.charge(ret['ConsumedCapacityUnits'], 1.0)
+        return ([cls(Item(cls._table, attrs=attrs), projection=projection)
+                 for attrs in ret['Items']], cls._last_evaluated_key(ret))
+    
+    @classmethod
+    def scan(cls, segments=1, workers=None, filter=None, 
+             attributes_to_get=None, checkpoint=None, read_fraction=None,
+             page_size=None):
+        """
+        Iterates over every item in the table using `Scan`, in no particular
+        order. The table is split into `segments` that are scanned in 
+        parallel by up to `workers` threads, and the objects of every 
+        segment are yielded through this one iterator as their pages arrive.
+
+        Pass a :class:`pynamo.checkpoint.Checkpoint`, such as a 
+        :class:`pynamo.checkpoint.FileCheckpoint`, to record how far each 
+        segment got. Running the scan again with the same checkpoint 
+        continues where it stopped. Items of the page being consumed when
+        the job stopped are yielded again.
+
+        :type segments: int
+        :param segments: How many parts to split the table into
+
+        :type workers: int
+        :param workers: How many `Scan` requests may be in flight at once.
+            Defaults to one per segment
+
+        :type filter: dict
+        :param filter: Field names mapped to 
+            :class:`boto.dynamodb.condition.Condition` objects the items 
+            must match. Filtered out items still consume capacity
+
+        :type attributes_to_get: list
+        :param attributes_to_get: Only fetch these fields, see :meth:`get`
+
+        :type checkpoint: :class:`pynamo.checkpoint.Checkpoint`
+        :param checkpoint: Where to record and resume the progress
+
+        :type read_fraction: float
+        :param read_fraction: Keep the scan under this fraction of the 
+            `read_units` :class:`Meta` per second, leaving the rest for 
+            regular traffic
+
+        :type page_size: int
+        :param page_size: The most items each `Scan` reads. Smaller pages
+            keep a throttled scan smoother
+        """
+        if checkpoint is None:
+            checkpoint = Checkpoint()
+        pages = cls.scan_pages(segments, workers, filter, attributes_to_get,
+                               checkpoint, read_fraction, page_size)
+        for segment, objs, last_key in pages:
+            for obj in objs:
+                yield obj
+            checkpoint.update(segment, last_key)
+
+    @classmethod
+    def scan_pages(cls, segments=1, workers=None, filter=None, 
+                   attributes_to_get=None, checkpoint=None, 
+                   read_fraction=None, page_size=None):
+        """
+        Like :meth:`scan`, but yields every page as a `(segment, objects, 
+        last_key)` tuple and leaves recording the progress to the caller: 
+        pass `last_key` to :meth:`pynamo.checkpoint.Checkpoint.update` once
+        the page is dealt with. `last_key` is `None` on a segment's last 
+        page.
+        """
+        cls._load_meta()
+        if workers is None:
+            workers = segments
+        if checkpoint is None:
+            checkpoint = Checkpoint()
+        checkpoint.start(segments)
+        throttle = None
+        if read_fraction is not None:
+            throttle = Throttle(cls.__read_units__ * read_fraction)
+        projection = cls._projection_for(attributes_to_get)
+        fetch = functools.partial(cls._scan_page, segments=segments, 
+                                  filter=filter, projection=projection,
+                                  page_size=page_size, throttle=throttle)
+        tasks = [(segment, checkpoint.positions.get(segment)) 
+                 for segment in xrange(segments) 
+                 if segment not in checkpoint.done]
+        return dispatch(fetch, tasks, workers)
+    
+    @classmethod
+    def _scan_page(cls, task, segments=1, filter=None, projection=None,
+                   page_size=None, throttle=None):
+        """
+        Sends a single `Scan` for a `(segment, start_key)` task, returning the
+        objects and `LastEvaluatedKey` along with a follow-up task for the
+        next page, as expected by :func:`pynamo.concurrency.dispatch`.
+        """
+        segment, start_key = task
+        conn = Configure.get_connection()
+        data = {'TableName': cls._full_table_name}
+        if segments > 1:
+            data['Segment'] = segment
+            data['TotalSegments'] = segments
+        if filter:
+            data['ScanFilter'] = conn.dynamize_scan_filter(filter)
+        if projection is not None:
+            data['AttributesToGet'] = list(projection)
+        if page_size is not None:
+            data['Limit'] = page_size
+        if start_key is not None:
+            if not isinstance(start_key, tuple):
+                start_key = (start_key,)
+            data['ExclusiveStartKey'] = conn.build_key_from_values(
+                                            cls._table.schema, *start_key)
+        limiter = cls._acquire('read', ratelimit.BULK)
+        t1 = time.time()
+        ret = conn.layer1.make_request('Scan', json.dumps(data), 
+                                       object_hook=conn.dynamizer.decode)
+        if metrics.enabled():
+            metrics.record('scan', cls, ret['Count'], time.time() - t1,
+                           ret['ConsumedCapacityUnits'], 
+                           size=sum(estimate_size(i) for i in ret['Items']))
+        if limiter is not None:
+            limiter.charge(ret['ConsumedCapacityUnits'], 1.0)
+        if throttle is not None:
+            throttle.charge(ret['ConsumedCapacityUnits'])
+        last_key = cls._last_evaluated_key(ret)
+        objs = [cls(Item(cls._table, attrs=attrs), projection=projection)
+                for attrs in ret['Items']]
+        followups = []
+        if last_key is not None:
+            followups.append((segment, last_key))
+        return (segment, objs, last_key), followups
+    
+    @classmethod
+    def _last_evaluated_key(cls, response):
+        """
+        The `LastEvaluatedKey` of a `Query` or `Scan` response in the same 
+        form as :meth:`_key_from_attrs`, `None` on the last page.
+        """
+        lek = response.get('LastEvaluatedKey')
+        if not lek:
+            return None
+        if 'RangeKeyElement' in lek:
+            return (lek['HashKeyElement'], lek['RangeKeyElement'])
+        return lek['HashKeyElement']
+    
+    @classmethod
+    def _get_batch_queue(cls, keys, size=100):
+        """
+        Lazily splits `keys` into lists of at most `size` keys.
+        """
+        batch = []
+        for key in keys:
+            batch.append(key)
+            if len(batch) == size:
+                yield batch
+                batch = []
+        if len(batch):
+            yield batch
+    
+    @classmethod
+    @metrics.traced('get_or_create_many')
+    def get_or_create_many(cls, dicts, persist=False, concurrency=None, 
+                           stats=None):
         """
         Does the same as get_or_create but on a collection of dictionaries
         instead. Returns a list of :class:`PersistentObject` the same as 
@@ -504,28 +1248,633 @@ class PersistentObject(object):
         the object has been modified, so it's a no-op on freshly retrieved 
         instances.
 
+        With `persist` the missing items are written right away instead, 
+        each with a `PutItem` that only succeeds if the item still does not
+        exist, up to `concurrency` at once. Items created by someone else in
+        the meantime are fetched again in a single :meth:`get_many`, so every
+        object returned is the one that is stored. Slots that share a key 
+        share the created object.
+
         :type dicts: list
         :param dicts: A list of dictionaries same as provided to `get_or_create`
+
+        :type persist: bool
+        :param persist: Whether to write the missing items
+
+        :type concurrency: int
+        :param concurrency: How many requests may be in flight at once.
+            Defaults to the `batch_concurrency` :class:`Meta`
+
+        :type stats: :class:`pynamo.retry.BatchStats`
+        :param stats: Filled in the same as for :meth:`get_many`
         """
         # keys = [item[cls._hash_key_name] for item in dicts]
-        ret = cls.get_many(dicts)
+        ret = cls.get_many(dicts, concurrency=concurrency, stats=stats)
         create = []
         for i, item in enumerate(ret):
             if item is None:
                 create.append((i, cls.create(dicts[i])))
-        for idx, item in create:
-            ret[idx] = item
+        if not persist:
+            for idx, item in create:
+                ret[idx] = item
+            return ret
+        if concurrency is None:
+            concurrency = cls.__batch_concurrency__
+        if stats is None:
+            stats = BatchStats()
+        # key -> the indexes of the slots, and the object to create
+        slots = collections.OrderedDict()
+        for idx, obj in create:
+            key = cls._key_from_attrs(obj._item)
+            if key not in slots:
+                slots[key] = ([], obj)
+            slots[key][0].append(idx)
+        t1 = time.time()
+        put = functools.partial(cls._put_if_absent, 
+                                policy=cls.__retry_policy__, stats=stats,
+                                started=t1)
+        tasks = [(key, obj, 0) for key, (idxs, obj) in slots.iteritems()]
+        attempt = 0
+        while len(tasks):
+            attempt += 1
+            conflicts = []
+            for done in dispatch(put, tasks, concurrency):
+                for key, obj, created in done:
+                    if created:
+                        cls._mark_written([('put', key, [obj])])
+                    else:
+                        conflicts.append(key)
+            tasks = []
+            if not len(conflicts):
+                break
+            missing = cache.get_negative_cache(cls)
+            s = session.current()
+            for key in conflicts:
+                if missing is not None:
+                    missing.discard(key)
+                if s is not None:
+                    s.discard(slots[key][1])
+            # whoever won the race wrote the item, read theirs
+            found = cls.get_many(conflicts, concurrency=concurrency, 
+                                 stats=stats)
+            for key, obj in zip(conflicts, found):
+                if obj is None:
+                    # and it is gone again, try creating it once more
+                    tasks.append((key, slots[key][1], attempt))
+                else:
+                    slots[key] = (slots[key][0], obj)
+        for key, (idxs, obj) in slots.iteritems():
+            for idx in idxs:
+                ret[idx] = obj
+        if metrics.enabled():
+            metrics.record('create_many', cls, len(slots), time.time() - t1,
+                           stats.consumed_capacity, stats.retries,
+                           sum(estimate_size(obj._item) 
+                               for idxs, obj in slots.itervalues()))
         return ret
     
+    @classmethod
+    def _put_if_absent(cls, task, policy, stats, started):
+        """
+        Runs a `(key, object, attempt)` task of :meth:`get_or_create_many`,
+        writing the object unless its key exists. Returns whether it was
+        created, as expected by :func:`pynamo.concurrency.dispatch`.
+        """
+        key, obj, attempt = task
+        if attempt > 0 and not policy.allows(attempt, started):
+            raise BatchRetryError('Gave up creating an item of %s after %d '
+                                  'attempts' % (cls.__name__, attempt), [key])
+        slept = policy.delay(attempt)
+        if slept:
+            time.sleep(slept)
+        limiter = cls._acquire('write', ratelimit.BULK)
+        try:
+            ret = obj._item.put(expected_value={cls._hash_key_name: False})
+        except DynamoDBConditionalCheckFailedError:
+            if limiter is not None:
+                # a failed condition still costs a write
+                limiter.charge(1.0, 1.0)
+            stats.record(attempt, slept, 1, 0.0)
+            return [(key, obj, False)], []
+        except DynamoDBThroughputExceededError:
+            if limiter is not None:
+                limiter.charge(0.0, 1.0)
+            stats.record(attempt, slept, 1, 0.0)
+            return [], [(key, obj, attempt + 1)]
+        if limiter is not None:
+            limiter.charge(ret['ConsumedCapacityUnits'], 1.0)
+        stats.record(attempt, slept, 1, ret['ConsumedCapacityUnits'])
+        return [(key, obj, True)], []
+    
+    @classmethod
+    def item_cache(cls):
+        """
+        Returns the cache of classes that declare `cache`, or `None`. A
+        :class:`pynamo.cache.LRUCache` exposes its hit, miss and eviction
+        counters through `stats()`.
+        """
+        cls._load_meta()
+        return cache.get_cache(cls)
+    
+    @classmethod
+    def missing_key_cache(cls):
+        """
+        Returns the :class:`pynamo.cache.NegativeCache` of classes that 
+        declare `negative_cache`, or `None`.
+        """
+        cls._load_meta()
+        return cache.get_negative_cache(cls)
+    
+    @classmethod
+    def write_buffer(cls):
+        """
+        Returns the :class:`pynamo.write_behind.WriteBehindBuffer` of classes
+        that declare `write_behind`, or `None`. Use its `flush()` and 
+        `close()` methods at shutdown and `errors()` to collect the objects
+        that failed to save.
+        """
+        cls._load_meta()
+        return write_behind.get_buffer(cls)
+    
+    @classmethod
+    @metrics.traced('save_many')
+    def save_many(cls, objs, concurrency=None, stats=None):
+        """
+        Saves every modified object in `objs`, 25 at a time using
+        `BatchWriteItem`. Up to `concurrency` requests are in flight at once
+        and unprocessed items are retried with the class's `retry_policy`.
+
+        `BatchWriteItem` can only put whole items, so objects that need
+        `UpdateItem` (pending set additions or removals, or objects fetched
+        with `attributes_to_get`) are saved individually, concurrently with
+        the batches. Unmodified objects are skipped, just like :meth:`save`.
+
+        :type objs: list
+        :param objs: The :class:`PersistentObject` instances to save
+
+        :type concurrency: int
+        :param concurrency: How many requests may be in flight at once.
+            Defaults to the `batch_concurrency` :class:`Meta`
+
+        :type stats: :class:`pynamo.retry.BatchStats`
+        :param stats: Filled in the same as for :meth:`get_many`
+        """
+        cls._write_many('save_many', cls._save_tasks(objs), concurrency, stats)
+        return objs
+    
+    @classmethod
+    def _save_tasks(cls, objs):
+        """
+        The write tasks that save the modified objects in `objs`, see 
+        :meth:`_write_batch`.
+        """
+        cls._load_meta()
+        puts = collections.OrderedDict()
+        tasks = []
+        for obj in objs:
+            if not obj._changed():
+                continue
+            key = cls._key_from_attrs(obj._item)
+            obj._start_write()
+            if obj._needs_update_item():
+                tasks.append(('update', [('update', key, [obj])], 0))
+            else:
+                # only one write per key is allowed in a batch, the last wins
+                puts.setdefault(key, []).append(obj)
+        ops = [('put', key, owners) for key, owners in puts.iteritems()]
+        tasks.extend(('batch', chunk, 0) 
+                     for chunk in cls._get_batch_queue(ops, 25))
+        return tasks
+    
+    @classmethod
+    @metrics.traced('delete_many')
+    def delete_many(cls, keys_or_objs, concurrency=None, stats=None):
+        """
+        Removes many items using `BatchWriteItem`, the same way 
+        :meth:`save_many` saves them.
+
+        :type keys_or_objs: list
+        :param keys_or_objs: :class:`PersistentObject` instances, or keys as
+            accepted by :meth:`get_many`
+
+        :type concurrency: int
+        :param concurrency: How many requests may be in flight at once.
+            Defaults to the `batch_concurrency` :class:`Meta`
+
+        :type stats: :class:`pynamo.retry.BatchStats`
+        :param stats: Filled in the same as for :meth:`get_many`
+        """
+        cls._write_many('delete_many', cls._delete_tasks(keys_or_objs), 
+                        concurrency, stats)
+    
+    @classmethod
+    def _delete_tasks(cls, keys_or_objs):
+        """
+        The write tasks that remove `keys_or_objs`, see :meth:`_write_batch`.
+        """
+        cls._load_meta()
+        deletes = collections.OrderedDict()
+        for k in keys_or_objs:
+            if isinstance(k, PersistentObject):
+                deletes.setdefault(cls._key_from_attrs(k._item), []).append(k)
+            else:
+                deletes.setdefault(cls.prepare_full_key(k), [])
+        ops = [('delete', key, owners) for key, owners in deletes.iteritems()]
+        return [('batch', chunk, 0) for chunk in cls._get_batch_queue(ops, 25)]
+    
+    @classmethod
+    def _write_many(cls, operation, tasks, concurrency, stats):
+        """
+        Dispatches write tasks from :meth:`save_many` or :meth:`delete_many`
+        and updates the flags of the objects as their writes complete.
+        """
+        if concurrency is None:
+            concurrency = cls.__batch_concurrency__
+        if stats is None:
+            stats = BatchStats()
+        t1 = time.time()
+        write = cls._batch_writer(stats, t1)
+        written = 0
+        size = 0
+        measure = metrics.enabled()
+        for done in dispatch(write, tasks, concurrency):
+            written += cls._mark_written(done)
+            if measure:
+                size += sum(estimate_size(owners[-1]._item) 
+                            for kind, key, owners in done if kind != 'delete')
+        if measure:
+            metrics.record(operation, cls, written, time.time() - t1, 
+                           stats.consumed_capacity, stats.retries, size)
+    
+    @classmethod
+    def _batch_writer(cls, stats, started):
+        return functools.partial(cls._write_batch,
+                                 chunker=AdaptiveChunker(max_size=25, step=5),
+                                 policy=cls.__retry_policy__,
+                                 stats=stats, started=started)
+    
+    @classmethod
+    def _mark_written(cls, ops):
+        """
+        Updates the flags of the objects whose writes completed. Returns how
+        many items were written.
+        """
+        item_cache = cache.get_cache(cls)
+        missing = cache.get_negative_cache(cls)
+        for kind, key, owners in ops:
+            if item_cache is not None:
+                if kind == 'put':
+                    # the whole item was written
+                    item_cache.put(key, owners[-1]._item)
+                else:
+                    item_cache.invalidate(key)
+            if missing is not None:
+                if kind == 'delete':
+                    missing.add(key)
+                else:
+                    missing.discard(key)
+            for obj in owners:
+                if kind == 'delete':
+                    obj._dirty = False
+                    obj._exists = False
+                else:
+                    obj._written()
+        return len(ops)
+    
+    @classmethod
+    def _write_batch(cls, task, chunker, policy, stats, started):
+        """
+        Runs a single write task. `('batch', ops, attempt)` tasks put and
+        delete up to 25 items in a `BatchWriteItem`, `('update', ops, 
+        attempt)` tasks save a single object with `UpdateItem`. Each op is a
+        `(kind, key, objects)` tuple. Returns the ops that were written and
+        follow-up tasks for the rest, as expected by 
+        :func:`pynamo.concurrency.dispatch`.
+        """
+        kind, ops, attempt = task
+        followups = []
+        if kind == 'batch':
+            ops, remainder = chunker.split(ops)
+            if len(remainder):
+                followups.append((kind, remainder, attempt))
+        if not len(ops):
+            return [], followups
+        if attempt > 0 and not policy.allows(attempt, started):
+            raise BatchRetryError('Gave up writing %d unprocessed items of %s '
+                                  'after %d attempts' % (
+                                    len(ops), cls.__name__, attempt),
+                                  [key for op, key, owners in ops])
+        slept = policy.delay(attempt)
+        if slept:
+            time.sleep(slept)
+        # at least a unit per item
+        reserved = float(len(ops))
+        limiter = cls._acquire('write', ratelimit.BULK, reserved)
+        if kind == 'update':
+            try:
+                ret = ops[0][2][0]._item.save()
+            except DynamoDBThroughputExceededError:
+                if limiter is not None:
+                    limiter.charge(0.0, reserved)
+                stats.record(attempt, slept, 1, 0.0)
+                followups.append((kind, ops, attempt + 1))
+                return [], followups
+            if limiter is not None:
+                limiter.charge(ret['ConsumedCapacityUnits'], reserved)
+            stats.record(attempt, slept, 1, ret['ConsumedCapacityUnits'])
+            return ops, followups
+        batch = BatchWriteList(Configure.get_connection())
+        batch.add_batch(cls._table, 
+                        puts=[owners[-1]._item 
+                              for op, key, owners in ops if op == 'put'],
+                        deletes=[key for op, key, owners in ops 
+                                 if op == 'delete'])
+        consumed_capacity = 0.0
+        unprocessed = set()
+        try:
+            batch_ret = batch.submit()
+        except DynamoDBThroughputExceededError:
+            # boto has given up retrying, back off and requeue all of it
+            batch_ret = {}
+            unprocessed = set((op, key) for op, key, owners in ops)
+        u = batch_ret.get('UnprocessedItems', {}).get(cls._full_table_name, [])
+        for req in u:
+            if 'PutRequest' in req:
+                unprocessed.add(('put', cls._key_from_attrs(
+                                            req['PutRequest']['Item'])))
+            else:
+                k = req['DeleteRequest']['Key']
+                if 'RangeKeyElement' in k:
+                    k = (k['HashKeyElement'], k['RangeKeyElement'])
+                else:
+                    k = k['HashKeyElement']
+                unprocessed.add(('delete', k))
+        if ('Responses' in batch_ret and cls._full_table_name 
+                in batch_ret['Responses']):
+            tbl = batch_ret['Responses'][cls._full_table_name]
+            consumed_capacity += tbl['ConsumedCapacityUnits']
+        if limiter is not None:
+            limiter.charge(consumed_capacity, reserved)
+        chunker.record(len(ops), len(unprocessed))
+        stats.record(attempt, slept, chunker.size, consumed_capacity)
+        if not len(unprocessed):
+            return ops, followups
+        done = [op for op in ops if (op[0], op[1]) not in unprocessed]
+        left = [op for op in ops if (op[0], op[1]) in unprocessed]
+        followups.append((kind, left, attempt + 1))
+        return done, followups
+    
+    # FUTURES
+    #
+    # Non-blocking counterparts of the methods above. They return a 
+    # :class:`pynamo.concurrency.Future` immediately and run their requests
+    # on a pool shared by every class, which never keeps more than 
+    # `Configure.MAX_CONNECTIONS` requests in flight. Use 
+    # `Future.add_done_callback` to hand results back to an event loop.
+
+    @classmethod
+    def acreate_table(cls):
+        """
+        Like :meth:`create_table` but returns a future that completes once
+        the table is no longer `CREATING`. No thread is held while waiting.
+        """
+        pool = Configure.get_pool()
+        return pool.submit(cls.create_table, wait=False).then(
+            lambda ret: poll(pool, cls._table_created))
+    
+    @classmethod
+    def aget(cls, *a, **kw):
+        """
+        Returns a future for :meth:`get`, which runs within the session and 
+        rate limit priority of the calling thread. While 
+        :func:`pynamo.loader.auto_batch` is active in the calling thread, 
+        the keys of every call made within its window are fetched by a 
+        single :meth:`get_many`.
+        """
+        batch_loader = loader.get_loader(cls)
+        if batch_loader is None:
+            return _submit(cls.get, *a, **kw)
+        cls._load_meta()
+        projection = cls._projection_for(kw.pop('attributes_to_get', None))
+        k = cls._key_from_args(a, kw)
+        
+        def found(obj):
+            if obj is None:
+                raise NotFoundError()
+            return obj
+        return batch_loader.load(k, projection).then(found)
+    
+    @classmethod
+    def aget_many(cls, keys, attributes_to_get=None, stats=None):
+        """
+        Returns a future for :meth:`get_many`. Every chunk, and every retry
+        of unprocessed keys, is submitted to the shared pool at once.
+        """
+        cls._load_meta()
+        if stats is None:
+            stats = BatchStats()
+        keys = [cls.prepare_full_key(k) for k in keys]
+        projection = cls._projection_for(attributes_to_get)
+        s = session.current()
+        fetch = functools.partial(cls._fetch_batch, 
+                                  chunker=AdaptiveChunker(), 
+                                  policy=cls.__retry_policy__, 
+                                  stats=stats, started=time.time(),
+                                  attributes_to_get=projection and 
+                                                    list(projection),
+                                  session=s)
+        unique = collections.OrderedDict.fromkeys(keys)
+        tasks = [(chunk, 0) for chunk in cls._get_batch_queue(unique)]
+        
+        def build(results):
+            found = {}
+            for resolved, items in results:
+                for item in items:
+                    found[cls._key_from_attrs(item)] = item
+            return [cls._adopt(found[key], projection, s) 
+                    if key in found else None for key in keys]
+        return dispatch_async(fetch, tasks, Configure.get_pool()).then(build)
+    
+    @classmethod
+    def asave_many(cls, objs, stats=None):
+        """
+        Returns a future for :meth:`save_many`, submitting every batch to the
+        shared pool at once.
+        """
+        if stats is None:
+            stats = BatchStats()
+        write = cls._batch_writer(stats, time.time())
+        
+        def mark(results):
+            for done in results:
+                cls._mark_written(done)
+            return objs
+        return dispatch_async(write, cls._save_tasks(objs), 
+                              Configure.get_pool()).then(mark)
+    
+    @classmethod
+    def adelete_many(cls, keys_or_objs, stats=None):
+        """
+        Returns a future for :meth:`delete_many`, submitting every batch to 
+        the shared pool at once.
+        """
+        if stats is None:
+            stats = BatchStats()
+        write = cls._batch_writer(stats, time.time())
+        
+        def mark(results):
+            for done in results:
+                cls._mark_written(done)
+        return dispatch_async(write, cls._delete_tasks(keys_or_objs), 
+                              Configure.get_pool()).then(mark)
+    
     def __new__(cls, *args, **kwargs):
         cls._load_meta()
         return object.__new__(cls, *args, **kwargs)
 
-    def __init__(self, item, is_new=False):
+    def __init__(self, item, is_new=False, projection=None):
+        if not is_new:
+            # boto queues a PUT for every attribute an Item is built with,
+            # a fetched item has nothing pending
+            item._updates.clear()
+        self._version = 0
+        self._in_flight = None
         self._dirty = is_new
         self._item = item
         self._exists = not is_new
-        self._property_cache = {}
+        # the decoded values of the fields that need decoding, created on 
+        # first use, see :class:`pynamo.codec.Codec`
+        self._property_cache = None
+        # the names of the fields that were fetched, None if all of them
+        self._projection = projection
+    
+    def _is_loaded(self, name):
+        return self._projection is None or name in self._projection
+    
+    def _needs_update_item(self):
+        """
+        Whether saving this object requires `UpdateItem`, because a `PutItem`
+        of the whole item would lose pending set additions or removals, or
+        the fields that were not fetched.
+        """
+        if not self._exists:
+            return False
+        if self._projection is not None:
+            return True
+        for action, value in self._item._updates.itervalues():
+            if action == 'ADD' or (action == 'DELETE' and value is not None):
+                return True
+        return False
+    
+    def _mark_loaded(self, name):
+        if self._projection is not None:
+            self._projection = self._projection | frozenset([name])
+
+    def _changed(self):
+        """
+        Whether there is anything to save, after recording the lists, dicts
+        and sets that were changed in place.
+        """
+        return self._codec.sync(self)
+
+    def _get_dirty(self):
+        return self._modified
+
+    def _set_dirty(self, value):
+        if value:
+            # tells a write that is in flight it did not send everything
+            self._version += 1
+        self._modified = value
+
+    _dirty = property(_get_dirty, _set_dirty)
+
+    def _start_write(self):
+        """
+        Records what a write about to be sent covers, see :meth:`_written`.
+        """
+        self._in_flight = (self._version, dict(self._item._updates))
+
+    def _written(self):
+        """
+        Called once the write started by :meth:`_start_write` completed. The
+        object is only clean if it wasn't changed while the write was in
+        flight, otherwise the updates made since are kept for the next save.
+        """
+        started, self._in_flight = self._in_flight, None
+        self._exists = True
+        pending = self._item._updates
+        if started is None or started[0] == self._version:
+            self._dirty = False
+            # PutItem leaves the pending updates in place
+            pending.clear()
+            return
+        for name, update in started[1].iteritems():
+            if pending.get(name) is update:
+                del pending[name]
+
+    def _absorb(self, other):
+        """
+        Takes over the pending updates of `other`, an object with the same 
+        key saved before this one, so that writing this object writes them
+        too. Where both change a field this object wins, except that set 
+        additions and removals are combined.
+        """
+        other._start_write()
+        if other is self:
+            return
+        item, updates = self._item, self._item._updates
+        for name, (action, value) in other._item._updates.iteritems():
+            mine = updates.get(name)
+            if mine is None:
+                updates[name] = (action, value)
+                if name in other._item:
+                    dict.__setitem__(item, name, other._item[name])
+                elif name in item:
+                    dict.__delitem__(item, name)
+            elif (mine[0] == action and action in ('ADD', 'DELETE') and
+                    isinstance(mine[1], set) and isinstance(value, set)):
+                updates[name] = (action, mine[1] | value)
+                current = item.get(name) or set()
+                dict.__setitem__(item, name, current | value 
+                                 if action == 'ADD' else current - value)
+            else:
+                continue
+            c = self._property_cache
+            if c is not None:
+                c.pop(name, None)
+            self._dirty = True
+
+    def _load_unprojected(self, name):
+        """
+        Called by :class:`Field` when reading a field that was left out of 
+        the projection this object was fetched with. Fetches every field that
+        is still missing in a single `GetItem`.
+        """
+        cls = self.__class__
+        if cls.__strict_projection__:
+            raise UnloadedFieldError('%s was not fetched for %r' % (name, self))
+        missing = [n for n in cls._properties if not self._is_loaded(n)]
+        limiter = cls._acquire('read', ratelimit.INTERACTIVE)
+        t1 = time.time()
+        r = None
+        try:
+            r = cls._table.get_item(self._item.hash_key, self._item.range_key,
+                                    attributes_to_get=missing)
+        except DynamoDBKeyNotFoundError:
+            raise NotFoundError()
+        finally:
+            if metrics.enabled():
+                metrics.record('load', cls, 0 if not r else 1, 
+                               time.time() - t1, 
+                               r.consumed_units if r else 0.0,
+                               size=r and estimate_size(r) or 0)
+            if limiter is not None:
+                limiter.charge(r.consumed_units if r else 0.5, 1.0)
+        for n in missing:
+            if n in r:
+                # bypass Item.__setitem__, this is not a pending update
+                dict.__setitem__(self._item, n, r[n])
+        self._projection = None
     
     def __unicode__(self):
         cls = self.__class__
@@ -539,8 +1888,11 @@ class PersistentObject(object):
         return self.__str__()
     
     def to_dict(self):
-        return {n: getattr(self.__class__, n).render(getattr(self, n)) 
-                    for n in self._properties}
+        """
+        Renders the fields as a dictionary. Objects fetched with 
+        `attributes_to_get` only include the fields they have loaded.
+        """
+        return self._codec.to_dict(self)
     
     def verbose_string(self):
         """
@@ -550,6 +1902,7 @@ class PersistentObject(object):
                             ' '.join(['='.join(list(map(str, p))) 
                                       for p in self.to_dict().iteritems()]))
 
+    @metrics.traced('save')
     def save(self, force_put=False):
         """
         Performs a save operation if any properties have been changed. 
@@ -558,29 +1911,78 @@ class PersistentObject(object):
         `PutItem` otherwise. 
 
         `UpdateItem` saves only the fields that have been changed. This is
-        potentially a faster operation, minimizing network traffic.
+        potentially a faster operation, minimizing network traffic. Lists,
+        dicts and sets changed in place, e.g. `obj.tags.add('x')`, count as
+        changed, there is no need to assign them again.
 
         `PutItem` sends the entire item, replacing all fields no matter what.
+        Objects fetched with `attributes_to_get` always use `UpdateItem` so
+        the fields they did not load are left alone.
+
+        If the class declares `write_behind` the object is queued instead and 
+        written later in a batch, see :meth:`write_buffer`. Within a 
+        :class:`pynamo.session.Session` the save is deferred until the 
+        session is flushed. Forcing a put always writes immediately.
 
         :type force_put: bool
         :param force_put: Forces the entire item to be sent to DynamoDB using
             `PutItem`
         """
+        if force_put and self._projection is not None:
+            raise ValueError('Can not force a PutItem of %r, it was fetched '
+                             'with attributes_to_get and would remove the '
+                             'fields that were not loaded.' % (self,))
+        if not force_put:
+            s = session.current()
+            if s is not None:
+                s.add(self, replace=True)
+                return self
+        self._changed()
+        if self._dirty and not force_put:
+            buf = write_behind.get_buffer(self.__class__)
+            if buf is not None and not buf.closed:
+                missing = cache.get_negative_cache(self.__class__)
+                if missing is not None:
+                    missing.discard(self._key_from_attrs(self._item))
+                buf.put(self)
+                return self
         if self._dirty:
+            cls = self.__class__
+            limiter = cls._acquire('write', ratelimit.INTERACTIVE)
             t1 = time.time()
             ret = {'ConsumedCapacityUnits': 0}
+            item_cache = cache.get_cache(cls)
+            missing = cache.get_negative_cache(cls)
+            self._start_write()
             try:
                 if self._exists and not force_put:
                     ret = self._item.save()
+                    if item_cache is not None:
+                        item_cache.invalidate(cls._key_from_attrs(self._item))
                 else:
                     ret = self._item.put()
-                self._dirty = False
+                    if item_cache is not None:
+                        item_cache.put(cls._key_from_attrs(self._item), 
+                                       self._item)
+                if missing is not None:
+                    missing.discard(cls._key_from_attrs(self._item))
+                self._written()
             finally:
-                logger.info('Saved 1 %s in %s ConsumedCapacityUnits=%f' % (
-                                self.__class__.__name__, time.time() - t1,
-                                ret['ConsumedCapacityUnits']))
+                if metrics.enabled():
+                    metrics.record('save', cls, 1, time.time() - t1,
+                                   ret['ConsumedCapacityUnits'], 
+                                   size=estimate_size(self._item))
+                if limiter is not None:
+                    limiter.charge(ret['ConsumedCapacityUnits'], 1.0)
         return self
     
+    def asave(self, force_put=False):
+        """
+        Returns a future for :meth:`save`, which runs within the session and
+        rate limit priority of the calling thread.
+        """
+        return _submit(self.save, force_put)
+    
     def update(self, d):
         """
         Convenience method for updating multiple attributes at once.
@@ -592,9 +1994,37 @@ class PersistentObject(object):
             setattr(self, k, v)
         return self
     
+    @metrics.traced('delete')
     def delete(self):
         """
-        Removes this item from DynamoDB.
+        Removes this item from DynamoDB. Sends a `DeleteItem`. To remove many
+        items at once use :meth:`delete_many`. Within a 
+        :class:`pynamo.session.Session` the delete is deferred until the 
+        session is flushed.
         """
-        raise NotImplementedError
+        s = session.current()
+        if s is not None:
+            s.delete(self)
+            return self
+        cls = self.__class__
+        limiter = cls._acquire('write', ratelimit.INTERACTIVE)
+        t1 = time.time()
+        ret = {'ConsumedCapacityUnits': 0}
+        item_cache = cache.get_cache(cls)
+        missing = cache.get_negative_cache(cls)
+        try:
+            ret = self._item.delete()
+            if item_cache is not None:
+                item_cache.invalidate(cls._key_from_attrs(self._item))
+            if missing is not None:
+                missing.add(cls._key_from_attrs(self._item))
+            self._exists = False
+            self._dirty = False
+        finally:
+            if metrics.enabled():
+                metrics.record('delete', cls, 1, time.time() - t1,
+                               ret['ConsumedCapacityUnits'])
+            if limiter is not None:
+                limiter.charge(ret['ConsumedCapacityUnits'], 1.0)
+        return self
 
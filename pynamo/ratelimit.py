@@ -0,0 +1,163 @@
+import threading, heapq, itertools, time, contextlib
+
+__doc__ = """
+Client-side limiting of the capacity a process consumes, per table, for
+:class:`pynamo.PersistentObject` subclasses that declare the `rate_limit`
+:class:`pynamo.Meta`.
+
+Every request reserves what it expects to consume in
+:meth:`RateLimiter.acquire`, waiting until the table has capacity left, and
+then settles what it actually consumed with :meth:`RateLimiter.charge`, so
+bulk jobs slow down smoothly instead of being throttled by DynamoDB.
+Waiting requests go in order of priority, then of arrival. Single-item
+operations default to :data:`INTERACTIVE` and batch operations, queries and
+scans to :data:`BULK`. A thread can override both for a block::
+
+    with priority(INTERACTIVE):
+        users = User.get_many(keys)
+"""
+
+BULK = 0
+INTERACTIVE = 10
+
+
+class RateLimiter(object):
+    """
+    A token bucket refilled with `rate` units per second that holds up to
+    `burst` seconds worth of them. Thread safe.
+
+    Capacity is only known once a response reports it, so requests reserve
+    an estimate and :meth:`charge` may take the bucket below zero. Requests
+    then wait until the debt is paid off.
+
+    :type rate: float
+    :param rate: Units per second
+
+    :type burst: float
+    :param burst: How many seconds of unused capacity may be saved up
+    """
+    def __init__(self, rate, burst=1.0):
+        if rate <= 0:
+            raise ValueError('A RateLimiter needs a positive rate')
+        self.rate = float(rate)
+        self.capacity = self.rate * burst
+        self.waited = 0.0
+        self._tokens = self.capacity
+        self._updated = time.time()
+        # (-priority, arrival) of every waiting request
+        self._waiting = []
+        self._arrivals = itertools.count()
+        self._cond = threading.Condition(threading.Lock())
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity,
+                           self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, priority=BULK, units=1.0):
+        """
+        Waits until there is capacity left and no request of a higher, or
+        the same but earlier, priority is waiting, then reserves `units`.
+        Returns the time waited.
+        """
+        t1 = time.time()
+        with self._cond:
+            self._refill(t1)
+            if self._tokens > 0 and not self._waiting:
+                self._tokens -= units
+                return 0.0
+            me = (-priority, next(self._arrivals))
+            heapq.heappush(self._waiting, me)
+            try:
+                while True:
+                    now = time.time()
+                    self._refill(now)
+                    if self._waiting[0] == me and self._tokens > 0:
+                        break
+                    timeout = None
+                    if self._waiting[0] == me:
+                        timeout = -self._tokens / self.rate
+                    self._cond.wait(timeout)
+                self._tokens -= units
+            finally:
+                self._waiting.remove(me)
+                heapq.heapify(self._waiting)
+                # let the next in line check for itself
+                self._cond.notify_all()
+            waited = time.time() - t1
+            self.waited += waited
+        return waited
+
+    def charge(self, units, reserved=0.0):
+        """
+        Settles the `units` a request consumed against the units it
+        `reserved` in :meth:`acquire`.
+        """
+        with self._cond:
+            self._refill(time.time())
+            self._tokens -= units - reserved
+            if units < reserved:
+                self._cond.notify_all()
+
+
+_local = threading.local()
+
+
+def current_priority(default):
+    """
+    The priority set with :func:`priority` in this thread, or `default`.
+    """
+    return getattr(_local, 'priority', default)
+
+
+@contextlib.contextmanager
+def priority(value):
+    """
+    Makes every request of the calling thread wait with priority `value`
+    while the block runs.
+    """
+    previous = getattr(_local, 'priority', None)
+    _local.priority = value
+    try:
+        yield
+    finally:
+        if previous is None:
+            del _local.priority
+        else:
+            _local.priority = previous
+
+
+_lock = threading.Lock()
+# (table name, 'read' or 'write') -> RateLimiter, shared by every class
+_limiters = {}
+
+
+def get_limiter(cls, kind):
+    """
+    Returns the limiter for the `kind` ('read' or 'write') units of the table
+    of a class that declares `rate_limit`, or `None` for classes that don't.
+
+    The rate is a `fraction` of the throughput the table was described with,
+    or of the `read_units` or `write_units` :class:`pynamo.Meta` if it has
+    not been described. `rate_limit` may be `True`, or keyword arguments
+    with the `fraction` (0.8 by default) and `burst`.
+    """
+    options = cls.__rate_limit__
+    if not options:
+        return None
+    ident = (cls._full_table_name, kind)
+    limiter = _limiters.get(ident)
+    if limiter is not None:
+        return limiter
+    if options is True:
+        options = {}
+    units = getattr(cls._table, kind + '_units', None)
+    if not units:
+        units = getattr(cls, '__%s_units__' % kind)
+    with _lock:
+        limiter = _limiters.get(ident)
+        if limiter is None:
+            limiter = _limiters[ident] = RateLimiter(
+                units * options.get('fraction', 0.8),
+                options.get('burst', 1.0))
+    return limiter
@@ -0,0 +1,170 @@
+import random, threading, time
+from boto.dynamodb.types import Binary
+
+__doc__ = """
+Scheduling for the requests DynamoDB leaves unprocessed in batch operations:
+exponential backoff with jitter, an attempt/deadline budget and a chunk size
+that adapts to how much of each batch DynamoDB actually processed.
+"""
+
+# BatchGetItem responses are truncated at 1MB
+RESPONSE_SIZE_LIMIT = 1024 * 1024
+
+
+class RetryPolicy(object):
+    """
+    Exponential backoff with "full jitter": the n'th retry sleeps a random
+    amount between zero and `min(cap, base * 2 ** n)` seconds.
+
+    :type base: float
+    :param base: The backoff of the first retry in seconds
+
+    :type cap: float
+    :param cap: The most any single retry sleeps
+
+    :type max_attempts: int
+    :param max_attempts: How many requests a single chunk of keys may take
+        before giving up. `None` is unlimited.
+
+    :type deadline: float
+    :param deadline: Seconds after the start of the call after which no more
+        retries are scheduled. `None` is unlimited.
+    """
+    def __init__(self, base=0.05, cap=5.0, max_attempts=10, deadline=None):
+        self.base = base
+        self.cap = cap
+        self.max_attempts = max_attempts
+        self.deadline = deadline
+
+    def delay(self, attempt):
+        """
+        How long to sleep before the `attempt`'th request (the first is 0).
+        """
+        if attempt <= 0:
+            return 0.0
+        return random.uniform(0, min(self.cap, self.base * 2 ** attempt))
+
+    def allows(self, attempt, started):
+        """
+        Whether the budget leaves room for the `attempt`'th request of a
+        call that started at `started`.
+        """
+        if self.max_attempts is not None and attempt >= self.max_attempts:
+            return False
+        if (self.deadline is not None
+                and time.time() - started >= self.deadline):
+            return False
+        return True
+
+
+class AdaptiveChunker(object):
+    """
+    Tracks how many keys to put into a single batch request. The size is
+    halved whenever a response leaves more than `shrink_ratio` of its keys
+    unprocessed, or comes close to the 1MB response limit, and grows back by
+    `step` after every fully processed request. Thread safe, so one chunker is
+    shared by every request of a call.
+    """
+    def __init__(self, max_size=100, min_size=1, step=10, shrink_ratio=0.5):
+        self.max_size = max_size
+        self.min_size = min_size
+        self.step = step
+        self.shrink_ratio = shrink_ratio
+        self.size = max_size
+        self._lock = threading.Lock()
+
+    def record(self, requested, unprocessed, response_bytes=0):
+        with self._lock:
+            if not requested:
+                return
+            if (float(unprocessed) / requested > self.shrink_ratio or
+                    response_bytes >= RESPONSE_SIZE_LIMIT * 0.9):
+                # requests sent before an earlier shrink don't count again
+                if requested <= self.size:
+                    self.size = max(self.min_size, self.size // 2)
+            elif not unprocessed:
+                self.size = min(self.max_size, self.size + self.step)
+
+    def split(self, keys):
+        """
+        Splits off as many keys as the current chunk size allows. Returns
+        `(chunk, remainder)`.
+        """
+        size = self.size
+        return keys[:size], keys[size:]
+
+
+class BatchStats(object):
+    """
+    Counters for a single batch call, updated from every worker thread.
+    """
+    def __init__(self):
+        self.attempts = 0
+        self.retries = 0
+        self.sleep_time = 0.0
+        self.chunk_size = 0
+        self.consumed_capacity = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, attempt, slept, chunk_size, consumed_capacity):
+        with self._lock:
+            self.attempts += 1
+            if attempt > 0:
+                self.retries += 1
+            self.sleep_time += slept
+            self.chunk_size = chunk_size
+            self.consumed_capacity += consumed_capacity
+
+    def __str__(self):
+        return ('ConsumedCapacityUnits=%f Attempts=%d Retries=%d '
+                'SleepTime=%f ChunkSize=%d' % (
+                    self.consumed_capacity, self.attempts, self.retries,
+                    self.sleep_time, self.chunk_size))
+
+
+def estimate_size(item):
+    """
+    A rough count of the bytes an item takes up in a response.
+    """
+    size = 0
+    for k, v in item.iteritems():
+        size += len(k)
+        if isinstance(v, basestring):
+            size += len(v)
+        elif isinstance(v, Binary):
+            size += len(v.value)
+        elif isinstance(v, (set, frozenset, list)):
+            size += sum(len(x) if isinstance(x, basestring) else 8
+                        for x in v)
+        else:
+            size += 8
+    return size
+
+
+class Throttle(object):
+    """
+    Keeps the capacity consumed by a call under `rate` units per second.
+    Requests report what they consumed with :meth:`charge`, which sleeps
+    for as long as the call is ahead of its rate. Thread safe.
+    """
+    def __init__(self, rate):
+        if rate <= 0:
+            raise ValueError('A Throttle needs a positive rate')
+        self.rate = float(rate)
+        self._next = time.time()
+        self._lock = threading.Lock()
+
+    def charge(self, units):
+        """
+        Records `units` consumed and sleeps until the rate allows another
+        request. Returns the time slept.
+        """
+        with self._lock:
+            now = time.time()
+            self._next = max(self._next, now) + units / self.rate
+            wait = self._next - now - 1.0
+        # a second's worth of capacity may be used in a burst
+        if wait > 0:
+            time.sleep(wait)
+            return wait
+        return 0.0
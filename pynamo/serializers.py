@@ -0,0 +1,207 @@
+import json, marshal, zlib
+from boto.dynamodb.types import Binary
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+try:
+    import simplejson
+except ImportError:
+    simplejson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+__doc__ = """
+How :class:`pynamo.fields.ObjectField` turns its values into attributes.
+
+By default values are stored as a JSON string, as they always were. Fields
+may pick another :class:`Serializer` and a size above which values are
+compressed::
+
+    class Report(PersistentObject):
+        ...
+        totals = DictField(serializer='msgpack', compress_over=1024)
+
+Anything that is not plain JSON is stored as a binary attribute starting with
+a header naming its serializer and compression. Values are only decoded by
+the serializer the field is configured with, a header naming another one is
+an error, so a JSON field never runs e.g. `marshal` on what it reads. Values
+compressed or not decode whatever `compress_over` is now, and plain JSON
+strings written before any of this still decode.
+"""
+
+# the first byte of every binary value, followed by the serializer's tag and
+# the compression's
+MAGIC = '\xd5'
+PLAIN = '-'
+ZLIB = 'z'
+
+
+class Serializer(object):
+    """
+    Converts values to and from byte strings. `tag` is the single character
+    written into the header of binary values. Serializers with `text` set
+    produce JSON, which is stored as a plain string when not compressed.
+    """
+    name = None
+    tag = None
+    text = False
+
+    def dumps(self, value):
+        raise NotImplementedError
+
+    def loads(self, data):
+        raise NotImplementedError
+
+
+class JSONSerializer(Serializer):
+    """
+    The standard library's `json`.
+    """
+    name = 'json'
+    tag = 'j'
+    text = True
+
+    def dumps(self, value):
+        return json.dumps(value)
+
+    def loads(self, data):
+        return json.loads(data)
+
+
+class FastJSONSerializer(JSONSerializer):
+    """
+    JSON through `ujson` or `simplejson` if either is installed, otherwise the
+    standard library. Its output is read by :class:`JSONSerializer` and vice
+    versa, so both share a tag.
+    """
+    name = 'fastjson'
+
+    def __init__(self):
+        module = ujson or simplejson or json
+        self.module = module.__name__
+        self._dumps = module.dumps
+        self._loads = module.loads
+
+    def dumps(self, value):
+        return self._dumps(value)
+
+    def loads(self, data):
+        return self._loads(data)
+
+
+class MsgpackSerializer(Serializer):
+    """
+    MessagePack, which needs the `msgpack` package.
+    """
+    name = 'msgpack'
+    tag = 'm'
+
+    def __init__(self):
+        if msgpack is None:
+            raise ImportError('The msgpack serializer needs the msgpack '
+                              'package')
+
+    def dumps(self, value):
+        return msgpack.packb(value)
+
+    def loads(self, data):
+        return msgpack.unpackb(data)
+
+
+class MarshalSerializer(Serializer):
+    """
+    The standard library's `marshal`, fast and compact but only readable by
+    Python. Don't use it for values written by untrusted clients.
+    """
+    name = 'marshal'
+    tag = 'M'
+
+    def dumps(self, value):
+        return marshal.dumps(value, 2)
+
+    def loads(self, data):
+        return marshal.loads(data)
+
+
+_serializers = {}
+
+
+def register(serializer_class):
+    """
+    Makes `serializer_class` available by its name to fields. Returns the
+    class, so it can be a decorator.
+    """
+    _serializers[serializer_class.name] = serializer_class
+    return serializer_class
+
+
+for _cls in (JSONSerializer, FastJSONSerializer, MsgpackSerializer,
+             MarshalSerializer):
+    register(_cls)
+
+# one instance of each serializer is enough
+_instances = {}
+
+
+def get_serializer(name_or_serializer):
+    """
+    The :class:`Serializer` registered as `name_or_serializer`, or the
+    argument itself if it is already one.
+    """
+    if isinstance(name_or_serializer, Serializer):
+        return name_or_serializer
+    try:
+        cls = _serializers[name_or_serializer]
+    except KeyError:
+        raise ValueError('No serializer is named %r' % (name_or_serializer,))
+    if cls not in _instances:
+        _instances[cls] = cls()
+    return _instances[cls]
+
+
+def encode(value, serializer, compress_over=None):
+    """
+    Serializes `value` into a string, or a `Binary` with a header if it is
+    compressed or not JSON.
+    """
+    data = serializer.dumps(value)
+    compression = PLAIN
+    if compress_over is not None and len(data) > compress_over:
+        packed = zlib.compress(data)
+        if len(packed) < len(data):
+            data, compression = packed, ZLIB
+    if serializer.text and compression == PLAIN:
+        return data
+    return Binary(MAGIC + serializer.tag + compression + data)
+
+
+def decode(value, serializer=None):
+    """
+    The value stored by :func:`encode` with `serializer`, JSON by default,
+    or by plain JSON fields. Raises `ValueError` for values another
+    serializer wrote.
+    """
+    if serializer is None:
+        serializer = get_serializer('json')
+    if not isinstance(value, Binary):
+        if serializer.text:
+            return serializer.loads(value)
+        return json.loads(value)
+    data = value.value
+    if data[:1] != MAGIC or len(data) < 3:
+        raise ValueError('Binary value without a serializer header')
+    tag, compression, data = data[1], data[2], data[3:]
+    if tag != serializer.tag:
+        raise ValueError('Value written by the serializer tagged %r, not %s'
+                         % (tag, serializer.name))
+    if compression == ZLIB:
+        data = zlib.decompress(data)
+    elif compression != PLAIN:
+        raise ValueError('Unknown compression %r' % (compression,))
+    return serializer.loads(data)
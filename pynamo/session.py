@@ -0,0 +1,180 @@
+import threading, collections, contextlib
+from .concurrency import gather
+
+__doc__ = """
+An identity map and unit of work for :class:`pynamo.PersistentObject`.
+
+e.g.::
+    with Session():
+        user = User.get('bob')
+        User.get('bob').visits += 1    # the same instance, no GetItem
+        user.save()                    # deferred
+        Event.create(key=...).save()   # deferred
+    # both items are written together here
+"""
+
+_local = threading.local()
+
+
+def current():
+    """
+    Returns the innermost :class:`Session` active in this thread, or `None`.
+    """
+    stack = getattr(_local, 'stack', None)
+    if stack:
+        return stack[-1]
+    return None
+
+
+@contextlib.contextmanager
+def use(s):
+    """
+    Makes `s` the innermost session of the calling thread while the block
+    runs, without flushing it on the way out, e.g. in a pool thread doing
+    work for the thread that opened it. Does nothing if `s` is `None`.
+    """
+    if s is None:
+        yield
+        return
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    stack.append(s)
+    try:
+        yield
+    finally:
+        stack.pop()
+
+
+class Session(object):
+    """
+    While a session is active in a thread, :meth:`PersistentObject.get`,
+    :meth:`PersistentObject.get_many` and their relatives return the same
+    instance for the same key, fetching each key at most once. Objects that
+    are read, created or saved are tracked, and :meth:`PersistentObject.save`
+    and :meth:`PersistentObject.delete` are deferred until :meth:`flush`.
+
+    Leaving the `with` block flushes every modified object at once, with
+    `BatchWriteItem` for whole items and concurrent `UpdateItem` requests
+    for partial updates, all classes in parallel. Nothing is written if the
+    block raises.
+    """
+    def __init__(self):
+        # (class, key) -> object
+        self._objects = {}
+        # dirty objects displaced by another instance of the same key
+        self._displaced = []
+        self._deleted = collections.OrderedDict()
+        self._lock = threading.RLock()
+
+    def __enter__(self):
+        stack = getattr(_local, 'stack', None)
+        if stack is None:
+            stack = _local.stack = []
+        stack.append(self)
+        return self
+
+    def __exit__(self, typ, value, tb):
+        _local.stack.remove(self)
+        if typ is None:
+            self.flush()
+
+    def __len__(self):
+        return len(self._objects)
+
+    def get(self, cls, key):
+        """
+        Returns the tracked instance of `cls` for `key`, or `None`.
+        """
+        with self._lock:
+            return self._objects.get((cls, key))
+
+    def add(self, obj, replace=False):
+        """
+        Tracks `obj` and returns the instance the session holds for its key,
+        which is `obj` unless another instance was already tracked. With
+        `replace`, `obj` takes the place of any earlier instance.
+        """
+        cls = obj.__class__
+        ident = (cls, cls._key_from_attrs(obj._item))
+        with self._lock:
+            old = self._objects.get(ident)
+            if old is not None and not replace:
+                return old
+            if (old is not None and old is not obj and 
+                    old._changed()):
+                self._displaced.append(old)
+            self._objects[ident] = obj
+            if replace:
+                self._deleted.pop(ident, None)
+        return obj
+
+    def is_deleted(self, cls, key):
+        """
+        Whether the item of `cls` at `key` is scheduled to be deleted.
+        """
+        with self._lock:
+            return (cls, key) in self._deleted
+
+    def delete(self, obj):
+        """
+        Schedules `obj` to be deleted by :meth:`flush`.
+        """
+        cls = obj.__class__
+        ident = (cls, cls._key_from_attrs(obj._item))
+        with self._lock:
+            self._objects.pop(ident, None)
+            self._deleted[ident] = obj
+
+    def discard(self, obj):
+        """
+        Stops tracking `obj` without writing it.
+        """
+        cls = obj.__class__
+        ident = (cls, cls._key_from_attrs(obj._item))
+        with self._lock:
+            if self._objects.get(ident) is obj:
+                del self._objects[ident]
+
+    def dirty(self):
+        """
+        The tracked objects that :meth:`flush` would save.
+        """
+        with self._lock:
+            objs = self._displaced + self._objects.values()
+        return [obj for obj in objs if obj._changed()]
+
+    def flush(self):
+        """
+        Writes every modified object and performs the deletes, then forgets
+        the deleted objects. Objects that failed to be written are kept for
+        the next flush.
+        """
+        with self._lock:
+            saves = collections.defaultdict(list)
+            for obj in self.dirty():
+                saves[obj.__class__].append(obj)
+            deletes = collections.defaultdict(list)
+            for (cls, key), obj in self._deleted.iteritems():
+                deletes[cls].append(obj)
+        futures = [cls.asave_many(objs) for cls, objs in saves.iteritems()]
+        futures.extend(cls.adelete_many(objs)
+                       for cls, objs in deletes.iteritems())
+        try:
+            gather(futures).result()
+        finally:
+            # whatever failed is kept for the next flush
+            with self._lock:
+                self._displaced = [o for o in self._displaced if o._dirty]
+                for ident, obj in self._deleted.items():
+                    if not obj._exists:
+                        del self._deleted[ident]
+
+    def clear(self):
+        """
+        Forgets every object without writing anything.
+        """
+        with self._lock:
+            self._objects.clear()
+            self._displaced = []
+            self._deleted.clear()
@@ -0,0 +1,219 @@
+import threading, collections, logging, time, atexit
+
+__doc__ = """
+Write-behind buffering for :class:`pynamo.PersistentObject` subclasses that
+declare the `write_behind` :class:`pynamo.Meta`. Saves are queued and written
+by a background thread using :meth:`PersistentObject.save_many`.
+"""
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindBuffer(object):
+    """
+    Collects the objects saved on a single class and writes them in batches
+    once `batch_size` distinct keys are waiting or the oldest has waited
+    `interval` seconds.
+
+    Saving the same key again before it has been written coalesces into a
+    single write of the object saved last, which takes over the pending
+    updates of the others. An object changed while its write is in flight
+    stays dirty and is written again when it is saved again. :meth:`put`
+    blocks while `max_size` keys are waiting. Objects that fail to save are
+    kept with their exception, see :meth:`errors`, and passed to `on_error`
+    if given.
+
+    :type cls: class
+    :param cls: The :class:`PersistentObject` subclass being buffered
+
+    :type batch_size: int
+    :param batch_size: How many keys trigger a write
+
+    :type interval: float
+    :param interval: The most seconds a save waits before it is written
+
+    :type max_size: int
+    :param max_size: How many keys may wait before saves block
+
+    :type on_error: callable
+    :param on_error: Called from the writer thread with each object that
+        failed to save and the exception
+    """
+    def __init__(self, cls, batch_size=25, interval=0.1, max_size=10000,
+                 on_error=None):
+        self.cls = cls
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_size = max_size
+        self.on_error = on_error
+        self.closed = False
+        # key -> every object saved under it, the last one is written
+        self._pending = collections.OrderedDict()
+        self._oldest = None
+        self._writing = 0
+        self._force = False
+        self._errors = []
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run,
+                                        name='pynamo-write-behind-%s'
+                                             % cls.__name__)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def __len__(self):
+        with self._cond:
+            return len(self._pending)
+
+    def put(self, obj):
+        """
+        Queues `obj` to be written.
+        """
+        key = self.cls._key_from_attrs(obj._item)
+        with self._cond:
+            if self.closed:
+                raise RuntimeError('The write-behind buffer of %s is closed'
+                                   % self.cls.__name__)
+            while key not in self._pending and \
+                    len(self._pending) >= self.max_size:
+                self._cond.wait()
+            owners = self._pending.setdefault(key, [])
+            owners[:] = [o for o in owners if o is not obj] + [obj]
+            # wake the writer to start the interval, or to write a full batch
+            if self._oldest is None:
+                self._oldest = time.time()
+                self._cond.notify_all()
+            elif len(self._pending) >= self.batch_size:
+                self._cond.notify_all()
+
+    def flush(self):
+        """
+        Blocks until everything saved so far has been written.
+        """
+        with self._cond:
+            while self._pending or self._writing:
+                self._force = True
+                self._cond.notify_all()
+                self._cond.wait(self.interval)
+
+    def close(self):
+        """
+        Flushes the buffer and stops the writer thread. Further saves are
+        written immediately.
+        """
+        with self._cond:
+            if self.closed:
+                return
+        self.flush()
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+        self._thread.join()
+
+    def errors(self):
+        """
+        Returns and forgets the `(object, exception)` pairs of every failed
+        write so far.
+        """
+        with self._cond:
+            ret, self._errors = self._errors, []
+        return ret
+
+    def _due(self):
+        if not self._pending:
+            return False
+        return (self._force or len(self._pending) >= self.batch_size or
+                time.time() - self._oldest >= self.interval)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self.closed and not self._due():
+                    timeout = None
+                    if self._pending:
+                        timeout = max(0, self.interval -
+                                         (time.time() - self._oldest))
+                    self._cond.wait(timeout)
+                if not self._pending:
+                    return
+                batch, self._pending = self._pending, collections.OrderedDict()
+                self._oldest = None
+                self._force = False
+                self._writing += 1
+                self._cond.notify_all()
+            try:
+                self._write(batch)
+            finally:
+                with self._cond:
+                    self._writing -= 1
+                    self._cond.notify_all()
+
+    def _write(self, batch):
+        objs = []
+        for owners in batch.itervalues():
+            obj = owners[-1]
+            # the changes of the superseded objects are written with it
+            for other in owners[:-1]:
+                obj._absorb(other)
+            # set again by every write that is sent but doesn't complete
+            obj._in_flight = None
+            objs.append(obj)
+        try:
+            self.cls.save_many(objs)
+        except Exception, e:
+            logger.exception('Failed writing %d %s' % (len(objs),
+                                                       self.cls.__name__))
+            failed = [(obj, e) for obj in objs if obj._in_flight is not None]
+            with self._cond:
+                self._errors.extend(failed)
+            if self.on_error is not None:
+                for obj, exc in failed:
+                    self.on_error(obj, exc)
+        for owners in batch.itervalues():
+            if owners[-1]._in_flight is not None:
+                continue
+            for obj in owners[:-1]:
+                obj._written()
+
+
+_buffers = []
+_buffers_lock = threading.Lock()
+
+
+def get_buffer(cls):
+    """
+    Returns the buffer of a class that declares `write_behind`, creating it
+    on first use, or `None` for classes that don't.
+    """
+    options = cls.__write_behind__
+    if not options:
+        return None
+    buf = cls.__dict__.get('_write_buffer')
+    if buf is not None:
+        return buf
+    with _buffers_lock:
+        buf = cls.__dict__.get('_write_buffer')
+        if buf is None:
+            if not isinstance(options, dict):
+                options = {}
+            buf = WriteBehindBuffer(cls, **options)
+            cls._write_buffer = buf
+            _buffers.append(buf)
+    return buf
+
+
+def flush_all():
+    """
+    Flushes the buffer of every class.
+    """
+    for buf in list(_buffers):
+        buf.flush()
+
+
+@atexit.register
+def close_all():
+    """
+    Closes the buffer of every class. Registered to run at exit so that
+    pending writes are not lost.
+    """
+    for buf in list(_buffers):
+        buf.close()
@@ -20,4 +20,37 @@ class TestPersistentObjectPreparedKey(PersistentObject):
     key_number_set = NumberSetField()
     key_bool = BoolField()
     key_float = FloatField()
-    key_integer = IntegerField()
\ No newline at end of file
+    key_integer = IntegerField()
+
+class TestPersistentObjectRangeKey(PersistentObject):
+    table_name = Meta('test_table_3')
+
+    key = StringField(hash_key=True)
+    sort = IntegerField(range_key=True)
+    key_string = StringField()
+
+class TestPersistentObjectCached(PersistentObject):
+    table_name = Meta('test_table_2')
+    cache = Meta(max_items=100, ttl=60)
+    negative_cache = Meta(max_items=100, ttl=60)
+
+    key = StringField(hash_key=True)
+    key_string = StringField()
+
+class TestPersistentObjectCompact(PersistentObject):
+    table_name = Meta('test_table_2')
+    compact = Meta(True)
+
+    key = StringField(hash_key=True)
+    key_string = StringField()
+    key_list = ListField()
+    key_packed = DictField(serializer='marshal', compress_over=64)
+
+class TestPersistentObjectBuffered(PersistentObject):
+    table_name = Meta('test_table_2')
+    write_behind = Meta(interval=60)
+    negative_cache = Meta(True)
+
+    key = StringField(hash_key=True)
+    key_string = StringField()
+    key_string_set = StringSetField()
@@ -0,0 +1,36 @@
+import unittest, StringIO
+from pynamo import ValidationError
+from pynamo.bulk import coerce, read_csv, read_jsonl
+from . import common
+
+
+CSV = '''key_1,key_2,key_float,key_bool,key_list,key_string_set,key_string
+a,1,1.5,true,"[1, 2]","[""x""]",
+b,2,,0,,,hello
+'''
+
+
+class CoerceTests(unittest.TestCase):
+    model = common.TestPersistentObjectPreparedKey
+
+    def test_csv(self):
+        rows = [coerce(self.model, r) for r in read_csv(StringIO.StringIO(CSV))]
+        self.assertEquals(rows[0], {'key_1': 'a', 'key_2': 1,
+                                    'key_float': 1.5, 'key_bool': True,
+                                    'key_list': [1, 2],
+                                    'key_string_set': set(['x'])})
+        self.assertEquals(rows[1], {'key_1': 'b', 'key_2': 2,
+                                    'key_bool': False,
+                                    'key_string': 'hello'})
+
+    def test_jsonl(self):
+        f = StringIO.StringIO('{"key_1": "a", "key_2": 1, "key_dict": '
+                              '{"b": 1}}\n\n')
+        rows = list(read_jsonl(f))
+        self.assertEquals(coerce(self.model, rows[0]),
+                          {'key_1': 'a', 'key_2': 1, 'key_dict': {'b': 1}})
+
+    def test_invalid(self):
+        self.assertRaises(ValidationError, coerce, self.model, {'key_2': 'x'})
+        self.assertRaises(ValidationError, coerce, self.model,
+                          {'key_bool': 'maybe'})
@@ -0,0 +1,74 @@
+import unittest, time
+from pynamo.cache import LRUCache, NegativeCache
+
+
+class LRUCacheTests(unittest.TestCase):
+    def test_copies(self):
+        c = LRUCache()
+        attrs = {'key': 'a', 'tags': set(['x'])}
+        c.put('a', attrs)
+        attrs['tags'].add('y')
+        got = c.get('a')
+        self.assertEquals(got, {'key': 'a', 'tags': set(['x'])})
+        got['tags'].add('z')
+        self.assertEquals(c.get('a')['tags'], set(['x']))
+        self.assertEquals((c.hits, c.misses), (2, 0))
+        self.assertEquals(c.get('b'), None)
+        self.assertEquals(c.misses, 1)
+
+    def test_lru(self):
+        c = LRUCache(max_items=2)
+        c.put('a', {'n': 1})
+        c.put('b', {'n': 2})
+        c.get('a')
+        c.put('c', {'n': 3})
+        self.assertEquals(c.get('b'), None)
+        self.assertEquals(c.get('a'), {'n': 1})
+        self.assertEquals(c.evictions, 1)
+
+    def test_max_bytes(self):
+        c = LRUCache(max_bytes=20)
+        c.put('a', {'s': 'x' * 10})
+        c.put('b', {'s': 'x' * 10})
+        self.assertEquals(len(c), 1)
+        c.put('c', {'s': 'x' * 100})
+        self.assertEquals(c.get('c'), None)
+        self.assertEquals(c.size, 11)
+
+    def test_ttl(self):
+        c = LRUCache(ttl=0.01)
+        c.put('a', {'n': 1})
+        time.sleep(0.02)
+        self.assertEquals(c.get('a'), None)
+        self.assertEquals(c.expirations, 1)
+        self.assertEquals(c.size, 0)
+
+    def test_invalidate(self):
+        c = LRUCache()
+        c.put('a', {'n': 1})
+        c.invalidate('a')
+        c.invalidate('b')
+        self.assertEquals(c.get('a'), None)
+        self.assertEquals(c.stats()['bytes'], 0)
+
+
+class NegativeCacheTests(unittest.TestCase):
+    def test_add_discard(self):
+        c = NegativeCache()
+        self.assertFalse('a' in c)
+        c.add('a')
+        self.assertTrue('a' in c)
+        c.discard('a')
+        self.assertFalse('a' in c)
+        self.assertEquals((c.hits, c.misses), (1, 2))
+
+    def test_bounds(self):
+        c = NegativeCache(max_items=2, ttl=0.01)
+        for k in 'abc':
+            c.add(k)
+        self.assertFalse('a' in c)
+        self.assertTrue('c' in c)
+        self.assertEquals(c.evictions, 1)
+        time.sleep(0.02)
+        self.assertFalse('c' in c)
+        self.assertEquals(len(c), 1)
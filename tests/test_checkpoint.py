@@ -0,0 +1,37 @@
+import unittest, os, tempfile, shutil
+from pynamo.checkpoint import Checkpoint, FileCheckpoint
+
+
+class CheckpointTests(unittest.TestCase):
+    def test_update(self):
+        c = Checkpoint()
+        c.start(2)
+        c.update(0, ('a', 1))
+        c.update(1, None)
+        self.assertEquals(c.positions, {0: ('a', 1)})
+        self.assertEquals(c.done, set([1]))
+        self.assertFalse(c.finished)
+        c.update(0, None)
+        self.assertTrue(c.finished)
+        self.assertRaises(ValueError, c.start, 3)
+
+
+class FileCheckpointTests(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'scan.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_roundtrip(self):
+        c = FileCheckpoint(self.path)
+        c.start(3)
+        c.update(0, (u'a', 1))
+        c.update(1, u'b')
+        c.update(2, None)
+        c = FileCheckpoint(self.path)
+        self.assertEquals(c.segments, 3)
+        self.assertEquals(c.positions, {0: (u'a', 1), 1: u'b'})
+        self.assertEquals(c.done, set([2]))
+        self.assertFalse(os.path.exists(self.path + '.tmp'))
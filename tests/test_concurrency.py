@@ -0,0 +1,164 @@
+import unittest, threading, time
+from pynamo.concurrency import (WorkerPool, dispatch, dispatch_async, gather,
+                                poll, SingleFlight)
+
+
+class WorkerPoolTests(unittest.TestCase):
+    def test_submit(self):
+        pool = WorkerPool(2)
+        f = pool.submit(lambda a, b: a + b, 1, b=2)
+        self.assertEquals(f.result(), 3)
+        pool.shutdown()
+
+    def test_exception(self):
+        pool = WorkerPool(1)
+        def fail():
+            raise KeyError('lol')
+        f = pool.submit(fail)
+        with self.assertRaises(KeyError):
+            f.result()
+        pool.shutdown()
+
+    def test_callback_after_done(self):
+        pool = WorkerPool(1)
+        f = pool.submit(lambda: 1)
+        f.result()
+        seen = []
+        f.add_done_callback(seen.append)
+        self.assertEquals(seen, [f])
+        pool.shutdown()
+
+
+class DispatchTests(unittest.TestCase):
+    def test_serial_followups(self):
+        def func(n):
+            return n, ([n - 1] if n > 0 else [])
+        self.assertEquals(list(dispatch(func, [3])), [3, 2, 1, 0])
+
+    def test_concurrent(self):
+        lock = threading.Lock()
+        state = {'running': 0, 'peak': 0}
+        def func(n):
+            with lock:
+                state['running'] += 1
+                state['peak'] = max(state['peak'], state['running'])
+            time.sleep(0.02)
+            with lock:
+                state['running'] -= 1
+            return n, ([n + 100] if n < 100 else [])
+        ret = sorted(dispatch(func, range(8), concurrency=4))
+        self.assertEquals(ret, range(8) + range(100, 108))
+        self.assertEquals(state['peak'], 4)
+
+    def test_concurrent_exception(self):
+        def func(n):
+            if n == 3:
+                raise ValueError(n)
+            return n, []
+        with self.assertRaises(ValueError):
+            list(dispatch(func, range(6), concurrency=3))
+
+    def test_lazy_tasks(self):
+        pulled = []
+        def tasks():
+            for i in xrange(1000000):
+                pulled.append(i)
+                yield i
+        g = dispatch(lambda n: (n, []), tasks(), concurrency=2)
+        next(g)
+        self.assertTrue(len(pulled) <= 3)
+
+    def test_ready(self):
+        state = {'pulled': 0, 'consumed': 0}
+        def tasks():
+            for i in xrange(50):
+                state['pulled'] += 1
+                yield i
+        def func(n):
+            time.sleep(0.001)
+            return n, []
+        ready = lambda: state['pulled'] - state['consumed'] < 3
+        for n in dispatch(func, tasks(), concurrency=8, ready=ready):
+            self.assertTrue(state['pulled'] - state['consumed'] <= 3)
+            state['consumed'] += 1
+        self.assertEquals(state['consumed'], 50)
+
+
+class FutureTests(unittest.TestCase):
+    def test_then(self):
+        pool = WorkerPool(2)
+        f = pool.submit(lambda: 2).then(lambda n: n * 3)
+        self.assertEquals(f.result(1), 6)
+        f = pool.submit(lambda: 2).then(lambda n: pool.submit(lambda: n + 1))
+        self.assertEquals(f.result(1), 3)
+        f = pool.submit(lambda: {}['a']).then(lambda n: n)
+        self.assertRaises(KeyError, f.result, 1)
+        pool.shutdown()
+
+    def test_gather(self):
+        pool = WorkerPool(3)
+        def slow(n):
+            time.sleep(0.01 * (3 - n))
+            return n
+        f = gather([pool.submit(slow, n) for n in xrange(3)])
+        self.assertEquals(f.result(1), [0, 1, 2])
+        self.assertEquals(gather([]).result(1), [])
+        pool.shutdown()
+
+    def test_dispatch_async(self):
+        pool = WorkerPool(4)
+        def func(n):
+            return n, ([n + 100] if n < 100 else [])
+        f = dispatch_async(func, range(8), pool)
+        self.assertEquals(sorted(f.result(1)), range(8) + range(100, 108))
+        self.assertEquals(dispatch_async(func, [], pool).result(1), [])
+        def fail(n):
+            raise ValueError(n)
+        f = dispatch_async(fail, range(3), pool)
+        self.assertRaises(ValueError, f.result, 1)
+        pool.shutdown()
+
+    def test_poll(self):
+        pool = WorkerPool(1)
+        calls = []
+        def check():
+            calls.append(1)
+            return len(calls) if len(calls) == 3 else None
+        self.assertEquals(poll(pool, check, interval=0.01).result(1), 3)
+        pool.shutdown()
+
+
+class SingleFlightTests(unittest.TestCase):
+    def test_join(self):
+        flights = SingleFlight()
+        led, joined = flights.begin(['a', 'b'])
+        self.assertEquals(led, ['a', 'b'])
+        led2, joined2 = flights.begin(['b', 'c'])
+        self.assertEquals(led2, ['c'])
+        self.assertEquals(joined2.keys(), ['b'])
+        flights.finish('b', 2)
+        self.assertEquals(joined2['b'].result(1), 2)
+        # finished keys are led again
+        self.assertEquals(flights.begin(['b'])[0], ['b'])
+        self.assertEquals((flights.calls, flights.deduplicated), (4, 1))
+
+    def test_threads(self):
+        flights = SingleFlight()
+        calls = []
+        results = []
+        def read():
+            led, joined = flights.begin(['k'])
+            if led:
+                calls.append(1)
+                time.sleep(0.05)
+                flights.finish('k', 'v')
+                results.append('v')
+            else:
+                results.append(joined['k'].result(1))
+        threads = [threading.Thread(target=read) for i in xrange(10)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEquals(results, ['v'] * 10)
+        self.assertEquals(len(calls), 1)
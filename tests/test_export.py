@@ -0,0 +1,44 @@
+import unittest, tempfile, shutil, gzip, json, os
+from pynamo.export import Manifest, _encode_page
+
+
+class FakeObject(object):
+    def __init__(self, d):
+        self.d = d
+
+    def to_dict(self):
+        return self.d
+
+
+class ManifestTests(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_roundtrip(self):
+        m = Manifest(self.dir)
+        m.table = 'users'
+        m.compress = True
+        m.start(2)
+        m.sizes[1] = 100
+        m.counts[1] = 7
+        m.update(1, u'k')
+        m = Manifest(self.dir)
+        self.assertEquals((m.table, m.compress, m.segments),
+                          ('users', True, 2))
+        self.assertEquals((m.sizes, m.counts, m.positions),
+                          ({1: 100}, {1: 7}, {1: u'k'}))
+        self.assertEquals(m.shard_path(1),
+                          os.path.join(self.dir, 'users-00001.jsonl.gz'))
+
+    def test_pages(self):
+        # each page is a gzip member, read back as one stream
+        path = os.path.join(self.dir, 'shard.jsonl.gz')
+        with open(path, 'wb') as f:
+            f.write(_encode_page([FakeObject({'a': 1})], True))
+            f.write(_encode_page([FakeObject({'b': set(['y', 'x'])})], True))
+        with gzip.open(path) as f:
+            self.assertEquals([json.loads(l) for l in f],
+                              [{'a': 1}, {'b': ['x', 'y']}])
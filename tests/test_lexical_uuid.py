@@ -0,0 +1,35 @@
+import unittest, pickle, datetime
+from pynamo.lexical_uuid import LexicalUUID
+
+
+class LexicalUUIDTests(unittest.TestCase):
+    def test_forms(self):
+        u = LexicalUUID(worker_id=7)
+        self.assertEquals(u.worker_id, 7)
+        self.assertEquals(u.int, (u.timestamp << 64) | 7)
+        for form in (u, u.int, u.bytes, u.guid):
+            self.assertEquals(LexicalUUID(form), u)
+        self.assertEquals(LexicalUUID.decode(u.encode()), u)
+        self.assertEquals(pickle.loads(pickle.dumps(u)), u)
+        self.assertEquals(LexicalUUID(0).encode(), 'A')
+        self.assertEquals(LexicalUUID(64).encode(), 'BA')
+        self.assertEquals(LexicalUUID.decode('BA').int, 64)
+        d = datetime.datetime(2012, 1, 1)
+        self.assertTrue(LexicalUUID(d) < u)
+        self.assertRaises(ValueError, LexicalUUID, 'short')
+        self.assertRaises(ValueError, LexicalUUID.decode, 'a$')
+        # the standard base64 characters aren't URL safe ones
+        self.assertRaises(ValueError, LexicalUUID.decode, 'B+')
+        self.assertRaises(ValueError, LexicalUUID.decode, u'B/')
+
+    def test_batch(self):
+        before = LexicalUUID()
+        ids = LexicalUUID.batch(100)
+        after = LexicalUUID()
+        self.assertEquals([u.timestamp - ids[0].timestamp for u in ids],
+                          range(100))
+        self.assertTrue(before < ids[0] and ids[-1] < after)
+        self.assertEquals(sorted(reversed(ids)), ids)
+        strings = LexicalUUID.encode_many(ids)
+        self.assertEquals(strings, [u.encode() for u in ids])
+        self.assertEquals(LexicalUUID.decode_many(strings), ids)
@@ -0,0 +1,118 @@
+import unittest, threading
+from pynamo.concurrency import gather
+from pynamo.loader import BatchLoader, auto_batch, get_loader, active
+
+
+class FakeModel(object):
+    fail = False
+
+    def __init__(self):
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def get_many(self, keys, attributes_to_get=None):
+        with self.lock:
+            self.calls.append((list(keys), attributes_to_get))
+        if self.fail:
+            raise IOError('down')
+        return [None if k == 'missing' else {'key': k} for k in keys]
+
+
+class BatchLoaderTests(unittest.TestCase):
+    def test_window(self):
+        model = FakeModel()
+        loader = BatchLoader(model, window=0.05)
+        futures = [loader.load(k) for k in ('a', 'b', 'missing')]
+        ret = gather(futures).result(1)
+        self.assertEquals(ret, [{'key': 'a'}, {'key': 'b'}, None])
+        self.assertEquals(model.calls, [(['a', 'b', 'missing'], None)])
+        self.assertEquals((loader.batches, loader.loads), (1, 3))
+
+    def test_threads(self):
+        model = FakeModel()
+        loader = BatchLoader(model, window=0.1)
+        results = {}
+        def load(k):
+            results[k] = loader.load(k).result(1)
+        threads = [threading.Thread(target=load, args=(i,))
+                   for i in xrange(10)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEquals(results, dict((i, {'key': i}) for i in xrange(10)))
+        self.assertEquals(len(model.calls), 1)
+
+    def test_max_batch(self):
+        model = FakeModel()
+        loader = BatchLoader(model, window=60, max_batch=2)
+        futures = [loader.load(k) for k in ('a', 'b')]
+        self.assertEquals(gather(futures).result(1),
+                          [{'key': 'a'}, {'key': 'b'}])
+        loader.load('c')
+        loader.flush()
+        self.assertEquals([keys for keys, p in model.calls],
+                          [['a', 'b'], ['c']])
+
+    def test_projections(self):
+        model = FakeModel()
+        loader = BatchLoader(model, window=60)
+        loader.load('a')
+        loader.load('b', frozenset(['key']))
+        loader.flush()
+        self.assertEquals(sorted(model.calls),
+                          [(['a'], None), (['b'], ['key'])])
+
+    def test_errors(self):
+        model = FakeModel()
+        model.fail = True
+        loader = BatchLoader(model, window=60)
+        futures = [loader.load(k) for k in ('a', 'b')]
+        loader.flush()
+        for f in futures:
+            self.assertRaises(IOError, f.result, 1)
+
+
+class AutoBatchTests(unittest.TestCase):
+    def test_context(self):
+        model = FakeModel()
+        self.assertEquals(get_loader(model), None)
+        with auto_batch(window=60) as outer:
+            with auto_batch() as inner:
+                self.assertTrue(inner is outer)
+                loader = get_loader(model)
+                future = loader.load('a')
+            self.assertTrue(active())
+            self.assertTrue(get_loader(model) is loader)
+        self.assertFalse(active())
+        # waiting reads are fetched on the way out
+        self.assertEquals(future.result(0), {'key': 'a'})
+        self.assertEquals(get_loader(model), None)
+
+    def test_threads(self):
+        model = FakeModel()
+        seen = {}
+        entered = threading.Event()
+        leave = threading.Event()
+        def other(batch):
+            seen['outside'] = get_loader(model)
+            with batch:
+                seen['inside'] = get_loader(model)
+                entered.set()
+                leave.wait(1)
+        with auto_batch(window=60) as batch:
+            # a blocking read alone in the block is not delayed
+            self.assertEquals(get_loader(model, blocking=True), None)
+            t = threading.Thread(target=other, args=(batch,))
+            t.start()
+            entered.wait(1)
+            loader = get_loader(model)
+            self.assertTrue(get_loader(model, blocking=True) is loader)
+            leave.set()
+            t.join()
+            self.assertEquals(get_loader(model, blocking=True), None)
+            loader.load('a')
+            # but joins reads that are waiting anyway
+            self.assertTrue(get_loader(model, blocking=True) is loader)
+        self.assertEquals(seen['outside'], None)
+        self.assertTrue(seen['inside'] is loader)
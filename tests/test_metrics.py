@@ -0,0 +1,98 @@
+import unittest, logging
+from pynamo import metrics
+from pynamo.metrics import (Observer, Collector, Histogram, LogObserver,
+                            register, unregister, enabled, record, traced)
+
+
+class FakeModel(object):
+    @classmethod
+    @traced('fetch')
+    def fetch(cls, fail=False):
+        if fail:
+            raise IOError('down')
+        return 'ok'
+
+    @traced('store')
+    def store(self):
+        return self
+
+
+class Tracer(Observer):
+    def __init__(self):
+        self.events = []
+
+    def start_span(self, operation, cls):
+        self.events.append(('start', operation, cls))
+        return len(self.events)
+
+    def end_span(self, span, error=None):
+        self.events.append(('end', span, error))
+
+
+class HistogramTests(unittest.TestCase):
+    def test_percentile(self):
+        h = Histogram()
+        self.assertEquals(h.percentile(0.5), None)
+        for latency in [0.0005] * 90 + [0.03] * 9 + [20.0]:
+            h.add(1, latency, 0.5, 0, 10)
+        self.assertEquals(h.percentile(0.5), 0.001)
+        self.assertEquals(h.percentile(0.95), 0.05)
+        self.assertEquals(h.percentile(1.0), 20.0)
+        d = h.to_dict()
+        self.assertEquals((d['calls'], d['items'], d['consumed'], d['bytes']),
+                          (100, 100, 50.0, 1000))
+
+
+class ObserverTests(unittest.TestCase):
+    def tearDown(self):
+        metrics._observers = ()
+
+    def test_register(self):
+        self.assertFalse(enabled())
+        collector = register(Collector())
+        self.assertTrue(enabled())
+        record('get', FakeModel, 1, 0.003, 1.0, 0, 100)
+        record('get', FakeModel, 0, 0.5, 0.5, 1, 0)
+        h = collector.histogram('get', 'FakeModel')
+        self.assertEquals((h.calls, h.items, h.retries), (2, 1, 1))
+        self.assertEquals(collector.percentile('get', 'FakeModel', 0.5),
+                          0.005)
+        self.assertEquals(collector.snapshot()[('get', 'FakeModel')]['bytes'],
+                          100)
+        unregister(collector)
+        self.assertFalse(enabled())
+        record('get', FakeModel, 1, 0.003)
+        self.assertEquals(collector.histogram('get', 'FakeModel').calls, 2)
+        collector.reset()
+        self.assertEquals(collector.snapshot(), {})
+
+    def test_spans(self):
+        self.assertEquals(FakeModel.fetch(), 'ok')
+        tracer = register(Tracer())
+        self.assertEquals(FakeModel.fetch(), 'ok')
+        obj = FakeModel()
+        self.assertTrue(obj.store() is obj)
+        self.assertRaises(IOError, FakeModel.fetch, fail=True)
+        events = tracer.events
+        self.assertEquals(events[:4], [('start', 'fetch', FakeModel),
+                                       ('end', 1, None),
+                                       ('start', 'store', FakeModel),
+                                       ('end', 3, None)])
+        self.assertTrue(isinstance(events[5][2], IOError))
+
+    def test_log(self):
+        logged = []
+        class Handler(logging.Handler):
+            def emit(self, record):
+                logged.append(record.getMessage())
+        handler = Handler()
+        metrics.logger.addHandler(handler)
+        metrics.logger.setLevel(logging.INFO)
+        try:
+            register(LogObserver())
+            record('save', FakeModel, 1, 0.25, 1.0)
+        finally:
+            metrics.logger.removeHandler(handler)
+        self.assertEquals(logged, ['save 1 of FakeModel in 0.250000 '
+                                   'ConsumedCapacityUnits=1.000000 '
+                                   'Retries=0 Bytes=0'])
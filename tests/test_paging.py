@@ -0,0 +1,48 @@
+import unittest, threading
+from pynamo.concurrency import WorkerPool
+from pynamo.paging import PageIterator
+
+
+class PageIteratorTests(unittest.TestCase):
+    def setUp(self):
+        self.requests = []
+        self.lock = threading.Lock()
+
+    def fetch(self, start_key, limit, page_size=3, total=10):
+        with self.lock:
+            self.requests.append((start_key, limit))
+        first = 0 if start_key is None else start_key + 1
+        size = page_size if limit is None else min(page_size, limit)
+        page = range(first, min(first + size, total))
+        last = page[-1] if page and page[-1] < total - 1 else None
+        return page, last
+
+    def test_pages(self):
+        it = PageIterator(self.fetch, lambda n: n)
+        self.assertEquals(list(it), range(10))
+        self.assertEquals(it.pages, 4)
+        self.assertEquals(it.resume_key, None)
+
+    def test_resume(self):
+        it = PageIterator(self.fetch, lambda n: n)
+        self.assertEquals([next(it) for i in xrange(4)], range(4))
+        self.assertEquals(it.resume_key, 3)
+        self.assertEquals(len(self.requests), 2)
+        it = PageIterator(self.fetch, lambda n: n, start_key=it.resume_key)
+        self.assertEquals(list(it), range(4, 10))
+
+    def test_limit(self):
+        it = PageIterator(self.fetch, lambda n: n, limit=5)
+        self.assertEquals(list(it), range(5))
+        self.assertEquals(it.resume_key, 4)
+        self.assertEquals([limit for key, limit in self.requests], [5, 2])
+
+    def test_prefetch(self):
+        pool = WorkerPool(1)
+        it = PageIterator(self.fetch, lambda n: n, limit=7, pool=pool)
+        next(it)
+        it._pending.result()
+        # the second page was requested while the first is consumed
+        self.assertEquals(self.requests, [(None, 7), (2, 4)])
+        self.assertEquals(list(it), range(1, 7))
+        pool.shutdown()
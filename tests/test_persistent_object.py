@@ -1,8 +1,16 @@
-import unittest, random, uuid
+import unittest, random, uuid, threading, tempfile, shutil, time
 from boto.exception import DynamoDBResponseError
 from boto.dynamodb.table import Table
+from boto.dynamodb.condition import BETWEEN, EQ, GE
+from pynamo.checkpoint import Checkpoint
+from pynamo.concurrency import gather
+from pynamo.loader import auto_batch, get_loader
+from pynamo import metrics, bulk, export
 from pynamo import *
-from .common import TestPersistentObject, TestPersistentObjectPreparedKey
+from .common import (TestPersistentObject, TestPersistentObjectPreparedKey,
+                     TestPersistentObjectRangeKey, TestPersistentObjectCached,
+                     TestPersistentObjectCompact, 
+                     TestPersistentObjectBuffered)
 
 
 class PersistentObjectClassTests(unittest.TestCase):
@@ -123,12 +131,14 @@ class PersistentObjectTests(unittest.TestCase):
         return
         TestPersistentObject.create_table(wait=True)
         TestPersistentObjectPreparedKey.create_table(wait=True)
+        TestPersistentObjectRangeKey.create_table(wait=True)
     
     @staticmethod
     def tearDownClass():
         return
         TestPersistentObject.drop_table(wait=True)
         TestPersistentObjectPreparedKey.drop_table(wait=True)
+        TestPersistentObjectRangeKey.drop_table(wait=True)
     
     def test_prepare_key(self):
         # first test that prepare_key does not do anything if it's not set up
@@ -146,6 +156,9 @@ class PersistentObjectTests(unittest.TestCase):
         # test that it throws a ValidationError if it's the wrong key type
         with self.assertRaises(ValidationError):
             TestPersistentObject.prepare_key({'key': 1})
+        with self.assertRaises(ValidationError):
+            TestPersistentObjectPreparedKey.prepare_key(
+                {'key_1': 'hello', 'key_2': 1, 3: 'wut'})
     
     def test_creation(self):
         le_id1 = uuid.uuid1().hex
@@ -204,6 +217,517 @@ class PersistentObjectTests(unittest.TestCase):
         r3 = TestPersistentObjectPreparedKey.get_or_create(**d2).save()
         self.assertEquals(c3.key_list, [1,2,3])
 
+    def test_get_many_concurrent(self):
+        keys = [uuid.uuid1().hex for i in xrange(250)]
+        for k in keys:
+            TestPersistentObject.create(key=k).save()
+        missing = uuid.uuid1().hex
+        ret = TestPersistentObject.get_many(keys + [missing], concurrency=4)
+        self.assertEquals([r.key for r in ret[:-1]], keys)
+        self.assertEquals(ret[-1], None)
+
+    def test_iter_many(self):
+        keys = [uuid.uuid1().hex for i in xrange(150)]
+        for k in keys:
+            TestPersistentObject.create(key=k).save()
+        missing = uuid.uuid1().hex
+        query = [missing] + keys + [keys[0]]
+        # unordered yields only what was found, duplicates included
+        ret = list(TestPersistentObject.iter_many(iter(query), 
+                                                  max_in_flight=3))
+        self.assertEquals(sorted(r.key for r in ret), sorted(keys + keys[:1]))
+        # ordered keeps the slots
+        ret = list(TestPersistentObject.iter_many(iter(query), ordered=True,
+                                                  max_in_flight=3,
+                                                  buffer_size=100))
+        self.assertEquals(ret[0], None)
+        self.assertEquals([r.key for r in ret[1:]], keys + keys[:1])
+
+    def test_projection(self):
+        TestPO = TestPersistentObjectPreparedKey
+        d = dict(key_1=uuid.uuid1().hex, key_2=random.randint(500000, 5000000),
+                 key_string='hi', key_dict={'a': 1}, key_integer=5)
+        TestPO.create(d).save()
+        # only the projected fields and the key are loaded
+        r = TestPO.get(d, attributes_to_get=['key_string'])
+        self.assertEquals(r.to_dict(), {'key': TestPO.prepare_key(d), 
+                                        'key_string': 'hi'})
+        with self.assertRaises(ValueError):
+            r.save(force_put=True)
+        # saving a partial object leaves the rest alone
+        r.key_string = 'bye'
+        del r.key_integer
+        r.save()
+        r = TestPO.get_many([d], attributes_to_get=['key_string'])[0]
+        self.assertEquals(r.key_string, 'bye')
+        # touching an unloaded field fetches it
+        self.assertEquals(r.key_dict, {'a': 1})
+        self.assertEquals(r.key_integer, None)
+        # unless strict
+        TestPO.__strict_projection__ = True
+        try:
+            r = TestPO.get(d, attributes_to_get=['key_string'])
+            with self.assertRaises(UnloadedFieldError):
+                r.key_dict
+        finally:
+            TestPO.__strict_projection__ = False
+
+    def test_save_many_delete_many(self):
+        TestPO = TestPersistentObjectPreparedKey
+        objs = [TestPO.create(key_1=uuid.uuid1().hex, key_2=i, key_string='a',
+                              key_number_set=set([1]))
+                for i in xrange(60)]
+        TestPO.save_many(objs, concurrency=3)
+        self.assertTrue(all(o._exists and not o._dirty for o in objs))
+        keys = [{'key': o.key} for o in objs]
+        self.assertEquals([r.key_string for r in TestPO.get_many(keys)], 
+                          ['a'] * 60)
+        # set additions go through UpdateItem alongside the batch
+        r = TestPO.get(keys[0])
+        r.add_to_key_number_set_set([2])
+        objs[1].key_string = 'b'
+        TestPO.save_many([r, objs[1]])
+        self.assertEquals(TestPO.get(keys[0]).key_number_set, set([1, 2]))
+        self.assertEquals(TestPO.get(keys[1]).key_string, 'b')
+        # delete by object and by key
+        TestPO.delete_many(objs[:30] + keys[30:50])
+        self.assertFalse(objs[0]._exists)
+        ret = TestPO.get_many(keys)
+        self.assertEquals(ret[:50], [None] * 50)
+        self.assertEquals(len(filter(None, ret)), 10)
+        objs[55].delete()
+        with self.assertRaises(NotFoundError):
+            TestPO.get(keys[55])
+
+    def test_futures(self):
+        TestPO = TestPersistentObjectPreparedKey
+        objs = [TestPO.create(key_1=uuid.uuid1().hex, key_2=i, key_string='a')
+                for i in xrange(30)]
+        self.assertEquals(TestPO.asave_many(objs).result(), objs)
+        self.assertFalse(any(o._dirty for o in objs))
+        keys = [{'key': o.key} for o in objs] + [{'key': 'nope_1'}]
+        ret = TestPO.aget_many(keys).result()
+        self.assertEquals([r.key for r in ret[:-1]], [o.key for o in objs])
+        self.assertEquals(ret[-1], None)
+        r = TestPO.aget(keys[0]).result()
+        r.key_string = 'b'
+        r.asave().result()
+        self.assertEquals(TestPO.get(keys[0]).key_string, 'b')
+        with self.assertRaises(NotFoundError):
+            TestPO.aget({'key': 'nope_1'}).result()
+        # futures run within the caller's session
+        with Session() as s:
+            r = TestPO.aget(keys[0]).result()
+            self.assertTrue(TestPO.get(keys[0]) is r)
+            r.key_string = 'c'
+            r.asave().result()
+            self.assertEquals(s.dirty(), [r])
+        self.assertEquals(TestPO.get(keys[0]).key_string, 'c')
+
+    def test_get_many_range_key(self):
+        h = uuid.uuid1().hex
+        for i in xrange(120):
+            TestPersistentObjectRangeKey.create(key=h, sort=i, 
+                                                key_string=str(i)).save()
+        keys = [(h, i) for i in xrange(120)]
+        keys.append({'key': h, 'sort': 5})
+        keys.append((h, 1000))
+        ret = TestPersistentObjectRangeKey.get_many(keys)
+        self.assertEquals([r.key_string for r in ret[:120]], 
+                          map(str, xrange(120)))
+        self.assertEquals(ret[120].sort, 5)
+        self.assertEquals(ret[121], None)
+        with self.assertRaises(ValueError):
+            TestPersistentObjectRangeKey.get_many([h])
+
+    def test_query(self):
+        R = TestPersistentObjectRangeKey
+        h = uuid.uuid1().hex
+        R.save_many([R.create(key=h, sort=i, key_string=str(i)) 
+                     for i in xrange(30)])
+        q = R.query(h, page_size=7)
+        self.assertEquals([r.sort for r in q], range(30))
+        self.assertEquals(q.resume_key, None)
+        q = R.query(h, range_condition=BETWEEN(5, 9), reverse=True)
+        self.assertEquals([r.sort for r in q], range(9, 4, -1))
+        q = R.query(h, limit=10, attributes_to_get=['sort'])
+        self.assertEquals([r.sort for r in q], range(10))
+        self.assertEquals(q.resume_key, (h, 9))
+        q = R.query(h, start_key=q.resume_key)
+        self.assertEquals([r.key_string for r in q], map(str, xrange(10, 30)))
+
+    def test_cache(self):
+        C = TestPersistentObjectCached
+        C.item_cache().clear()
+        keys = [uuid.uuid1().hex for i in xrange(5)]
+        C.save_many([C.create(key=k, key_string='a') for k in keys])
+        a = C.get(keys[0])
+        b = C.get(keys[0])
+        self.assertFalse(a is b)
+        a.key_string = 'b'
+        self.assertEquals(b.key_string, 'a')
+        hits = C.item_cache().hits
+        self.assertEquals([r.key for r in C.get_many(keys)], keys)
+        self.assertEquals(C.item_cache().hits, hits + 5)
+        # UpdateItem invalidates, the next read goes to DynamoDB
+        a.save()
+        self.assertEquals(C.get(keys[0]).key_string, 'b')
+        b.delete()
+        self.assertEquals(C.get_many(keys[:1]), [None])
+
+    def test_negative_cache(self):
+        C = TestPersistentObjectCached
+        missing = C.missing_key_cache()
+        keys = [uuid.uuid1().hex for i in xrange(3)]
+        for i in xrange(2):
+            with self.assertRaises(NotFoundError):
+                C.get(keys[0])
+        self.assertTrue(missing.hits >= 1)
+        self.assertEquals(C.get_many(keys), [None] * 3)
+        hits = missing.hits
+        self.assertEquals(C.get_many(keys), [None] * 3)
+        self.assertEquals(missing.hits, hits + 3)
+        # saving the key forgets it was missing
+        C.create(key=keys[0], key_string='a').save()
+        self.assertEquals(C.get(keys[0]).key_string, 'a')
+        C.save_many([C.create(key=keys[1])])
+        self.assertEquals(C.get_many(keys[1:2])[0].key, keys[1])
+
+    def test_single_flight(self):
+        TestPO = TestPersistentObjectPreparedKey
+        key = {'key_1': uuid.uuid1().hex, 'key_2': 1}
+        TestPO.create(key_string='a', **key).save()
+        flights = TestPO.read_flights()
+        deduplicated = flights.deduplicated
+        results = []
+        def read(k):
+            try:
+                results.append(TestPO.get(k))
+            except NotFoundError, e:
+                results.append(e)
+        # the reads of the two keys are held until every other reader has
+        # joined them
+        release = threading.Event()
+        get_item = TestPO._get_item
+        def _get_item(k, projection):
+            release.wait(5)
+            return get_item(k, projection)
+        TestPO._get_item = staticmethod(_get_item)
+        try:
+            threads = [threading.Thread(target=read, args=(k,)) 
+                       for k in [key] * 10 + [{'key': 'nope_1'}] * 10]
+            for t in threads:
+                t.start()
+            deadline = time.time() + 5
+            while (flights.deduplicated - deduplicated < 18 and 
+                   time.time() < deadline):
+                time.sleep(0.001)
+            release.set()
+            for t in threads:
+                t.join()
+        finally:
+            del TestPO._get_item
+        objs = [r for r in results if isinstance(r, TestPO)]
+        self.assertEquals(len(objs), 10)
+        self.assertEquals(len(set(map(id, objs))), 10)
+        self.assertEquals(len(results), 20)
+        self.assertEquals(flights.deduplicated, deduplicated + 18)
+
+    def test_session(self):
+        TestPO = TestPersistentObjectPreparedKey
+        keys = [{'key_1': uuid.uuid1().hex, 'key_2': i} for i in xrange(40)]
+        with Session() as session:
+            objs = [TestPO.create(key_string='a', **k) for k in keys]
+            for o in objs:
+                o.save()
+            self.assertEquals(len(session.dirty()), 40)
+            self.assertEquals(TestPO.get_many(keys[:2]), objs[:2])
+        self.assertFalse(any(o._dirty for o in objs))
+        with Session():
+            a = TestPO.get(keys[0])
+            self.assertTrue(TestPO.get(keys[0]) is a)
+            self.assertTrue(TestPO.get_many(keys[:1])[0] is a)
+            a.key_string = 'b'
+            a.save()
+            TestPO.get(keys[1]).delete()
+            self.assertEquals(TestPO.get(keys[0]).key_string, 'b')
+        self.assertEquals(TestPO.get(keys[0]).key_string, 'b')
+        with self.assertRaises(NotFoundError):
+            TestPO.get(keys[1])
+
+    def test_get_or_create_many_persist(self):
+        TestPO = TestPersistentObjectPreparedKey
+        h = uuid.uuid1().hex
+        keys = [{'key_1': h, 'key_2': i} for i in xrange(10)]
+        TestPO.create(key_string='old', **keys[0]).save()
+        # created by someone else between the read and the write
+        raced = TestPO.create(key_string='raced', **keys[1])
+        get_many = TestPO.get_many
+        calls = []
+        def racing_get_many(*a, **kw):
+            ret = get_many(*a, **kw)
+            if not calls:
+                raced.save()
+            calls.append(a)
+            return ret
+        TestPO.get_many = staticmethod(racing_get_many)
+        try:
+            dicts = [dict(k, key_string='new') for k in keys]
+            ret = TestPO.get_or_create_many(dicts + dicts[-1:], persist=True)
+        finally:
+            del TestPO.get_many
+        self.assertEquals([o.key_string for o in ret], 
+                          ['old', 'raced'] + ['new'] * 9)
+        self.assertTrue(ret[-1] is ret[-2])
+        self.assertFalse(any(o._dirty for o in ret))
+        self.assertEquals(len(calls), 2)
+        stored = TestPO.get_many(keys)
+        self.assertEquals([o.key_string for o in stored],
+                          ['old', 'raced'] + ['new'] * 8)
+
+    def test_codec(self):
+        TestPO = TestPersistentObjectPreparedKey
+        d = {'key_1': uuid.uuid1().hex, 'key_2': 1, 'key_list': [1, 'a'],
+             'key_dict': {'a': 1}, 'key_string_set': set(['x'])}
+        obj = TestPO.create(d)
+        # the python values, not their JSON
+        self.assertEquals(obj.key_list, [1, 'a'])
+        self.assertEquals(obj.to_dict()['key_dict'], {'a': 1})
+        self.assertEquals(obj.key_number_set, set())
+        obj.save()
+        fetched = TestPO.get(d)
+        self.assertEquals(fetched.to_dict(), obj.to_dict())
+        fetched.key_list = [1, 'a']
+        self.assertFalse(fetched._dirty)
+        # stored by another writer, its JSON is not what json.dumps returns
+        d = {'key_1': uuid.uuid1().hex, 'key_2': 1}
+        obj = TestPO.create(d)
+        obj._item['key_dict'] = '{"b":1,"a":{"d":2,"c":3}}'
+        obj.save()
+        fetched = TestPO.get(d)
+        self.assertEquals(fetched.key_dict, {'a': {'c': 3, 'd': 2}, 'b': 1})
+        self.assertFalse(fetched._changed())
+        fetched.key_dict = {'a': {'c': 3, 'd': 2}, 'b': 1}
+        self.assertFalse(fetched._dirty)
+        fetched.save()
+        self.assertEquals(fetched._item['key_dict'], 
+                          '{"b":1,"a":{"d":2,"c":3}}')
+        with self.assertRaises(ValueError):
+            TestPO.prepare_key({'key_1': 'a'})
+
+    def test_compact(self):
+        TestPO = TestPersistentObjectCompact
+        k = uuid.uuid1().hex
+        obj = TestPO.create(key=k, key_string='a', key_list=[1])
+        self.assertFalse(hasattr(obj, '__dict__'))
+        with self.assertRaises(AttributeError):
+            obj.other = 1
+        obj.save()
+        fetched = TestPO.get(k)
+        self.assertEquals(fetched.key_string, 'a')
+        self.assertEquals(fetched.key_list, [1])
+        # only the decoded values are kept beside the item
+        self.assertEquals(fetched._property_cache, {'key_list': [1]})
+
+    def test_serializer(self):
+        TestPO = TestPersistentObjectCompact
+        k = uuid.uuid1().hex
+        packed = {'rows': [{'a': i, 'b': 'same'} for i in xrange(100)]}
+        TestPO.create(key=k, key_packed=packed).save()
+        fetched = TestPO.get(k)
+        self.assertEquals(fetched.key_packed, packed)
+        self.assertTrue(len(fetched._item['key_packed'].value) < 500)
+
+    def test_mutation(self):
+        TestPO = TestPersistentObjectPreparedKey
+        k = {'key_1': uuid.uuid1().hex, 'key_2': 1}
+        obj = TestPO.create(key_list=[1], **k)
+        obj.key_list.append(2)
+        obj.key_dict['a'] = {'b': 1}
+        obj.save()
+        fetched = TestPO.get(k)
+        self.assertEquals(fetched.key_list, [1, 2])
+        self.assertEquals(fetched.key_dict, {'a': {'b': 1}})
+        # reading leaves nothing to save
+        fetched.key_string_set
+        self.assertFalse(fetched._changed())
+        fetched.key_dict['a']['b'] = 2
+        fetched.key_string_set.add('x')
+        self.assertTrue(fetched._changed())
+        self.assertEquals(sorted(fetched._item._updates), 
+                          ['key_dict', 'key_string_set'])
+        fetched.save()
+        self.assertFalse(fetched._dirty)
+        fetched = TestPO.get(k)
+        self.assertEquals(fetched.key_dict, {'a': {'b': 2}})
+        self.assertEquals(fetched.key_string_set, set(['x']))
+        fetched.key_string_set.clear()
+        fetched.save()
+        self.assertFalse('key_string_set' in TestPO.get(k)._item)
+
+    def test_save_during_flush(self):
+        TestPO = TestPersistentObjectBuffered
+        key = uuid.uuid1().hex
+        with self.assertRaises(NotFoundError):
+            TestPO.get(key)
+        obj = TestPO.create(key=key, key_string='a')
+        obj.save()
+        # queued, but no longer known to be missing
+        self.assertFalse(key in TestPO.missing_key_cache())
+        obj.key_string = 'b'
+        changed = []
+        def _mark_written(cls, ops):
+            # saved again after the write was sent, before it completed
+            if not changed:
+                changed.append(obj)
+                obj.key_string = 'c'
+                obj.save()
+            return PersistentObject._mark_written.im_func(cls, ops)
+        TestPO._mark_written = classmethod(_mark_written)
+        try:
+            TestPO.write_buffer().flush()
+        finally:
+            del TestPO._mark_written
+        self.assertFalse(obj._dirty)
+        self.assertEquals(TestPO.get(key).key_string, 'c')
+        # coalesced saves of separate instances keep each other's changes
+        first, second = TestPO.get(key), TestPO.get(key)
+        first.add_to_key_string_set_set(['x'])
+        first.save()
+        second.add_to_key_string_set_set(['y'])
+        second.key_string = 'd'
+        second.save()
+        TestPO.write_buffer().flush()
+        self.assertFalse(first._dirty)
+        fetched = TestPO.get(key)
+        self.assertEquals(fetched.key_string, 'd')
+        self.assertEquals(fetched.key_string_set, set(['x', 'y']))
+
+    def test_bulk_load(self):
+        TestPO = TestPersistentObjectPreparedKey
+        prefix = uuid.uuid1().hex
+        records = [{'key_1': prefix, 'key_2': str(i), 'key_bool': '1'}
+                   for i in xrange(60)]
+        records[5]['key_2'] = 'five'
+        invalid = []
+        checkpoint = Checkpoint()
+        def interrupt(progress):
+            if progress.offset >= 20:
+                raise KeyboardInterrupt
+        with self.assertRaises(KeyboardInterrupt):
+            bulk.load(TestPO, iter(records), chunk_size=10, 
+                      checkpoint=checkpoint, progress=interrupt,
+                      on_invalid=lambda *a: invalid.append(a[0]))
+        self.assertEquals(checkpoint.positions, {0: 20})
+        progress = bulk.load(TestPO, iter(records), chunk_size=25,
+                             checkpoint=checkpoint,
+                             on_invalid=lambda *a: invalid.append(a[0]))
+        self.assertEquals((progress.offset, progress.written), (60, 40))
+        self.assertTrue(checkpoint.finished)
+        self.assertEquals(invalid, [5])
+        keys = [{'key_1': prefix, 'key_2': i} for i in xrange(60)]
+        found = [o for o in TestPO.get_many(keys) if o is not None]
+        self.assertEquals(len(found), 59)
+        self.assertTrue(all(o.key_bool for o in found))
+
+    def test_export(self):
+        TestPO = TestPersistentObjectRangeKey
+        prefix = uuid.uuid1().hex
+        for i in xrange(30):
+            TestPO.create(key=prefix, sort=i, key_string='s%d' % i).save()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        def interrupt(manifest):
+            if manifest.items >= 10:
+                raise KeyboardInterrupt
+        with self.assertRaises(KeyboardInterrupt):
+            export.export(TestPO, directory, segments=2, workers=1,
+                          page_size=5, progress=interrupt)
+        # a page written after the manifest was, which is cut off again
+        written = export.Manifest(directory)
+        segment = sorted(written.sizes)[0]
+        with open(written.shard_path(segment), 'ab') as f:
+            f.write('partial')
+        manifest = export.export(TestPO, directory, segments=2, workers=1, 
+                                 page_size=5)
+        self.assertTrue(manifest.finished)
+        records = list(export.read(directory))
+        self.assertEquals(len(records), manifest.items)
+        mine = sorted((r['sort'], r['key_string']) for r in records 
+                      if r['key'] == prefix)
+        self.assertEquals(mine, [(i, 's%d' % i) for i in xrange(30)])
+        with self.assertRaises(ValueError):
+            export.export(TestPO, directory, segments=2, compress=False)
+
+    def test_metrics(self):
+        TestPO = TestPersistentObjectPreparedKey
+        collector = metrics.register(metrics.Collector())
+        try:
+            k = {'key_1': uuid.uuid1().hex, 'key_2': 1}
+            TestPO.create(key_string='a', **k).save()
+            TestPO.get(k)
+            TestPO.get_many([k, {'key_1': 'nope', 'key_2': 1}])
+        finally:
+            metrics.unregister(collector)
+        for op in ('save', 'get', 'get_many'):
+            h = collector.histogram(op, TestPO.__name__)
+            self.assertEquals((h.calls, h.items), (1, 1))
+            self.assertTrue(h.consumed > 0 and h.bytes > 0)
+
+    def test_auto_batch(self):
+        TestPO = TestPersistentObjectPreparedKey
+        keys = [{'key_1': uuid.uuid1().hex, 'key_2': i} for i in xrange(20)]
+        TestPO.save_many([TestPO.create(key_string=str(k['key_2']), **k)
+                          for k in keys])
+        with auto_batch(window=0.05):
+            futures = [TestPO.aget(k) for k in keys]
+            missing = TestPO.aget({'key_1': 'nope', 'key_2': 1})
+            objs = gather(futures).result()
+            self.assertEquals(get_loader(TestPO).batches, 1)
+            self.assertRaises(NotFoundError, missing.result)
+        self.assertEquals([o.key_string for o in objs], 
+                          map(str, xrange(20)))
+        # a blocking get alone in the block is not batched
+        with auto_batch(window=0.05):
+            self.assertEquals([TestPO.get(k).key_2 for k in keys[:3]],
+                              [0, 1, 2])
+            self.assertEquals(get_loader(TestPO).batches, 0)
+        results = []
+        def read(batch, k):
+            with batch:
+                results.append(TestPO.get(k).key_2)
+        with auto_batch(window=0.05) as batch:
+            threads = [threading.Thread(target=read, args=(batch, k)) 
+                       for k in keys]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            self.assertTrue(get_loader(TestPO).batches < 20)
+        self.assertEquals(sorted(results), range(20))
+
+    def test_scan(self):
+        R = TestPersistentObjectRangeKey
+        h = uuid.uuid1().hex
+        R.save_many([R.create(key=h, sort=i, key_string=str(i)) 
+                     for i in xrange(40)])
+        found = [r.sort for r in R.scan(segments=4, page_size=5) 
+                 if r.key == h]
+        self.assertEquals(sorted(found), range(40))
+        ret = R.scan(segments=2, filter={'key': EQ(h), 'sort': GE(35)},
+                     attributes_to_get=['sort'])
+        self.assertEquals(sorted(r.sort for r in ret), range(35, 40))
+        # stop part way and resume from the checkpoint
+        checkpoint = Checkpoint()
+        it = R.scan(segments=3, page_size=5, checkpoint=checkpoint)
+        seen = set(next(it).key_string for i in xrange(12))
+        it.close()
+        seen.update(r.key_string for r in R.scan(segments=3, page_size=5,
+                                                 checkpoint=checkpoint) 
+                    if r.key == h)
+        self.assertTrue(set(map(str, xrange(40))) <= seen)
+        self.assertTrue(checkpoint.finished)
+
 
         
 
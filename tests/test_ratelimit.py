@@ -0,0 +1,89 @@
+import unittest, threading, time
+from pynamo.ratelimit import (RateLimiter, BULK, INTERACTIVE, priority,
+                              current_priority, get_limiter)
+
+
+class RateLimiterTests(unittest.TestCase):
+    def test_burst(self):
+        limiter = RateLimiter(100)
+        self.assertEquals(limiter.acquire(), 0.0)
+        limiter.charge(50)
+        self.assertEquals(limiter.acquire(), 0.0)
+
+    def test_debt(self):
+        limiter = RateLimiter(100)
+        limiter.charge(110)
+        waited = limiter.acquire()
+        self.assertTrue(0.05 < waited < 0.5, waited)
+        self.assertEquals(limiter.waited, waited)
+
+    def test_reserve(self):
+        limiter = RateLimiter(100)
+        self.assertEquals(limiter.acquire(units=120), 0.0)
+        self.assertTrue(limiter.acquire() > 0.1)
+        # settling for less than was reserved gives the rest back
+        limiter.acquire(units=50)
+        limiter.charge(0, 50)
+        self.assertEquals(limiter.acquire(), 0.0)
+
+    def test_priority(self):
+        limiter = RateLimiter(20)
+        limiter.charge(22)
+        order = []
+        def run(p, name):
+            limiter.acquire(p)
+            order.append(name)
+            limiter.charge(2)
+        bulk = [threading.Thread(target=run, args=(BULK, 'bulk'))
+                for i in xrange(3)]
+        for t in bulk:
+            t.start()
+        time.sleep(0.02)
+        interactive = threading.Thread(target=run,
+                                       args=(INTERACTIVE, 'interactive'))
+        interactive.start()
+        for t in bulk + [interactive]:
+            t.join()
+        self.assertEquals(order[0], 'interactive')
+
+    def test_invalid(self):
+        self.assertRaises(ValueError, RateLimiter, 0)
+
+
+class PriorityTests(unittest.TestCase):
+    def test_context(self):
+        self.assertEquals(current_priority(BULK), BULK)
+        with priority(INTERACTIVE):
+            self.assertEquals(current_priority(BULK), INTERACTIVE)
+            with priority(BULK):
+                self.assertEquals(current_priority(INTERACTIVE), BULK)
+            self.assertEquals(current_priority(BULK), INTERACTIVE)
+        self.assertEquals(current_priority(INTERACTIVE), INTERACTIVE)
+
+
+class FakeTable(object):
+    read_units = 10
+
+
+class FakeModel(object):
+    __rate_limit__ = {'fraction': 0.5}
+    __read_units__ = 8
+    __write_units__ = 4
+    _full_table_name = 'test_ratelimit'
+    _table = FakeTable()
+
+
+class GetLimiterTests(unittest.TestCase):
+    def test_shared(self):
+        reads = get_limiter(FakeModel, 'read')
+        # described throughput first, then the Meta
+        self.assertEquals(reads.rate, 5.0)
+        self.assertEquals(get_limiter(FakeModel, 'write').rate, 2.0)
+        class Other(FakeModel):
+            pass
+        self.assertTrue(get_limiter(Other, 'read') is reads)
+
+    def test_disabled(self):
+        class Plain(FakeModel):
+            __rate_limit__ = None
+        self.assertEquals(get_limiter(Plain, 'read'), None)
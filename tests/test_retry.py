@@ -0,0 +1,71 @@
+import unittest, time
+from pynamo.retry import (RetryPolicy, AdaptiveChunker, BatchStats, Throttle,
+                          RESPONSE_SIZE_LIMIT)
+
+
+class RetryPolicyTests(unittest.TestCase):
+    def test_delay(self):
+        p = RetryPolicy(base=0.1, cap=0.3)
+        self.assertEquals(p.delay(0), 0.0)
+        for attempt in xrange(1, 10):
+            d = p.delay(attempt)
+            self.assertTrue(0 <= d <= min(0.3, 0.1 * 2 ** attempt))
+
+    def test_budget(self):
+        p = RetryPolicy(max_attempts=3)
+        self.assertTrue(p.allows(2, time.time()))
+        self.assertFalse(p.allows(3, time.time()))
+        p = RetryPolicy(max_attempts=None, deadline=1.0)
+        self.assertTrue(p.allows(100, time.time()))
+        self.assertFalse(p.allows(1, time.time() - 2))
+
+
+class AdaptiveChunkerTests(unittest.TestCase):
+    def test_shrink_and_grow(self):
+        c = AdaptiveChunker(max_size=100, step=10)
+        c.record(100, 70)
+        self.assertEquals(c.size, 50)
+        # a response to a chunk sent before the shrink is ignored
+        c.record(100, 80)
+        self.assertEquals(c.size, 50)
+        c.record(50, 10)
+        self.assertEquals(c.size, 50)
+        c.record(50, 0)
+        self.assertEquals(c.size, 60)
+        c.record(60, 0, RESPONSE_SIZE_LIMIT)
+        self.assertEquals(c.size, 30)
+
+    def test_bounds(self):
+        c = AdaptiveChunker(max_size=100, min_size=5)
+        for i in xrange(10):
+            c.record(c.size, c.size)
+        self.assertEquals(c.size, 5)
+        for i in xrange(20):
+            c.record(c.size, 0)
+        self.assertEquals(c.size, 100)
+
+    def test_split(self):
+        c = AdaptiveChunker(max_size=3)
+        self.assertEquals(c.split(range(5)), ([0, 1, 2], [3, 4]))
+
+
+class BatchStatsTests(unittest.TestCase):
+    def test_record(self):
+        s = BatchStats()
+        s.record(0, 0.0, 100, 50.0)
+        s.record(1, 0.25, 50, 10.0)
+        self.assertEquals((s.attempts, s.retries, s.sleep_time, s.chunk_size,
+                           s.consumed_capacity), (2, 1, 0.25, 50, 60.0))
+        self.assertTrue('ConsumedCapacityUnits=60.0' in str(s))
+
+
+class ThrottleTests(unittest.TestCase):
+    def test_burst_then_wait(self):
+        t = Throttle(100)
+        self.assertEquals(t.charge(50), 0.0)
+        self.assertEquals(t.charge(50), 0.0)
+        slept = t.charge(10)
+        self.assertTrue(0.05 < slept <= 0.1)
+
+    def test_rate(self):
+        self.assertRaises(ValueError, Throttle, 0)
@@ -0,0 +1,55 @@
+import unittest, json
+from boto.dynamodb.types import Binary
+from pynamo import DictField, ListField
+from pynamo.serializers import (Serializer, get_serializer, encode, decode,
+                                MAGIC)
+
+
+VALUE = {'name': u'caf\xe9', 'rows': [[i, 'same', 1.5] for i in xrange(50)]}
+
+
+class SerializerTests(unittest.TestCase):
+    def test_plain_json(self):
+        # uncompressed JSON is written the way it always was
+        raw = encode(VALUE, get_serializer('json'))
+        self.assertEquals(raw, json.dumps(VALUE))
+        self.assertEquals(decode(raw), VALUE)
+        self.assertEquals(decode(get_serializer('fastjson').dumps(VALUE)),
+                          VALUE)
+
+    def test_compressed(self):
+        for name in ('json', 'fastjson', 'marshal'):
+            raw = encode(VALUE, get_serializer(name), compress_over=100)
+            self.assertTrue(isinstance(raw, Binary))
+            self.assertEquals(raw.value[:1], MAGIC)
+            self.assertTrue(len(raw.value) < len(json.dumps(VALUE)) / 4)
+            self.assertEquals(decode(raw, get_serializer(name)), VALUE)
+        # small values are left alone
+        self.assertEquals(encode([1], get_serializer('json'), 100), '[1]')
+
+    def test_binary(self):
+        raw = encode(VALUE, get_serializer('marshal'))
+        self.assertEquals(raw.value[1:3], 'M-')
+        self.assertEquals(decode(raw, get_serializer('marshal')), VALUE)
+        # only the configured serializer reads values
+        self.assertRaises(ValueError, decode, raw)
+        self.assertRaises(ValueError, DictField().to_python, raw)
+        self.assertRaises(ValueError, decode, 
+                          encode(VALUE, get_serializer('json'), 100),
+                          get_serializer('marshal'))
+
+    def test_invalid(self):
+        self.assertRaises(ValueError, get_serializer, 'pickle')
+        self.assertRaises(ValueError, decode, Binary('\x00junk'))
+        self.assertRaises(ValueError, decode, Binary(MAGIC + 'j?{}'))
+
+    def test_field(self):
+        class Repr(Serializer):
+            name = 'repr'
+            tag = 'j'
+            text = True
+            dumps = staticmethod(json.dumps)
+        field = ListField(serializer=Repr(), compress_over=10)
+        raw = field.from_python(range(20))
+        self.assertEquals(DictField().to_python(raw), range(20))
+        self.assertEquals(field.to_python(None), None)
@@ -0,0 +1,79 @@
+import unittest
+from pynamo import session
+from pynamo.session import Session
+
+
+class FakeObject(object):
+    def __init__(self, key, dirty=False):
+        self._item = {'key': key}
+        self._dirty = dirty
+
+    def _changed(self):
+        return self._dirty
+
+    @classmethod
+    def _key_from_attrs(cls, attrs):
+        return attrs['key']
+
+
+class SessionTests(unittest.TestCase):
+    def test_current(self):
+        self.assertEquals(session.current(), None)
+        with Session() as outer:
+            self.assertTrue(session.current() is outer)
+            inner = Session()
+            with inner:
+                self.assertTrue(session.current() is inner)
+            self.assertTrue(session.current() is outer)
+        self.assertEquals(session.current(), None)
+
+    def test_use(self):
+        s = Session()
+        with session.use(s):
+            self.assertTrue(session.current() is s)
+            with session.use(None):
+                self.assertTrue(session.current() is s)
+        self.assertEquals(session.current(), None)
+        # leaving doesn't flush
+        s.add(FakeObject('a', dirty=True))
+        with session.use(s):
+            pass
+        self.assertEquals(len(s.dirty()), 1)
+
+    def test_identity(self):
+        s = Session()
+        a, b = FakeObject('a'), FakeObject('a')
+        self.assertTrue(s.add(a) is a)
+        self.assertTrue(s.add(b) is a)
+        self.assertTrue(s.get(FakeObject, 'a') is a)
+        self.assertTrue(s.add(b, replace=True) is b)
+        self.assertTrue(s.get(FakeObject, 'a') is b)
+
+    def test_dirty(self):
+        s = Session()
+        a, b = FakeObject('a', dirty=True), FakeObject('a', dirty=True)
+        s.add(a)
+        s.add(FakeObject('b'))
+        s.add(b, replace=True)
+        # the displaced instance still needs saving
+        self.assertEquals(set(s.dirty()), set([a, b]))
+
+    def test_delete(self):
+        s = Session()
+        a = FakeObject('a')
+        s.add(a)
+        s.delete(a)
+        self.assertEquals(s.get(FakeObject, 'a'), None)
+        self.assertTrue(s.is_deleted(FakeObject, 'a'))
+        s.add(a)
+        self.assertTrue(s.is_deleted(FakeObject, 'a'))
+        s.add(a, replace=True)
+        self.assertFalse(s.is_deleted(FakeObject, 'a'))
+
+    def test_no_flush_on_error(self):
+        s = Session()
+        s.flush = lambda: self.fail('flushed')
+        with self.assertRaises(KeyError):
+            with s:
+                raise KeyError()
+        self.assertEquals(session.current(), None)
@@ -0,0 +1,118 @@
+import unittest, threading, time
+from pynamo.write_behind import WriteBehindBuffer
+
+
+class FakeItem(dict):
+    def __init__(self, *a, **kw):
+        super(FakeItem, self).__init__(*a, **kw)
+        self._updates = {}
+
+
+class FakeObject(object):
+    def __init__(self, key, value=None):
+        self._item = FakeItem(key=key, value=value)
+        self._dirty = True
+        self._exists = False
+        self._in_flight = None
+        self.absorbed = []
+
+    def _absorb(self, other):
+        self.absorbed.append(other)
+
+    def _written(self):
+        self._in_flight = None
+        self._dirty = False
+        self._exists = True
+
+
+class FakeModel(object):
+    __name__ = 'FakeModel'
+    fail = False
+
+    def __init__(self):
+        self.batches = []
+        self.lock = threading.Lock()
+
+    def _key_from_attrs(self, attrs):
+        return attrs['key']
+
+    def save_many(self, objs):
+        with self.lock:
+            self.batches.append([o._item['value'] for o in objs])
+        for o in objs:
+            o._in_flight = True
+        if self.fail:
+            raise IOError('down')
+        for o in objs:
+            o._written()
+
+
+class WriteBehindBufferTests(unittest.TestCase):
+    def test_batch_size(self):
+        model = FakeModel()
+        buf = WriteBehindBuffer(model, batch_size=3, interval=60)
+        objs = [FakeObject(i, i) for i in xrange(3)]
+        for o in objs:
+            buf.put(o)
+        buf.flush()
+        self.assertEquals(model.batches, [[0, 1, 2]])
+        self.assertFalse(any(o._dirty for o in objs))
+        buf.close()
+
+    def test_interval(self):
+        model = FakeModel()
+        buf = WriteBehindBuffer(model, batch_size=100, interval=0.05)
+        buf.put(FakeObject('a', 1))
+        time.sleep(0.3)
+        self.assertEquals(model.batches, [[1]])
+        buf.close()
+
+    def test_coalesce(self):
+        model = FakeModel()
+        buf = WriteBehindBuffer(model, batch_size=100, interval=60)
+        first, second = FakeObject('a', 1), FakeObject('a', 2)
+        buf.put(first)
+        buf.put(second)
+        buf.put(FakeObject('b', 3))
+        self.assertEquals(len(buf), 2)
+        buf.close()
+        self.assertEquals(model.batches, [[2, 3]])
+        self.assertEquals(second.absorbed, [first])
+        self.assertFalse(first._dirty)
+
+    def test_errors(self):
+        model = FakeModel()
+        model.fail = True
+        failed = []
+        buf = WriteBehindBuffer(model, interval=60,
+                                on_error=lambda o, e: failed.append(o))
+        obj = FakeObject('a', 1)
+        buf.put(obj)
+        buf.flush()
+        errors = buf.errors()
+        self.assertEquals([o for o, e in errors], [obj])
+        self.assertTrue(isinstance(errors[0][1], IOError))
+        self.assertEquals(failed, [obj])
+        self.assertEquals(buf.errors(), [])
+        buf.close()
+
+    def test_backpressure(self):
+        model = FakeModel()
+        buf = WriteBehindBuffer(model, batch_size=100, interval=60,
+                                max_size=2)
+        buf.put(FakeObject('a', 1))
+        buf.put(FakeObject('b', 2))
+        done = threading.Event()
+        def put():
+            buf.put(FakeObject('c', 3))
+            done.set()
+        threading.Thread(target=put).start()
+        self.assertFalse(done.wait(0.1))
+        buf.flush()
+        self.assertTrue(done.wait(1))
+        buf.close()
+
+    def test_closed(self):
+        buf = WriteBehindBuffer(FakeModel())
+        buf.close()
+        self.assertRaises(RuntimeError, buf.put, FakeObject('a'))